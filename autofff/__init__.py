@@ -1,3 +1,31 @@
-from . import config, generator, scanner, utils
+import importlib
 
 __version__ = 0.5
+
+_SUBMODULES = (
+    "cache",
+    "client",
+    "config",
+    "cparser",
+    "depfile",
+    "elf",
+    "generator",
+    "index",
+    "model",
+    "output",
+    "runner",
+    "scanfile",
+    "scanner",
+    "server",
+    "timings",
+    "utils",
+    "watch",
+)
+
+
+def __getattr__(name: str):
+    # Submodules are imported on first access so that light-weight entry points
+    # (e.g. the client) don't pay for importing pycparser.
+    if name in _SUBMODULES:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
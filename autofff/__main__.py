@@ -1,46 +1,29 @@
-from argparse import ArgumentParser
+from argparse import ArgumentParser, Namespace
 import logging
 import os.path
 import sys
+from typing import TYPE_CHECKING
 
 import autofff
-import autofff.scanner as scanner
-import autofff.generator as generator
-import autofff.config as c
-from autofff.config import CONFIG
-
-SCANNER_TYPES = {
-    c.GCC_HEADER_SCANNER_TYPE: lambda *args, **kwargs: scanner.GCCHeaderScanner(
-        *args, **kwargs
-    ),
-    c.GCC_OBJECT_SCANNER_TYPE: lambda *args, **kwargs: scanner.GCCObjectScanner(
-        *args, **kwargs
-    ),
-}
-
-GENERATOR_TYPES = {
-    c.BARE_GENERATOR_TYPE: lambda *args, **kwargs: generator.BareFakeGenerator(),
-    c.SIMPLE_GENERATOR_TYPE: lambda *args, **kwargs: generator.SimpleFakeGenerator(
-        *args, **kwargs
-    ),
-}
+import autofff.depfile as depfile
+import autofff.output as output
+import autofff.scanfile as scanfile
+import autofff.timings as timings
 
+# The runner (and with it pycparser) is only imported when scanning, which
+# keeps 'autofff generate' light-weight
+if TYPE_CHECKING:
+    import autofff.runner as runner
 
-def main() -> None:
-    parser = ArgumentParser(
-        prog="autofff",
-        description="Auto-generate FFF fake definitions for C API header files",
-    )
-    parser.add_argument(
-        "input", type=str, help="Path of c-header file to generate fff-fakes for."
-    )
-    parser.add_argument(
-        "-O",
-        "--output",
-        type=str,
-        help="Output file for the generated fake header",
-        required=True,
-    )
+SCAN_COMMAND = "scan"
+GENERATE_COMMAND = "generate"
+INDEX_COMMAND = "index"
+COMMANDS = (SCAN_COMMAND, GENERATE_COMMAND, INDEX_COMMAND)
+
+LOGGER = logging.getLogger(__name__)
+
+
+def _add_flag_arguments(parser: ArgumentParser, fakesRequired: bool = True) -> None:
     parser.add_argument(
         "-I",
         "--include",
@@ -64,7 +47,7 @@ def main() -> None:
         "--fake",
         type=str,
         help="Path of the fake libc and additional include directories that you would like to include before the normal '-I' includes.",
-        required=True,
+        required=fakesRequired,
         action="append",
         dest="fakes",
     )
@@ -77,6 +60,121 @@ def main() -> None:
         action="append",
         dest="defines",
     )
+
+
+def _add_scan_arguments(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "--cache-dir",
+        type=str,
+        help="Directory of the on-disk cache used to skip preprocessing and parsing of unchanged headers. Overrides the configuration's 'cache_dir'.",
+        default=None,
+        required=False,
+        dest="cacheDir",
+    )
+    parser.add_argument(
+        "--umbrella",
+        help="Preprocess and parse all inputs sharing the same includes and defines as a single translation unit, instead of once per input. Falls back to scanning the inputs one by one if the translation unit fails to parse.",
+        action="store_true",
+        default=False,
+        required=False,
+        dest="umbrella",
+    )
+
+
+def _add_input_arguments(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "input",
+        type=str,
+        nargs="*",
+        help="Path of c-header file(s) to generate fff-fakes for.",
+    )
+    parser.add_argument(
+        "-m",
+        "--manifest",
+        type=str,
+        help="JSON file listing additional inputs. Each entry requires an 'input' and may specify an 'output' (and 'sourceOutput') as well as additional 'includes', 'includeFiles', 'defines', 'fakes', 'headers' and 'usedBy'.",
+        required=False,
+        dest="manifest",
+    )
+    _add_flag_arguments(parser)
+    parser.add_argument(
+        "--header",
+        type=str,
+        help="Header declaring functions of the scanned object files or archives, when using the 'gcc_object' scanner. These are scanned for the declarations of the functions to be faked and are included by the generated test-headers.",
+        required=False,
+        action="append",
+        dest="headers",
+    )
+    parser.add_argument(
+        "--used-by",
+        type=str,
+        help="Source file of the code-under-test. Only the functions it calls or takes the address of (and doesn't define itself) are faked. It's preprocessed with the same includes and defines as the inputs. May be given multiple times.",
+        required=False,
+        action="append",
+        dest="usedBy",
+    )
+    _add_scan_arguments(parser)
+
+
+def _add_output_arguments(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "-O",
+        "--output",
+        type=str,
+        help="Output file for the generated fake header. Only valid for a single input.",
+        required=False,
+    )
+    parser.add_argument(
+        "--output-dir",
+        type=str,
+        help="Output directory for the generated fake headers when generating for multiple inputs.",
+        required=False,
+        dest="outputDir",
+    )
+    parser.add_argument(
+        "--output-pattern",
+        type=str,
+        help=f"File name pattern of the generated fake headers when generating for multiple inputs. Supports the fields '{{name}}', '{{stem}}' and '{{dir}}' of the input header as well as '{{variant}}' of a --matrix (default: '{output.DEFAULT_OUTPUT_PATTERN}').",
+        required=False,
+        dest="outputPattern",
+    )
+    parser.add_argument(
+        "--source-output",
+        type=str,
+        help="Source file to define the fakes in, leaving only their declarations to the test-header given by -O/--output. Implies the 'split' generator.",
+        required=False,
+        dest="sourceOutput",
+    )
+
+
+def _add_depfile_arguments(parser: ArgumentParser) -> None:
+    parser.add_argument(
+        "-MD",
+        help="Write a make/ninja compatible depfile listing all files read while preprocessing next to each output file (replacing the output's extension with '.d').",
+        action="store_true",
+        default=False,
+        required=False,
+        dest="writeDepFiles",
+    )
+    parser.add_argument(
+        "-MF",
+        type=str,
+        help="Path of the depfile to write. Implies -MD and is only valid for a single output.",
+        default=None,
+        required=False,
+        dest="depFile",
+    )
+    parser.add_argument(
+        "-MP",
+        help="Add an empty phony target for each dependency to the depfile, so that deleted headers don't break the build.",
+        action="store_true",
+        default=False,
+        required=False,
+        dest="phonyDependencies",
+    )
+
+
+def _add_common_arguments(parser: ArgumentParser) -> None:
     parser.add_argument(
         "-c",
         "--config",
@@ -102,61 +200,514 @@ def main() -> None:
         dest="logLevel",
         const=logging.INFO,
     )
+    parser.add_argument(
+        "--timings",
+        type=str,
+        help="Write the wall and CPU time spent per phase (e.g. preprocessing, parsing, rendering) of each input to this file, aggregated across all inputs and worker processes.",
+        default=None,
+        required=False,
+        dest="timings",
+    )
+    parser.add_argument(
+        "--timings-format",
+        type=str,
+        help=f"Format of the '--timings' report. '{timings.JSON_FORMAT}' sums up the phases per input, '{timings.CHROME_FORMAT}' lists each phase as event to be viewed in chrome://tracing or Perfetto (default: '{timings.JSON_FORMAT}').",
+        choices=timings.FORMATS,
+        default=timings.JSON_FORMAT,
+        required=False,
+        dest="timingsFormat",
+    )
+    parser.add_argument(
+        "--profile",
+        type=str,
+        help=f"Run the processing of each input under cProfile and dump its stats as '<input path>{timings.PROFILE_SUFFIX}' into this directory.",
+        default=None,
+        required=False,
+        dest="profileDir",
+    )
     parser.add_argument(
         "--version",
         help="Print version info",
         action="version",
         version=f"%(prog)s {autofff.__version__}",
     )
-    args = parser.parse_args()
 
-    logging.basicConfig(level=args.logLevel)
-    logger = logging.getLogger(__name__)
 
-    logger.debug(f"Provided cmd-args: {', '.join(sys.argv[1:])}.")
+def create_argument_parser(command: str = None) -> ArgumentParser:
+    if command == SCAN_COMMAND:
+        parser = ArgumentParser(
+            prog=f"autofff {SCAN_COMMAND}",
+            description="Scan C API header files and store the functions found as a scan file, to generate fakes from via 'autofff generate'",
+        )
+        _add_input_arguments(parser)
+        parser.add_argument(
+            "-O",
+            "--output",
+            type=str,
+            help="Output file for the scan results of all inputs.",
+            required=True,
+        )
+        parser.add_argument(
+            "--format",
+            type=str,
+            help=f"Format of the scan file. '{scanfile.JSON_FORMAT}' is human-readable, '{scanfile.BINARY_FORMAT}' is faster to read and write (default: '{scanfile.JSON_FORMAT}').",
+            choices=scanfile.FORMATS,
+            default=scanfile.JSON_FORMAT,
+            required=False,
+            dest="format",
+        )
+        _add_depfile_arguments(parser)
+    elif command == GENERATE_COMMAND:
+        parser = ArgumentParser(
+            prog=f"autofff {GENERATE_COMMAND}",
+            description="Generate FFF fake definitions from the scan files written by 'autofff scan', without preprocessing or parsing the headers again",
+        )
+        parser.add_argument(
+            "input",
+            type=str,
+            nargs="+",
+            help=f"Path of scan file(s) or indices written by 'autofff {INDEX_COMMAND}' to generate fff-fakes from.",
+        )
+        parser.add_argument(
+            "--header",
+            type=str,
+            help="Only generate the fakes of this header, out of all headers of the scan files and indices. May be given multiple times.",
+            required=False,
+            action="append",
+            dest="headers",
+        )
+        _add_output_arguments(parser)
+    elif command == INDEX_COMMAND:
+        parser = ArgumentParser(
+            prog=f"autofff {INDEX_COMMAND}",
+            description=f"Maintain an SQLite index of the functions declared and defined by all headers below the given paths, rescanning only those changed since. Look up functions in the index or generate fakes from it via 'autofff {GENERATE_COMMAND}'",
+        )
+        parser.add_argument(
+            "database",
+            type=str,
+            help="Path of the index to create or update.",
+        )
+        parser.add_argument(
+            "paths",
+            type=str,
+            nargs="*",
+            help="Directories to crawl for headers, or headers to index.",
+        )
+        parser.add_argument(
+            "--pattern",
+            type=str,
+            help="File name pattern of the headers crawled for (default: '%(default)s').",
+            default="*.h",
+            required=False,
+            dest="pattern",
+        )
+        parser.add_argument(
+            "--lookup",
+            type=str,
+            help="Print the location and signature of each function matching this name, which may contain wildcards (e.g. 'HAL_UART_*'). May be given multiple times.",
+            required=False,
+            action="append",
+            dest="lookups",
+        )
+        _add_flag_arguments(parser, fakesRequired=False)
+        _add_scan_arguments(parser)
+    else:
+        parser = ArgumentParser(
+            prog="autofff",
+            description=f"Auto-generate FFF fake definitions for C API header files. Use 'autofff {SCAN_COMMAND}' and 'autofff {GENERATE_COMMAND}' to do either step on its own, or 'autofff {INDEX_COMMAND}' to maintain an index of the functions of many headers.",
+        )
+        _add_input_arguments(parser)
+        _add_output_arguments(parser)
+        parser.add_argument(
+            "--incremental",
+            help=f"Record a fingerprint of the inputs, flags, configuration and all files read while preprocessing next to each output file (as '<output>{output.MANIFEST_SUFFIX}'). Outputs whose fingerprint is unchanged are skipped without invoking the preprocessor.",
+            action="store_true",
+            default=False,
+            required=False,
+            dest="incremental",
+        )
+        parser.add_argument(
+            "-j",
+            "--jobs",
+            type=int,
+            help="Number of worker processes used when generating fakes for multiple inputs. 0 uses one process per CPU core (default: 1).",
+            default=1,
+            required=False,
+            dest="jobs",
+        )
+        parser.add_argument(
+            "--matrix",
+            type=str,
+            help="Variant of defines to generate fakes for, given as '[name:]DEFINE,...' (e.g. 'dma:CHIP_A,USE_DMA=1'). May be given multiple times, each input is then scanned once per variant, with the variant's name added to the output paths. Variants mining the same functions as an earlier one are skipped.",
+            required=False,
+            action="append",
+            dest="matrix",
+        )
+        parser.add_argument(
+            "--watch",
+            help="Keep running after generating and regenerate the outputs affected whenever an input or any file it includes changes. The parser and scanned results are kept in memory in between.",
+            action="store_true",
+            default=False,
+            required=False,
+            dest="watch",
+        )
+        parser.add_argument(
+            "--debounce",
+            type=float,
+            help="Seconds to wait for further changes before regenerating when watching, so that saving several files at once triggers only one regeneration (default: %(default)s).",
+            default=0.2,
+            required=False,
+            dest="debounce",
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=float,
+            help="Check for changes every this many seconds when watching, instead of relying on inotify. Polling is used anyway where inotify isn't available.",
+            default=None,
+            required=False,
+            dest="pollInterval",
+        )
+        _add_depfile_arguments(parser)
+    _add_common_arguments(parser)
+    return parser
+
+
+def parse_arguments(argv: list) -> tuple:
+    """Return the parsed arguments and the parser used, dispatching to the
+    parser of a command if ``argv`` starts with one."""
+    command = argv[0] if argv and argv[0] in COMMANDS else None
+    parser = create_argument_parser(command)
+    args = parser.parse_args(argv if command is None else argv[1:])
+    args.command = command
+    return args, parser
+
+
+def _create_runner(args: Namespace, rnr: "runner.Runner" = None) -> "runner.Runner":
+    import autofff.runner as runner
+
+    if rnr is None:
+        if getattr(args, "jobs", 1) == 1:
+            rnr = runner.Runner()
+        else:
+            rnr = runner.ParallelRunner(args.jobs or None)
+    rnr.load_config(args.config)
+    rnr.set_cache_dir(args.cacheDir)
+    rnr.incremental = getattr(args, "incremental", False)
+    rnr.umbrella = args.umbrella
+    rnr.trackDependencies = args.command in (SCAN_COMMAND, INDEX_COMMAND)
+    rnr.profileDir = args.profileDir
+    return rnr
+
+
+def _load_manifest(
+    args: Namespace,
+    parser: ArgumentParser,
+    variant: str = None,
+    variantDefines: list = None,
+) -> list:
+    import autofff.runner as runner
+
+    if args.manifest is None:
+        return []
+    try:
+        return runner.load_manifest(
+            args.manifest,
+            args.fakes,
+            args.includes,
+            args.includeFiles,
+            args.defines,
+            getattr(args, "outputDir", None),
+            getattr(args, "outputPattern", None),
+            args.headers,
+            args.usedBy,
+            variant,
+            variantDefines,
+        )
+    except (OSError, runner.RunnerException) as e:
+        parser.error(str(e))
+
+
+def run_scan(
+    args: Namespace, parser: ArgumentParser, rnr: "runner.Runner" = None
+) -> int:
+    import autofff.runner as runner
+
+    rnr = _create_runner(args, rnr)
+    jobs = [
+        runner.Job(
+            inputFile,
+            None,
+            args.fakes,
+            args.includes,
+            args.includeFiles,
+            args.defines,
+            headers=args.headers,
+            usedBy=args.usedBy,
+        )
+        for inputFile in args.input
+    ]
+    jobs += _load_manifest(args, parser)
+    if not jobs:
+        parser.error("no input files given")
+
+    headers, failedJobs = rnr.scan(jobs)
+    output.write_if_changed(args.output, scanfile.dumps(headers, args.format))
+    if args.depFile is not None or args.writeDepFiles:
+        dependencies = []
+        for header in headers:
+            dependencies.append(header.inputFile)
+            dependencies += header.dependencies or []
+        output.write_if_changed(
+            args.depFile or output.format_depfile_path(args.output),
+            depfile.format_depfile(
+                [args.output],
+                list(dict.fromkeys(dependencies)),
+                args.phonyDependencies,
+            ),
+        )
+    return 1 if failedJobs else 0
+
+
+def run_generate(args: Namespace, parser: ArgumentParser) -> int:
+    import autofff.config as c
+    import autofff.generator as generator
+
+    import autofff.index as index
 
     c.load(args.config.strip())
+    selected = None
+    if args.headers is not None:
+        selected = {os.path.realpath(path) for path in args.headers}
+    headers = []
+    for filename in args.input:
+        try:
+            if index.is_index(filename):
+                with index.SymbolIndex(filename, readOnly=True) as symbolIndex:
+                    headers += symbolIndex.headers(args.headers)
+            else:
+                headers += [
+                    header
+                    for header in scanfile.load(filename)
+                    if selected is None
+                    or os.path.realpath(header.inputFile) in selected
+                ]
+        except (OSError, scanfile.ScanFileException, index.IndexException) as e:
+            parser.error(str(e))
+    found = {os.path.realpath(header.inputFile) for header in headers}
+    for path in args.headers or []:
+        if os.path.realpath(path) not in found:
+            parser.error(f"{path} is in none of the scan files or indices given")
 
-    _, fileext = os.path.splitext(args.input)
-    if fileext != ".h":
-        logger.warning(
-            f"Detected non-standard header file extension '{fileext}' (expected '.h'-file)."
+    if args.sourceOutput is not None and args.output is None:
+        parser.error("argument --source-output requires -O/--output")
+    if args.output is not None:
+        if len(headers) != 1:
+            parser.error(
+                "argument -O/--output requires the scan of exactly one header, select it via --header"
+            )
+        outputFiles = [args.output]
+    elif args.outputDir is None and args.outputPattern is None:
+        parser.error(
+            "one of the arguments -O/--output, --output-dir or --output-pattern is required"
         )
+    else:
+        outputFiles = [
+            output.format_output_path(
+                header.inputFile, args.outputDir, args.outputPattern
+            )
+            for header in headers
+        ]
 
-    scannerType = CONFIG[c.AUTOFFF_SECTION][c.SCANNER_TYPE]
-    scnr = SCANNER_TYPES[scannerType](
-        inputFile=args.input,
-        fakes=args.fakes,
-        includes=args.includes,
-        includeFiles=args.includeFiles,
-        defines=args.defines,
-    )
-    generatorType = CONFIG[c.AUTOFFF_SECTION][c.GENERATOR_TYPE]
-    gen = GENERATOR_TYPES[generatorType](
-        os.path.splitext(os.path.basename(args.output))[0],
-        args.input,
-        args.includeFiles,
+    failedOutputs = generator.generate_scanned(
+        headers, outputFiles, args.profileDir, [args.sourceOutput] * len(headers)
     )
+    return 1 if failedOutputs else 0
 
-    result = scnr.scan()
-    logger.info(
-        f"Function declarations found: {', '.join( [ f.name for f in result.declarations ])}."
-    )
-    logger.info(
-        f"Function definitions found: {', '.join( [ f.decl.name for f in result.definitions ])}."
-    )
 
-    outputFile = args.output.strip()
-    if not os.path.exists(os.path.dirname(outputFile)):
-        dirname = os.path.dirname(outputFile)
-        os.makedirs(dirname)
-        logger.debug(f"New directory for output file created {dirname}.")
+def run_index(
+    args: Namespace, parser: ArgumentParser, rnr: "runner.Runner" = None
+) -> int:
+    import autofff.index as index
 
-    logger.info(f"Generatring output file {outputFile}...")
-    with open(outputFile, "w") as fs:
-        gen.generate(result, fs)
+    if not args.paths and not args.lookups:
+        parser.error("no paths to index or functions to look up given")
+    status = 0
+    try:
+        symbolIndex = index.SymbolIndex(args.database, readOnly=not args.paths)
+    except index.IndexException as e:
+        parser.error(str(e))
+    with symbolIndex:
+        if args.paths:
+            import autofff.config as c
+            import autofff.runner as runner
+
+            if not args.fakes:
+                parser.error("the following arguments are required: -F/--fake")
+            rnr = _create_runner(args, rnr)
+            if c.CONFIG[c.AUTOFFF_SECTION][c.SCANNER_TYPE] != c.GCC_HEADER_SCANNER_TYPE:
+                parser.error(
+                    f"indexing requires the '{c.GCC_HEADER_SCANNER_TYPE}' scanner"
+                )
+            jobs = [
+                runner.Job(
+                    header,
+                    None,
+                    args.fakes,
+                    args.includes,
+                    args.includeFiles,
+                    args.defines,
+                )
+                for header in index.crawl(args.paths, args.pattern)
+            ]
+            if index.update_index(symbolIndex, rnr, jobs):
+                status = 1
+
+        for name in args.lookups or []:
+            found = symbolIndex.lookup(name)
+            if not found:
+                LOGGER.warning(f"No indexed header declares or defines '{name}'.")
+                status = 1
+            for header, kind, function in found:
+                print(
+                    f"{header}:{function.line}: {kind}: {index.format_signature(function)}"
+                )
+    return status
+
+
+def run(args: Namespace, parser: ArgumentParser, rnr: "runner.Runner" = None) -> int:
+    if getattr(args, "timings", None) is None:
+        return run_command(args, parser, rnr)
+
+    recorder = timings.enable()
+    try:
+        return run_command(args, parser, rnr)
+    finally:
+        timings.disable()
+        output.write_if_changed(
+            args.timings, timings.format_report(recorder, args.timingsFormat)
+        )
+
+
+def _create_jobs(
+    args: Namespace,
+    parser: ArgumentParser,
+    variant: str = None,
+    variantDefines: list = None,
+) -> list:
+    """Return the jobs of the inputs and manifest, for one ``variant`` of the
+    define matrix if given."""
+    import autofff.runner as runner
+
+    defines = args.defines
+    if variantDefines:
+        defines = (defines or []) + variantDefines
+    if args.output is not None:
+        outputFiles = [args.output]
+        sourceFile = args.sourceOutput
+        if variant is not None:
+            outputFiles = [output.format_variant_path(args.output, variant)]
+            if sourceFile is not None:
+                sourceFile = output.format_variant_path(sourceFile, variant)
+    else:
+        outputFiles = [
+            output.format_output_path(
+                inputFile, args.outputDir, args.outputPattern, variant
+            )
+            for inputFile in args.input
+        ]
+        sourceFile = None
+    jobs = [
+        runner.Job(
+            inputFile,
+            outputFile,
+            args.fakes,
+            args.includes,
+            args.includeFiles,
+            defines,
+            headers=args.headers,
+            usedBy=args.usedBy,
+            sourceFile=sourceFile,
+            variant=variant,
+            variantGroup=(None, index) if variant is not None else None,
+        )
+        for index, (inputFile, outputFile) in enumerate(zip(args.input, outputFiles))
+    ]
+    return jobs + _load_manifest(args, parser, variant, variantDefines)
+
+
+def run_command(
+    args: Namespace, parser: ArgumentParser, rnr: "runner.Runner" = None
+) -> int:
+    command = getattr(args, "command", None)
+    if command == SCAN_COMMAND:
+        return run_scan(args, parser, rnr)
+    elif command == GENERATE_COMMAND:
+        return run_generate(args, parser)
+    elif command == INDEX_COMMAND:
+        return run_index(args, parser, rnr)
+
+    import autofff.runner as runner
+
+    if args.jobs < 0:
+        parser.error("argument -j/--jobs must not be negative")
+    rnr = _create_runner(args, rnr)
+
+    if args.sourceOutput is not None and args.output is None:
+        parser.error("argument --source-output requires -O/--output")
+    if args.output is not None:
+        if len(args.input) != 1 or args.manifest is not None:
+            parser.error("argument -O/--output requires exactly one input")
+    elif args.outputDir is None and args.outputPattern is None and args.input:
+        parser.error(
+            "one of the arguments -O/--output, --output-dir or --output-pattern is required"
+        )
+
+    if args.matrix:
+        variants = [runner.parse_variant(text) for text in args.matrix]
+        names = [name for name, _ in variants]
+        for name in names:
+            if names.count(name) > 1:
+                parser.error(f"argument --matrix: variant '{name}' given twice")
+    else:
+        variants = [(None, None)]
+    jobs = []
+    for variant, variantDefines in variants:
+        jobs += _create_jobs(args, parser, variant, variantDefines)
+    if not jobs:
+        parser.error("no input files given")
+
+    if args.depFile is not None:
+        if len(jobs) != 1:
+            parser.error("argument -MF requires exactly one input")
+        jobs[0].depFile = args.depFile
+    elif args.writeDepFiles:
+        for job in jobs:
+            if job.depFile is None:
+                job.depFile = output.format_depfile_path(job.outputFile)
+    rnr.phonyDependencies = args.phonyDependencies
+
+    if args.watch:
+        import autofff.watch as watch
+
+        if args.debounce < 0:
+            parser.error("argument --debounce must not be negative")
+        if args.pollInterval is not None and args.pollInterval <= 0:
+            parser.error("argument --poll-interval must be positive")
+        return watch.watch(rnr, jobs, args.debounce, args.pollInterval)
+
+    failedJobs = rnr.run(jobs)
+    return 1 if failedJobs else 0
+
+
+def main() -> None:
+    args, parser = parse_arguments(sys.argv[1:])
+
+    logging.basicConfig(level=args.logLevel)
+    logger = logging.getLogger(__name__)
+
+    logger.debug(f"Provided cmd-args: {', '.join(sys.argv[1:])}.")
 
-    logger.info("Generation complete!")
+    sys.exit(run(args, parser))
 
 
 if __name__ == "__main__":
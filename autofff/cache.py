@@ -0,0 +1,358 @@
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+import hashlib
+import json
+import logging
+import os
+import pickle
+import sys
+import tempfile
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    LOGGER.error("Module is not intended to run as '__main__'!")
+    sys.exit(1)
+
+
+class ResultCache(ABC):
+    def __init__(self) -> None:
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> object:
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def put(self, key: str, value: object) -> None:
+        self._put(key, value)
+
+    @abstractmethod
+    def _get(self, key: str) -> object:
+        pass
+
+    @abstractmethod
+    def _put(self, key: str, value: object) -> None:
+        pass
+
+
+class MemoryResultCache(ResultCache):
+    def __init__(self, maxEntries: int = 128) -> None:
+        super().__init__()
+        self.maxEntries = maxEntries
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    # Results are immutable, so they're shared with callers rather than copied
+    def _get(self, key: str) -> object:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+        return value
+
+    def _put(self, key: str, value: object) -> None:
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxEntries:
+                evictedKey, _ = self._entries.popitem(last=False)
+                self.evictions += 1
+                LOGGER.debug(f"Evicted cached result {evictedKey}.")
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+class ChainedResultCache(ResultCache):
+    """Query several result caches in order (e.g. memory before disk) and
+    populate the faster ones on hits in the slower ones."""
+
+    def __init__(self, *caches: ResultCache) -> None:
+        super().__init__()
+        self.caches = caches
+
+    def _get(self, key: str) -> object:
+        for index, cache in enumerate(self.caches):
+            value = cache.get(key)
+            if value is not None:
+                for fasterCache in self.caches[:index]:
+                    fasterCache.put(key, value)
+                return value
+        return None
+
+    def _put(self, key: str, value: object) -> None:
+        for cache in self.caches:
+            cache.put(key, value)
+
+
+_FILE_DIGESTS = {}
+_FILE_DIGESTS_MAX_ENTRIES = 65536
+
+
+def file_digest(filename: str) -> str:
+    """Return the SHA-256 of a file, memoized per (path, size, mtime)."""
+    stat = os.stat(filename)
+    stamp = (os.path.abspath(filename), stat.st_size, stat.st_mtime_ns)
+    digest = _FILE_DIGESTS.get(stamp)
+    if digest is None:
+        with open(filename, "rb") as fp:
+            digest = hashlib.sha256(fp.read()).hexdigest()
+        if len(_FILE_DIGESTS) >= _FILE_DIGESTS_MAX_ENTRIES:
+            _FILE_DIGESTS.clear()
+        _FILE_DIGESTS[stamp] = digest
+    return digest
+
+
+class DiskCache:
+    TEMP_PREFIX = ".tmp-"
+    # Temporary files are only evicted once left behind for this long (in
+    # seconds), as others are still being written by other threads/processes
+    STALE_TEMP_AGE = 3600
+
+    def __init__(self, directory: str, maxSize: int) -> None:
+        self.directory = os.path.abspath(directory)
+        self.maxSize = maxSize
+        self.evictions = 0
+        self._size = None
+        # Writes of threads preprocessing in parallel (see --jobs) share the size
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def read(self, key: str) -> bytes:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as fp:
+                data = fp.read()
+        except OSError:
+            return None
+        try:
+            os.utime(path)  # Mark as recently used
+        except OSError:
+            pass
+        return data
+
+    def write(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmpPath = tempfile.mkstemp(dir=directory, prefix=self.TEMP_PREFIX)
+        try:
+            with os.fdopen(fd, "wb") as fp:
+                fp.write(data)
+            # Replaced along with updating the size, so that an eviction in
+            # between can't count the entry as well
+            with self._lock:
+                try:
+                    previousSize = os.path.getsize(path)
+                except OSError:
+                    previousSize = 0
+                os.replace(tmpPath, path)
+                if self._size is None:
+                    self._size = self._compute_size()
+                else:
+                    self._size += len(data) - previousSize
+                if self._size > self.maxSize:
+                    self._evict()
+        except BaseException:
+            try:
+                os.unlink(tmpPath)
+            except OSError:
+                pass
+            raise
+
+    def remove(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except OSError:
+            pass
+
+    def _entries(self) -> list:
+        entries = []
+        staleTime = time.time_ns() - self.STALE_TEMP_AGE * 1_000_000_000
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                if name.startswith(self.TEMP_PREFIX) and stat.st_mtime_ns > staleTime:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def _compute_size(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def evict(self) -> None:
+        with self._lock:
+            self._evict()
+
+    def _evict(self) -> None:
+        entries = sorted(self._entries())
+        size = sum(size for _, size, _ in entries)
+        # Evict down to 90% of the limit to avoid evicting on every write
+        target = self.maxSize * 9 // 10
+        for _, entrySize, path in entries:
+            if size <= target:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                continue
+            size -= entrySize
+            self.evictions += 1
+        LOGGER.debug(f"Evicted cache entries in {self.directory} down to {size} bytes.")
+        self._size = size
+
+
+class PreprocessorCache(DiskCache):
+    MAX_VARIANTS = 8
+    ENVIRONMENT = ("CPATH", "C_INCLUDE_PATH", "CPLUS_INCLUDE_PATH")
+
+    def __init__(self, directory: str, maxSize: int) -> None:
+        super().__init__(directory, maxSize)
+        self.hits = 0
+        self.misses = 0
+
+    def _manifest_key(self, cppPath: str, cppArgs: list, filename: str) -> str:
+        invocation = [
+            cppPath,
+            list(cppArgs),
+            os.path.abspath(filename),
+            os.getcwd(),
+            [os.environ.get(name) for name in self.ENVIRONMENT],
+        ]
+        return hashlib.sha256(json.dumps(invocation).encode()).hexdigest() + ".json"
+
+    def _read_manifest(self, manifestKey: str) -> list:
+        data = self.read(manifestKey)
+        if data is None:
+            return []
+        try:
+            variants = json.loads(data)
+        except ValueError:
+            self.remove(manifestKey)
+            return []
+        return variants if isinstance(variants, list) else []
+
+    def lookup(self, cppPath: str, cppArgs: list, filename: str) -> tuple:
+        """Return the cached ``(text, dependencies)`` of a preprocessor run or
+        ``None`` if any file read by the preprocessor changed since."""
+        manifestKey = self._manifest_key(cppPath, cppArgs, filename)
+        for variant in self._read_manifest(manifestKey):
+            try:
+                upToDate = all(
+                    file_digest(path) == digest
+                    for path, digest in variant["dependencies"].items()
+                )
+            except (OSError, KeyError, AttributeError):
+                upToDate = False
+            if not upToDate:
+                continue
+            data = self.read(variant["output"])
+            if data is None:
+                continue
+            self.hits += 1
+            LOGGER.debug(f"Reusing cached preprocessor output for {filename}.")
+            return data.decode(), list(variant["dependencies"])
+        self.misses += 1
+        return None
+
+    def store(
+        self,
+        cppPath: str,
+        cppArgs: list,
+        filename: str,
+        text: str,
+        dependencies: list,
+        startTime: int = None,
+    ) -> None:
+        dependencyDigests = {}
+        for path in dependencies:
+            try:
+                if startTime is not None and os.stat(path).st_mtime_ns >= startTime:
+                    LOGGER.debug(
+                        f"{path} was modified while preprocessing, not caching."
+                    )
+                    return
+                dependencyDigests[path] = file_digest(path)
+            except OSError:
+                return
+
+        data = text.encode()
+        outputKey = hashlib.sha256(data).hexdigest()
+        self.write(outputKey, data)
+
+        manifestKey = self._manifest_key(cppPath, cppArgs, filename)
+        variants = [
+            variant
+            for variant in self._read_manifest(manifestKey)
+            if isinstance(variant, dict)
+            and variant.get("dependencies") != dependencyDigests
+        ]
+        variants.insert(0, {"dependencies": dependencyDigests, "output": outputKey})
+        self.write(manifestKey, json.dumps(variants[: self.MAX_VARIANTS]).encode())
+
+
+class DiskResultCache(ResultCache):
+    MAGIC = b"AUTOFFF-RESULT-1\n"
+
+    def __init__(self, directory: str, maxSize: int) -> None:
+        super().__init__()
+        self.disk = DiskCache(directory, maxSize)
+
+    @property
+    def directory(self) -> str:
+        return self.disk.directory
+
+    @property
+    def maxSize(self) -> int:
+        return self.disk.maxSize
+
+    def _get(self, key: str) -> object:
+        data = self.disk.read(key)
+        if data is None:
+            return None
+        # Layout: MAGIC, key, SHA-256 of payload, pickled payload
+        header = self.MAGIC + key.encode() + b"\n"
+        digestEnd = len(header) + hashlib.sha256().digest_size
+        payload = data[digestEnd:]
+        if (
+            not data.startswith(header)
+            or data[len(header) : digestEnd] != hashlib.sha256(payload).digest()
+        ):
+            LOGGER.warning(f"Discarding corrupt result cache entry {key}.")
+            self.disk.remove(key)
+            return None
+        try:
+            return pickle.loads(payload)
+        except Exception as e:
+            LOGGER.warning(f"Discarding unreadable result cache entry {key}: {e}")
+            self.disk.remove(key)
+            return None
+
+    def _put(self, key: str, value: object) -> None:
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        self.disk.write(
+            key,
+            self.MAGIC
+            + key.encode()
+            + b"\n"
+            + hashlib.sha256(payload).digest()
+            + payload,
+        )
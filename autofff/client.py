@@ -0,0 +1,63 @@
+import getpass
+import json
+import logging
+import os
+import socket
+import sys
+import tempfile
+
+LOGGER = logging.getLogger(__name__)
+
+SOCKET_ENV = "AUTOFFF_SOCKET"
+
+
+def default_socket_path() -> str:
+    socketPath = os.environ.get(SOCKET_ENV)
+    if socketPath:
+        return socketPath
+    runtimeDir = os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir()
+    return os.path.join(runtimeDir, f"autofff-{getpass.getuser()}.sock")
+
+
+def send_request(request: dict, socketPath: str = None) -> dict:
+    if not hasattr(socket, "AF_UNIX"):
+        raise OSError("Unix domain sockets are not supported on this platform.")
+    if socketPath is None:
+        socketPath = default_socket_path()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socketPath)
+        sock.sendall(json.dumps(request).encode() + b"\n")
+        sock.shutdown(socket.SHUT_WR)
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    return json.loads(b"".join(chunks))
+
+
+def main() -> None:
+    request = {
+        "command": "run",
+        "argv": sys.argv[1:],
+        "cwd": os.getcwd(),
+        "env": dict(os.environ),
+    }
+    try:
+        response = send_request(request)
+    except (OSError, ValueError) as e:
+        # No (healthy) server available, fall back to generating in-process.
+        LOGGER.debug(f"autofff server unavailable ({e}), running locally.")
+        from autofff.__main__ import main as localMain
+
+        localMain()
+        return
+
+    sys.stdout.write(response["stdout"])
+    sys.stderr.write(response["stderr"])
+    sys.exit(response["returncode"])
+
+
+if __name__ == "__main__":
+    main()
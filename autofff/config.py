@@ -1,9 +1,6 @@
 import logging
 import sys
 
-from configobj import ConfigObj
-from validate import Validator
-
 LOGGER = logging.getLogger(__name__)
 
 if __name__ == "__main__":
@@ -20,6 +17,7 @@ SCANNER_TYPE_DEF = GCC_HEADER_SCANNER_TYPE
 GENERATOR_TYPE = "generator_type"
 BARE_GENERATOR_TYPE = "bare"
 SIMPLE_GENERATOR_TYPE = "simple"
+SPLIT_GENERATOR_TYPE = "split"
 GENERATOR_TYPE_DEF = SIMPLE_GENERATOR_TYPE
 
 GCC_SCANNER_SECTION = "gcc.scanner"
@@ -56,6 +54,12 @@ GCC_SCANNER_CPP_INCLUDE_FILE_PREFIX_DEF = "-include"
 GCC_SCANNER_CPP_DEFINE_PREFIX = "cpp_define_prefix"
 GCC_SCANNER_CPP_DEFINE_PREFIX_DEF = "-D"
 
+GCC_SCANNER_NON_STANDARD_FILTER = "non_standard_filter"
+BUILTIN_NON_STANDARD_FILTER = "builtin"
+REGEX_NON_STANDARD_FILTER = "regex"
+NO_NON_STANDARD_FILTER = "none"
+GCC_SCANNER_NON_STANDARD_FILTER_DEF = BUILTIN_NON_STANDARD_FILTER
+
 GCC_SCANNER_NON_STANDARD_IGNORE_PATTERN = "non_standard_ignore_pattern"
 GCC_SCANNER_NON_STANDARD_IGNORE_PATTERN_DEF = r"([\s\n]*(\W(__asm|asm|__asm__)\W)[\s\n]*(volatile|[\s\n]*)(goto|[\s\n]*)(.|\n|;)*?;)"
 
@@ -69,6 +73,15 @@ GCC_SCANNER_ERROR_CONTEXT_POST_LINES_DEF = 5
 GCC_SCANNER_IGNORE_ANNOTATION = "ignore_annotation"
 GCC_SCANNER_IGNORE_ANNOTATION_DEF = "AUTOFFF_SCAN_IGNORE"
 
+GCC_SCANNER_PRUNE_FOREIGN_DECLARATIONS = "prune_foreign_declarations"
+GCC_SCANNER_PRUNE_FOREIGN_DECLARATIONS_DEF = True
+
+GCC_OBJECT_SCANNER_SYMBOLS = "object_symbols"
+UNDEFINED_OBJECT_SYMBOLS = "undefined"
+DEFINED_OBJECT_SYMBOLS = "defined"
+ALL_OBJECT_SYMBOLS = "all"
+GCC_OBJECT_SCANNER_SYMBOLS_DEF = UNDEFINED_OBJECT_SYMBOLS
+
 SIMPLE_GENERATOR_SECTION = "simple.generator"
 
 SIMPLE_GENERATOR_GENERATE_INCLUDE_GUARD = "generate_include_guard"
@@ -79,31 +92,73 @@ SIMPLE_GENERATOR_FFF_PATH_DEF = "fff.h"
 
 BARE_GENERATOR_SECTION = "bare.generator"
 
-VALIDATOR = Validator()
+SPLIT_GENERATOR_SECTION = "split.generator"
+
+SPLIT_GENERATOR_SOURCE_SUFFIX = "source_suffix"
+SPLIT_GENERATOR_SOURCE_SUFFIX_DEF = ".c"
+
+CACHE_SECTION = "cache"
+
+CACHE_DIR = "cache_dir"
+CACHE_DIR_DEF = ""
+
+CACHE_MAX_SIZE = "max_size"
+CACHE_MAX_SIZE_MIN = 1
+CACHE_MAX_SIZE_DEF = 512
+
 CONFIG_SPEC = [
     f"[{AUTOFFF_SECTION}]",
     f"{SCANNER_TYPE} = option('{GCC_HEADER_SCANNER_TYPE}', '{GCC_OBJECT_SCANNER_TYPE}', default='{SCANNER_TYPE_DEF}')",
-    f"{GENERATOR_TYPE} = option('{BARE_GENERATOR_TYPE}', '{SIMPLE_GENERATOR_TYPE}', default='{GENERATOR_TYPE_DEF}')",
+    f"{GENERATOR_TYPE} = option('{BARE_GENERATOR_TYPE}', '{SIMPLE_GENERATOR_TYPE}', '{SPLIT_GENERATOR_TYPE}', default='{GENERATOR_TYPE_DEF}')",
     f"[[{GCC_SCANNER_SECTION}]]",
     f"{GCC_SCANNER_CPP_PATH} = string(default='{GCC_SCANNER_CPP_PATH_DEF}')",
     f"{GCC_SCANNER_CPP_ARGS} = string_list(default={GCC_SCANNER_CPP_ARGS_DEF})",
     f"{GCC_SCANNER_CPP_INCLUDE_DIR_PREFIX} = string(default='{GCC_SCANNER_CPP_INCLUDE_DIR_PREFIX_DEF}')",
     f"{GCC_SCANNER_CPP_INCLUDE_FILE_PREFIX} = string(default='{GCC_SCANNER_CPP_INCLUDE_FILE_PREFIX_DEF}')",
     f"{GCC_SCANNER_CPP_DEFINE_PREFIX} = string(default='{GCC_SCANNER_CPP_DEFINE_PREFIX_DEF}')",
+    f"{GCC_SCANNER_NON_STANDARD_FILTER} = option('{BUILTIN_NON_STANDARD_FILTER}', '{REGEX_NON_STANDARD_FILTER}', '{NO_NON_STANDARD_FILTER}', default='{GCC_SCANNER_NON_STANDARD_FILTER_DEF}')",
     f"{GCC_SCANNER_NON_STANDARD_IGNORE_PATTERN} = string(default={GCC_SCANNER_NON_STANDARD_IGNORE_PATTERN_DEF})",
     f"{GCC_SCANNER_ERROR_CONTEXT_PREV_LINES} = integer(min={GCC_SCANNER_ERROR_CONTEXT_PREV_LINES_MIN}, default={GCC_SCANNER_ERROR_CONTEXT_PREV_LINES_DEF})",
     f"{GCC_SCANNER_ERROR_CONTEXT_POST_LINES} = integer(min={GCC_SCANNER_ERROR_CONTEXT_POST_LINES_MIN}, default={GCC_SCANNER_ERROR_CONTEXT_POST_LINES_DEF})",
     f"{GCC_SCANNER_IGNORE_ANNOTATION} = string(default={GCC_SCANNER_IGNORE_ANNOTATION_DEF})",
+    f"{GCC_SCANNER_PRUNE_FOREIGN_DECLARATIONS} = boolean(default={GCC_SCANNER_PRUNE_FOREIGN_DECLARATIONS_DEF})",
+    f"{GCC_OBJECT_SCANNER_SYMBOLS} = option('{UNDEFINED_OBJECT_SYMBOLS}', '{DEFINED_OBJECT_SYMBOLS}', '{ALL_OBJECT_SYMBOLS}', default='{GCC_OBJECT_SCANNER_SYMBOLS_DEF}')",
     f"[[{SIMPLE_GENERATOR_SECTION}]]",
     f"{SIMPLE_GENERATOR_GENERATE_INCLUDE_GUARD} = boolean(default={SIMPLE_GENERATOR_GENERATE_INCLUDE_GUARD_DEF})",
     f"{SIMPLE_GENERATOR_FFF_PATH} = string(default={SIMPLE_GENERATOR_FFF_PATH_DEF})",
     f"[[{BARE_GENERATOR_SECTION}]]",
+    f"[[{SPLIT_GENERATOR_SECTION}]]",
+    f"{SPLIT_GENERATOR_SOURCE_SUFFIX} = string(default='{SPLIT_GENERATOR_SOURCE_SUFFIX_DEF}')",
+    f"[[{CACHE_SECTION}]]",
+    f"{CACHE_DIR} = string(default='{CACHE_DIR_DEF}')",
+    f"{CACHE_MAX_SIZE} = integer(min={CACHE_MAX_SIZE_MIN}, default={CACHE_MAX_SIZE_DEF})",
 ]
-CONFIG = ConfigObj(configspec=CONFIG_SPEC, raise_errors=True)
-CONFIG.validate(VALIDATOR)  # Invoke validator once to get basic structure
+
+
+def __getattr__(name: str):
+    # CONFIG and VALIDATOR are only created on first use (holding the
+    # defaults) or by load(), so that importing this module neither imports
+    # configobj nor validates a configuration that's about to be replaced
+    if name in ("CONFIG", "VALIDATOR"):
+        _create(None)
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _create(filename: str) -> None:
+    global CONFIG, VALIDATOR
+    from configobj import ConfigObj
+    from validate import Validator
+
+    VALIDATOR = Validator()
+    CONFIG = ConfigObj(filename, configspec=CONFIG_SPEC, raise_errors=True)
+    CONFIG.validate(VALIDATOR)
 
 
 def load(filename: str):
+    if "CONFIG" not in globals():
+        _create(filename)
+        return
     CONFIG.filename = filename
     CONFIG.reload()
     CONFIG.validate(VALIDATOR)
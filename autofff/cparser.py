@@ -0,0 +1,99 @@
+import importlib.util
+import logging
+import os
+import os.path
+import shutil
+import sys
+import tempfile
+
+import pycparser
+
+LOGGER = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    LOGGER.error("Module is not intended to run as '__main__'!")
+    sys.exit(1)
+
+LEXTAB = "autofff_lextab"
+YACCTAB = "autofff_yacctab"
+
+_PARSER = None
+
+
+def tables_dir() -> str:
+    """Directory holding the lexer and parser tables built for the installed
+    pycparser, below the user's cache directory (``$XDG_CACHE_HOME``)."""
+    if sys.platform == "win32":
+        cacheHome = os.environ.get("LOCALAPPDATA")
+    else:
+        cacheHome = os.environ.get("XDG_CACHE_HOME")
+    if not cacheHome:
+        cacheHome = os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(
+        cacheHome, "autofff", "tables", f"pycparser-{pycparser.__version__}"
+    )
+
+
+def _has_bundled_tables() -> bool:
+    return all(
+        importlib.util.find_spec(f"pycparser.{name}") is not None
+        for name in ("lextab", "yacctab")
+    )
+
+
+def _load_table(directory: str, name: str) -> object:
+    spec = importlib.util.spec_from_file_location(
+        name, os.path.join(directory, name + ".py")
+    )
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def _build_tables(directory: str) -> None:
+    """Generate the tables into a private directory first and only then move
+    them into ``directory``, so that concurrent runs never read half written
+    tables."""
+    os.makedirs(directory, exist_ok=True)
+    buildDir = tempfile.mkdtemp(dir=directory, prefix=".build-")
+    try:
+        pycparser.CParser(lextab=LEXTAB, yacctab=YACCTAB, taboutputdir=buildDir)
+        for name in (LEXTAB, YACCTAB):
+            os.replace(
+                os.path.join(buildDir, name + ".py"),
+                os.path.join(directory, name + ".py"),
+            )
+    finally:
+        shutil.rmtree(buildDir, ignore_errors=True)
+    LOGGER.debug(f"Built pycparser's tables in {directory}.")
+
+
+def create_parser(directory: str = None) -> pycparser.CParser:
+    """Create a ``CParser`` reading optimized tables instead of generating
+    them. Unless pycparser comes with its own, the tables are built once and
+    kept in ``directory`` (default: ``tables_dir()``), which unlike
+    site-packages is writable by the user."""
+    if directory is None and _has_bundled_tables():
+        return pycparser.CParser()
+    if directory is None:
+        directory = tables_dir()
+    try:
+        try:
+            tables = [_load_table(directory, name) for name in (LEXTAB, YACCTAB)]
+        except (OSError, ImportError):
+            _build_tables(directory)
+            tables = [_load_table(directory, name) for name in (LEXTAB, YACCTAB)]
+        return pycparser.CParser(lextab=tables[0], yacctab=tables[1])
+    except (OSError, ImportError) as e:
+        LOGGER.debug(f"Unable to use pycparser's tables in {directory}: {e}")
+    # Without a usable cache directory, build the tables in memory only
+    with tempfile.TemporaryDirectory(prefix="autofff-tables-") as buildDir:
+        return pycparser.CParser(lextab=LEXTAB, yacctab=YACCTAB, taboutputdir=buildDir)
+
+
+def get_parser() -> pycparser.CParser:
+    """Return the parser shared by all scans of this process."""
+    global _PARSER
+    if _PARSER is None:
+        _PARSER = create_parser()
+    return _PARSER
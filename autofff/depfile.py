@@ -0,0 +1,62 @@
+import logging
+import sys
+
+LOGGER = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    LOGGER.error("Module is not intended to run as '__main__'!")
+    sys.exit(1)
+
+
+def _split_words(line: str) -> list:
+    words = []
+    word = ""
+    i = 0
+    while i < len(line):
+        char = line[i]
+        if char == "\\" and line[i + 1 : i + 2] in (" ", "#"):
+            word += line[i + 1]
+            i += 2
+        elif char == "$" and line[i + 1 : i + 2] == "$":
+            word += "$"
+            i += 2
+        elif char.isspace():
+            if word:
+                words.append(word)
+                word = ""
+            i += 1
+        else:
+            word += char
+            i += 1
+    if word:
+        words.append(word)
+    return words
+
+
+def parse_depfile(text: str) -> list:
+    """Return the prerequisites of the first rule in a make-style depfile."""
+    text = text.replace("\\\r\n", " ").replace("\\\n", " ")
+    for line in text.splitlines():
+        words = _split_words(line)
+        for index, word in enumerate(words):
+            if word.endswith(":"):
+                return list(dict.fromkeys(words[index + 1 :]))
+    return []
+
+
+def escape_path(path: str) -> str:
+    return path.replace(" ", "\\ ").replace("#", "\\#").replace("$", "$$")
+
+
+def format_depfile(targets: list, prerequisites: list, phony: bool = False) -> str:
+    """Format a make-style depfile, understood by make and ninja alike. If
+    ``phony`` is set, an empty rule is added for every prerequisite (like
+    GCC's '-MP') so that deleted headers don't break the build."""
+    lines = [
+        " ".join(escape_path(target) for target in targets)
+        + ":"
+        + "".join(f" \\\n  {escape_path(path)}" for path in prerequisites)
+    ]
+    if phony:
+        lines += [f"\n{escape_path(path)}:" for path in prerequisites]
+    return "\n".join(lines) + "\n"
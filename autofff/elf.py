@@ -0,0 +1,237 @@
+import logging
+import mmap
+import os.path
+import struct
+import sys
+
+LOGGER = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    LOGGER.error("Module is not intended to run as '__main__'!")
+    sys.exit(1)
+
+ELF_MAGIC = b"\x7fELF"
+AR_MAGIC = b"!<arch>\n"
+THIN_AR_MAGIC = b"!<thin>\n"
+
+_ELFCLASS32 = 1
+_ELFCLASS64 = 2
+_ELFDATA2LSB = 1
+_ELFDATA2MSB = 2
+
+_SHT_SYMTAB = 2
+_SHT_DYNSYM = 11
+
+_SHN_UNDEF = 0
+
+_STB_LOCAL = 0
+
+_STT_FUNC = 2
+_STT_GNU_IFUNC = 10
+_FUNCTION_TYPES = (_STT_FUNC, _STT_GNU_IFUNC)
+
+# Per ELF class: offset and format of e_shoff, offset and format of e_shentsize,
+# e_shnum and e_shstrndx, the section header's format and its fields used
+# (sh_type, sh_offset, sh_size, sh_link, sh_entsize) and the symbol's format
+# along with the indices of st_name, st_info and st_shndx
+_LAYOUTS = {
+    _ELFCLASS32: (
+        0x20,
+        "I",
+        0x2E,
+        "HHH",
+        "IIIIIIIIII",
+        (1, 4, 5, 6, 9),
+        "IIIBBH",
+        (0, 3, 5),
+    ),
+    _ELFCLASS64: (
+        0x28,
+        "Q",
+        0x3A,
+        "HHH",
+        "IIQQQQIIQQ",
+        (1, 4, 5, 6, 9),
+        "IBBHQQ",
+        (0, 1, 3),
+    ),
+}
+
+_AR_HEADER_SIZE = 60
+_AR_HEADER_MAGIC = b"`\n"
+
+
+class ElfException(Exception):
+    pass
+
+
+class SymbolTable:
+    """The symbols of an object file relevant for faking. ``member`` names the
+    object (as 'archive(member)' for members of archives),
+    ``definedFunctions`` holds the names of functions the object exports and
+    ``undefined`` the names of all symbols it references but doesn't define.
+    Symbols local to the object are left out."""
+
+    __slots__ = ("member", "definedFunctions", "undefined")
+
+    def __init__(self, member: str, definedFunctions: set, undefined: set) -> None:
+        self.member = member
+        self.definedFunctions = definedFunctions
+        self.undefined = undefined
+
+
+def _read_elf(data, base: int, end: int, member: str) -> SymbolTable:
+    """Read the symbol table of the ELF file at ``data[base:end]``."""
+    if end - base < 0x34 or data[base : base + 4] != ELF_MAGIC:
+        raise ElfException(f"{member} is not an ELF file.")
+    elfClass = data[base + 4]
+    if elfClass not in _LAYOUTS:
+        raise ElfException(f"{member} has an unknown ELF class {elfClass}.")
+    byteOrder = {_ELFDATA2LSB: "<", _ELFDATA2MSB: ">"}.get(data[base + 5])
+    if byteOrder is None:
+        raise ElfException(f"{member} has an unknown byte order {data[base + 5]}.")
+    (
+        shoffOffset,
+        shoffFormat,
+        shnumOffset,
+        shnumFormat,
+        sectionFormat,
+        sectionFields,
+        symbolFormat,
+        symbolFields,
+    ) = _LAYOUTS[elfClass]
+    sectionStruct = struct.Struct(byteOrder + sectionFormat)
+    symbolStruct = struct.Struct(byteOrder + symbolFormat)
+    typeField, offsetField, sizeField, linkField, entsizeField = sectionFields
+    nameField, infoField, shndxField = symbolFields
+
+    try:
+        (shoff,) = struct.unpack_from(byteOrder + shoffFormat, data, base + shoffOffset)
+        shentsize, shnum, _ = struct.unpack_from(
+            byteOrder + shnumFormat, data, base + shnumOffset
+        )
+        if shoff == 0:
+            return SymbolTable(member, set(), set())
+        if shentsize < sectionStruct.size:
+            raise ElfException(f"{member} has an invalid section header size.")
+        if shnum == 0:
+            # Extended section numbering, the count lives in section 0
+            shnum = sectionStruct.unpack_from(data, base + shoff)[sizeField]
+
+        sections = [
+            sectionStruct.unpack_from(data, base + shoff + index * shentsize)
+            for index in range(shnum)
+        ]
+    except struct.error:
+        raise ElfException(f"{member} has truncated section headers.")
+
+    # Prefer the full symbol table, stripped shared objects only have .dynsym
+    symbolSections = [s for s in sections if s[typeField] == _SHT_SYMTAB] or [
+        s for s in sections if s[typeField] == _SHT_DYNSYM
+    ]
+    definedFunctions = set()
+    undefined = set()
+    for section in symbolSections:
+        start = base + section[offsetField]
+        stop = start + section[sizeField]
+        if section[linkField] >= len(sections) or stop > end:
+            raise ElfException(f"{member} has a truncated symbol table.")
+        if section[entsizeField] not in (0, symbolStruct.size):
+            raise ElfException(f"{member} has an invalid symbol size.")
+        strtab = sections[section[linkField]]
+        strtabStart = base + strtab[offsetField]
+        strtabEnd = min(strtabStart + strtab[sizeField], end)
+        stop -= (stop - start) % symbolStruct.size
+
+        for symbol in symbolStruct.iter_unpack(data[start:stop]):
+            info = symbol[infoField]
+            if info >> 4 == _STB_LOCAL or symbol[nameField] == 0:
+                continue
+            if symbol[shndxField] == _SHN_UNDEF:
+                names = undefined
+            elif info & 0xF in _FUNCTION_TYPES:
+                names = definedFunctions
+            else:
+                continue
+            nameStart = strtabStart + symbol[nameField]
+            nameEnd = data.find(b"\0", nameStart, strtabEnd)
+            if nameEnd < 0:
+                raise ElfException(f"{member} has a truncated string table.")
+            names.add(data[nameStart:nameEnd].decode(errors="replace"))
+    return SymbolTable(member, definedFunctions, undefined)
+
+
+def _read_archive(data, filename: str, thin: bool) -> list:
+    tables = []
+    longNames = b""
+    offset = len(AR_MAGIC)
+    while offset + _AR_HEADER_SIZE <= len(data):
+        header = data[offset : offset + _AR_HEADER_SIZE]
+        if header[58:60] != _AR_HEADER_MAGIC:
+            raise ElfException(f"{filename} has a corrupt archive member header.")
+        name = header[0:16].rstrip(b" ")
+        try:
+            size = int(header[48:58])
+        except ValueError:
+            raise ElfException(f"{filename} has a corrupt archive member size.")
+        start = offset + _AR_HEADER_SIZE
+        offset = start + size + (size & 1)
+        # Thin archives only store their symbol index and long names
+        isIndex = name in (b"//", b"/", b"/SYM64/", b"__.SYMDEF", b"__.SYMDEF SORTED")
+        if (isIndex or not thin) and start + size > len(data):
+            raise ElfException(f"{filename} has a truncated archive member.")
+
+        if name == b"//":
+            longNames = data[start : start + size]
+            continue
+        elif isIndex:
+            continue
+        try:
+            if name.startswith(b"#1/"):
+                # BSD style, the name precedes the member's data
+                nameSize = int(name[3:])
+                if not 0 <= nameSize <= size:
+                    raise ValueError(f"name size {nameSize} exceeds the member")
+                name = data[start : start + nameSize].rstrip(b"\0")
+                start += nameSize
+                size -= nameSize
+            elif name.startswith(b"/"):
+                nameStart = int(name[1:])
+                name = longNames[nameStart : longNames.index(b"/\n", nameStart)]
+            else:
+                name = name.rstrip(b"/")
+        except (ValueError, IndexError) as e:
+            raise ElfException(f"{filename} has a corrupt archive member name: {e}")
+        member = f"{filename}({name.decode(errors='replace')})"
+
+        if thin:
+            # Members of thin archives are referenced by their path
+            path = os.path.join(os.path.dirname(filename), os.fsdecode(name))
+            tables += read_symbol_tables(path)
+            offset = start
+            continue
+        if data[start : start + 4] != ELF_MAGIC:
+            LOGGER.debug(f"Skipping archive member {member}, not an ELF file.")
+            continue
+        tables.append(_read_elf(data, start, start + size, member))
+    if data[offset:].strip(b"\n"):
+        raise ElfException(f"{filename} has a truncated archive member header.")
+    return tables
+
+
+def read_symbol_tables(filename: str) -> list:
+    """Return the ``SymbolTable`` of an ELF object file (or shared object), or
+    those of each object in an 'ar' archive. The file is mapped into memory
+    instead of being read, so that only the symbol tables are paged in."""
+    with open(filename, "rb") as fp:
+        try:
+            data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise ElfException(f"{filename} is empty.")
+    with data:
+        magic = data[:8]
+        if magic == AR_MAGIC or magic == THIN_AR_MAGIC:
+            return _read_archive(data, filename, magic == THIN_AR_MAGIC)
+        elif magic[:4] == ELF_MAGIC:
+            return [_read_elf(data, 0, len(data), filename)]
+        raise ElfException(f"{filename} is neither an ELF file nor an archive.")
@@ -1,15 +1,7 @@
-from pycparser.c_ast import (
-    Decl,
-    EllipsisParam,
-    FuncDef,
-    IdentifierType,
-    TypeDecl,
-    Typedef,
-)
-import autofff.utils as utils
-import autofff.scanner as scanner
+import autofff.model as model
+import autofff.timings as timings
 import autofff.config as c
-from autofff.config import CONFIG
+from autofff.output import format_source_path, write_if_changed
 
 from abc import ABC, abstractmethod
 import io
@@ -20,9 +12,6 @@ import re
 
 from overrides import overrides
 
-import pycparser
-import pycparser.c_generator
-
 LOGGER = logging.getLogger(__name__)
 
 if __name__ == "__main__":
@@ -32,10 +21,10 @@ if __name__ == "__main__":
 
 class FakeGenerator(ABC):
     def __init__(self) -> None:
-        self.cGen = pycparser.c_generator.CGenerator()
+        pass
 
     @abstractmethod
-    def generate(self, result: scanner.ScannerResult, output: io.IOBase) -> None:
+    def generate(self, result: model.ScannerResult, output: io.IOBase) -> None:
         pass
 
 
@@ -47,127 +36,81 @@ class BareFakeGenerator(FakeGenerator):
     def __init__(self) -> None:
         super().__init__()
 
-    def _generateTypeDefForDecl(self, decl: Decl) -> str:
-        typedefs = ""
-        for param in filter(
-            lambda p: utils.is_function_pointer_type(p.type), decl.type.args.params
-        ):
-            name = utils.create_typedef_name_for_fnc_ptr(decl, param)
-
-            type = param.type.type.type
-            while not hasattr(type, "declname"):
-                type = type.type
-            type.declname = name
-            typedef = Typedef(name, param.quals, ["typedef"], param.type)
-
-            param.type = TypeDecl(
-                param.name, param.type.quals, None, IdentifierType([name])
-            )
-            typedefs += f"{self.cGen.visit_Typedef(typedef)};\n"
-        return typedefs
+    def _generateTypeDefForDecl(self, function: model.Function) -> str:
+        return "".join(
+            f"{functionPointer.typedef};\n"
+            for functionPointer in function.functionPointers
+        )
 
-    def _generateBypassForFuncDef(self, funcDef: FuncDef) -> str:
-        funcName = funcDef.decl.name
+    def _generateBypassForFuncDef(self, function: model.Function) -> str:
+        funcName = function.name
         bypass = f"#define {funcName} {funcName}_fff\n"
         bypass += f"#define {funcName}_fake {funcName}_fff_fake\n"
         bypass += f"#define {funcName}_reset {funcName}_fff_reset\n"
         return bypass
 
-    def _generateFakeForDecl(self, decl: Decl) -> str:
-        funcName = decl.name
-        returnType = utils.get_type_name(decl.type)
-        if decl.type.args is not None and any(
-            map(lambda p: isinstance(p, EllipsisParam), decl.type.args.params)
-        ):
-            vararg = "_VARARG"
+    def _generateFakeForDecl(
+        self, function: model.Function, macroPrefix: str = ""
+    ) -> str:
+        vararg = "_VARARG" if function.isVariadic else ""
+        if function.returnType == "void":
+            fake = f"{macroPrefix}FAKE_VOID_FUNC{vararg}({function.name}"
         else:
-            vararg = ""
-        if returnType == "void":
-            fake = f"FAKE_VOID_FUNC{vararg}({funcName}"
-        else:
-            fake = f"FAKE_VALUE_FUNC{vararg}({returnType}, {funcName}"
-        if decl.type.args is None:
-            pass
-        elif len(decl.type.args.params) > 1 or (
-            not isinstance(decl.type.args.params[0], EllipsisParam)
-            and utils.get_type_name(decl.type.args.params[0]) != "void"
-        ):
-            for param in decl.type.args.params:
-                if isinstance(param, EllipsisParam):
-                    fake += ", ..."
-                else:
-                    fake += f", {utils.get_type_name(param)}"
+            fake = f"{macroPrefix}FAKE_VALUE_FUNC{vararg}({function.returnType}, {function.name}"
+        for param in function.parameters:
+            fake += f", {param.type}"
+        if function.isVariadic and function.parameters:
+            fake += ", ..."
         LOGGER.debug(f"Creating fake {fake});...")
         fake += ");\n"
         return fake
 
     @overrides
-    def generate(self, result: scanner.ScannerResult, output: io.IOBase) -> None:
-        for decl in filter(
-            lambda decl: decl.type.args is not None
-            and any(
-                map(
-                    lambda param: (
-                        not isinstance(param, EllipsisParam)
-                        and utils.is_function_pointer_type(param.type)
-                    ),
-                    decl.type.args.params,
-                )
-            ),
-            result.declarations,
-        ):
-            output.write(self._generateTypeDefForDecl(decl))
-        for defin in filter(
-            lambda defin: defin.decl.type.args is not None
-            and any(
-                map(
-                    lambda param: (
-                        not isinstance(param, EllipsisParam)
-                        and utils.is_function_pointer_type(param.type)
-                    ),
-                    defin.decl.type.args.params,
-                )
-            ),
-            result.definitions,
-        ):
-            output.write(self._generateTypeDefForDecl(defin.decl))
-
-        for decl in result.declarations:
-            output.write(self._generateFakeForDecl(decl))
-
-        for definition in result.definitions:
-            output.write(self._generateBypassForFuncDef(definition))
-            output.write(self._generateFakeForDecl(definition.decl))
+    def generate(self, result: model.ScannerResult, output: io.IOBase) -> None:
+        for function in result.declarations + result.definitions:
+            output.write(self._generateTypeDefForDecl(function))
+
+        for function in result.declarations:
+            output.write(self._generateFakeForDecl(function))
+
+        for function in result.definitions:
+            output.write(self._generateBypassForFuncDef(function))
+            output.write(self._generateFakeForDecl(function))
 
 
 class SimpleFakeGenerator(BareFakeGenerator):
+    # Prefix of the fff macros written to the test-header
+    headerMacroPrefix = ""
+
     def __init__(
         self,
         fakeName: str,
-        originalHeader: str,
+        originalHeader,
         includeFiles: list = None,
         generateIncludeGuard: bool = None,
     ) -> None:
+        """``originalHeader`` is the path of the header wrapped by the
+        test-header, or a list of paths if there are several."""
         super().__init__()
         self.fakeName = fakeName
         self.originalHeader = originalHeader
         self.includeFiles = includeFiles
         if generateIncludeGuard is None:
-            self.generateIncludeGuard = CONFIG[c.AUTOFFF_SECTION][
+            self.generateIncludeGuard = c.CONFIG[c.AUTOFFF_SECTION][
                 c.SIMPLE_GENERATOR_SECTION
             ][c.SIMPLE_GENERATOR_GENERATE_INCLUDE_GUARD]
         else:
             self.generateIncludeGuard = generateIncludeGuard
 
     @overrides
-    def generate(self, result: scanner.ScannerResult, output: io.IOBase) -> None:
+    def generate(self, result: model.ScannerResult, output: io.IOBase) -> None:
         if self.generateIncludeGuard:
             incGuard = os.path.splitext(os.path.basename(self.fakeName.upper()))[0]
             if incGuard[0].isdigit():
                 incGuard = "_" + incGuard
 
             fffHeader = os.path.expandvars(
-                CONFIG[c.AUTOFFF_SECTION][c.SIMPLE_GENERATOR_SECTION][
+                c.CONFIG[c.AUTOFFF_SECTION][c.SIMPLE_GENERATOR_SECTION][
                     c.SIMPLE_GENERATOR_FFF_PATH
                 ]
             )
@@ -182,9 +125,14 @@ class SimpleFakeGenerator(BareFakeGenerator):
                 incGuardBeginning += [
                     f'#include "{os.path.basename(f)}"\n' for f in self.includeFiles
                 ]
-            incGuardBeginning += (
-                f'#include "{os.path.basename(self.originalHeader)}"\n\n'
-            )
+            if isinstance(self.originalHeader, str):
+                originalHeaders = [self.originalHeader]
+            else:
+                originalHeaders = self.originalHeader
+            incGuardBeginning += [
+                f'#include "{os.path.basename(h)}"\n' for h in originalHeaders
+            ]
+            incGuardBeginning += "\n"
             incGuardBeginning += '#ifdef __cplusplus\nextern "C" { \n #endif\n'
             incGuardEnd = [
                 "#ifdef __cplusplus\n}\n#endif\n",
@@ -192,43 +140,173 @@ class SimpleFakeGenerator(BareFakeGenerator):
             ]
             output.writelines(incGuardBeginning)
 
-        for decl in filter(
-            lambda decl: decl.type.args is not None
-            and any(
-                map(
-                    lambda param: (
-                        not isinstance(param, EllipsisParam)
-                        and utils.is_function_pointer_type(param.type)
-                    ),
-                    decl.type.args.params,
-                )
-            ),
-            result.declarations,
-        ):
-            output.write(self._generateTypeDefForDecl(decl))
-        for defin in filter(
-            lambda defin: defin.decl.type.args is not None
-            and any(
-                map(
-                    lambda param: (
-                        not isinstance(param, EllipsisParam)
-                        and utils.is_function_pointer_type(param.type)
-                    ),
-                    defin.decl.type.args.params,
-                )
-            ),
-            result.definitions,
-        ):
-            output.write(self._generateTypeDefForDecl(defin.decl))
+        for function in result.declarations + result.definitions:
+            output.write(self._generateTypeDefForDecl(function))
 
         output.write("\n")
-        for decl in result.declarations:
-            output.write(self._generateFakeForDecl(decl))
+        for function in result.declarations:
+            output.write(self._generateFakeForDecl(function, self.headerMacroPrefix))
 
         output.write("\n")
-        for definition in result.definitions:
-            output.write(self._generateBypassForFuncDef(definition))
-            output.write(self._generateFakeForDecl(definition.decl))
+        for function in result.definitions:
+            output.write(self._generateBypassForFuncDef(function))
+            output.write(self._generateFakeForDecl(function, self.headerMacroPrefix))
 
         if self.generateIncludeGuard:
             output.writelines(incGuardEnd)
+
+
+class SplitFakeGenerator(SimpleFakeGenerator):
+    """Generate a test-header only declaring the fakes (``DECLARE_FAKE_*``),
+    along with a source file defining them (``DEFINE_FAKE_*``). The source
+    file is to be compiled once, rather than every test including the
+    test-header compiling all fakes again."""
+
+    headerMacroPrefix = "DECLARE_"
+
+    def __init__(
+        self,
+        fakeName: str,
+        originalHeader,
+        includeFiles: list = None,
+        headerFile: str = None,
+        generateIncludeGuard: bool = None,
+    ) -> None:
+        """``headerFile`` is the path of the test-header, to be included by
+        the source file."""
+        super().__init__(fakeName, originalHeader, includeFiles, generateIncludeGuard)
+        self.headerFile = headerFile or f"{fakeName}.h"
+
+    def generate_source(self, result: model.ScannerResult, output: io.IOBase) -> None:
+        # The test-header already brings along fff.h, the typedefs and the
+        # bypass defines of in-header defined functions
+        output.write(f'#include "{os.path.basename(self.headerFile)}"\n\n')
+        output.write('#ifdef __cplusplus\nextern "C" {\n#endif\n')
+        for function in result.declarations + result.definitions:
+            output.write(self._generateFakeForDecl(function, "DEFINE_"))
+        output.write("#ifdef __cplusplus\n}\n#endif\n")
+
+
+GENERATOR_TYPES = {
+    c.BARE_GENERATOR_TYPE: lambda *args, **kwargs: BareFakeGenerator(),
+    c.SIMPLE_GENERATOR_TYPE: lambda *args, **kwargs: SimpleFakeGenerator(
+        *args, **kwargs
+    ),
+    c.SPLIT_GENERATOR_TYPE: lambda *args, **kwargs: SplitFakeGenerator(*args, **kwargs),
+}
+
+
+def create_generator(
+    outputFile: str, originalHeader, includeFiles: list = None, split: bool = False
+) -> FakeGenerator:
+    """Create the configured generator, or a ``SplitFakeGenerator`` if
+    ``split`` is set."""
+    if split:
+        generatorType = c.SPLIT_GENERATOR_TYPE
+    else:
+        generatorType = c.CONFIG[c.AUTOFFF_SECTION][c.GENERATOR_TYPE]
+    kwargs = {}
+    if generatorType == c.SPLIT_GENERATOR_TYPE:
+        kwargs["headerFile"] = outputFile
+    return GENERATOR_TYPES[generatorType](
+        os.path.splitext(os.path.basename(outputFile))[0],
+        originalHeader,
+        includeFiles,
+        **kwargs,
+    )
+
+
+def format_source_output(outputFile: str, sourceFile: str = None) -> str:
+    """Return the path of the source file defining the fakes of the
+    test-header ``outputFile``. Unless given explicitly as ``sourceFile``,
+    it's only written by the 'split' generator, next to the test-header."""
+    if sourceFile is not None:
+        return sourceFile.strip()
+    if c.CONFIG[c.AUTOFFF_SECTION][c.GENERATOR_TYPE] != c.SPLIT_GENERATOR_TYPE:
+        return None
+    return format_source_path(
+        outputFile,
+        c.CONFIG[c.AUTOFFF_SECTION][c.SPLIT_GENERATOR_SECTION][
+            c.SPLIT_GENERATOR_SOURCE_SUFFIX
+        ],
+    )
+
+
+def render(gen: FakeGenerator, result: model.ScannerResult) -> str:
+    LOGGER.info(
+        f"Function declarations found: {', '.join( [ f.name for f in result.declarations ])}."
+    )
+    LOGGER.info(
+        f"Function definitions found: {', '.join( [ f.name for f in result.definitions ])}."
+    )
+
+    output = io.StringIO()
+    gen.generate(result, output)
+    return output.getvalue()
+
+
+def render_source(gen: SplitFakeGenerator, result: model.ScannerResult) -> str:
+    output = io.StringIO()
+    gen.generate_source(result, output)
+    return output.getvalue()
+
+
+def render_outputs(
+    gen: FakeGenerator,
+    result: model.ScannerResult,
+    outputFile: str,
+    sourceFile: str = None,
+) -> dict:
+    """Return the text of the test-header ``outputFile`` and, if the fakes are
+    split off into ``sourceFile``, of that as well, by their paths."""
+    outputs = {outputFile: render(gen, result)}
+    if sourceFile is not None:
+        outputs[sourceFile] = render_source(gen, result)
+    return outputs
+
+
+def _generate_scanned(
+    header: model.ScannedHeader, outputFile: str, sourceFile: str = None
+) -> None:
+    sourceFile = format_source_output(outputFile, sourceFile)
+    gen = create_generator(
+        outputFile,
+        header.headers or header.inputFile,
+        header.includeFiles,
+        split=sourceFile is not None,
+    )
+    LOGGER.info(f"Generating output file {outputFile}...")
+    with timings.phase("render", header.inputFile):
+        outputs = render_outputs(gen, header.result, outputFile, sourceFile)
+    with timings.phase("write", header.inputFile):
+        for filename, outputText in outputs.items():
+            write_if_changed(filename, outputText)
+
+
+def generate_scanned(
+    headers: list, outputFiles: list, profileDir: str = None, sourceFiles: list = None
+) -> list:
+    """Generate the fakes of each ``ScannedHeader`` into the corresponding
+    output file (and source file, if given). Returns the list of output
+    files that failed."""
+    failedOutputs = []
+    if sourceFiles is None:
+        sourceFiles = [None] * len(headers)
+    for header, outputFile, sourceFile in zip(headers, outputFiles, sourceFiles):
+        try:
+            timings.profiled(
+                profileDir,
+                header.inputFile,
+                _generate_scanned,
+                header,
+                outputFile,
+                sourceFile,
+            )
+        except Exception as e:
+            LOGGER.error(f"Generation of {outputFile} failed: {e}")
+            LOGGER.debug("Details:", exc_info=True)
+            failedOutputs.append(outputFile)
+    LOGGER.info(
+        f"Generation complete! {len(headers) - len(failedOutputs)} of {len(headers)} succeeded."
+    )
+    return failedOutputs
@@ -0,0 +1,376 @@
+import autofff.model as model
+from autofff.cache import file_digest
+
+import fnmatch
+import json
+import logging
+import os
+import os.path
+import pathlib
+import sqlite3
+import sys
+
+LOGGER = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    LOGGER.error("Module is not intended to run as '__main__'!")
+    sys.exit(1)
+
+# Bump whenever the schema changes, older indices are rebuilt from scratch then
+SCHEMA_VERSION = 1
+SQLITE_MAGIC = b"SQLite format 3\x00"
+
+DEFAULT_PATTERN = "*.h"
+
+DECLARATION = "declaration"
+DEFINITION = "definition"
+
+_SCHEMA = """
+CREATE TABLE headers (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    fingerprint TEXT NOT NULL,
+    includeFiles TEXT
+);
+CREATE TABLE files (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    size INTEGER NOT NULL,
+    mtime INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE dependencies (
+    header INTEGER NOT NULL REFERENCES headers(id) ON DELETE CASCADE,
+    file INTEGER NOT NULL REFERENCES files(id),
+    PRIMARY KEY (header, file)
+) WITHOUT ROWID;
+CREATE TABLE functions (
+    id INTEGER PRIMARY KEY,
+    header INTEGER NOT NULL REFERENCES headers(id) ON DELETE CASCADE,
+    kind TEXT NOT NULL,
+    name TEXT NOT NULL,
+    line INTEGER,
+    returnType TEXT NOT NULL,
+    parameters TEXT NOT NULL,
+    isVariadic INTEGER NOT NULL,
+    functionPointers TEXT NOT NULL
+);
+CREATE INDEX functions_by_name ON functions(name);
+CREATE INDEX functions_by_header ON functions(header);
+CREATE INDEX dependencies_by_file ON dependencies(file);
+"""
+
+_TABLES = ("functions", "dependencies", "files", "headers")
+
+
+class IndexException(Exception):
+    pass
+
+
+def is_index(filename: str) -> bool:
+    """Whether ``filename`` is an SQLite database, rather than a scan file."""
+    try:
+        with open(filename, "rb") as fp:
+            return fp.read(len(SQLITE_MAGIC)) == SQLITE_MAGIC
+    except OSError:
+        return False
+
+
+def crawl(paths: list, pattern: str = DEFAULT_PATTERN) -> list:
+    """Return the files below the directories in ``paths`` whose name matches
+    ``pattern``, in a stable order. Files given directly are taken as they are."""
+    headers = []
+    for path in paths:
+        if not os.path.isdir(path):
+            headers.append(path)
+            continue
+        for directory, dirnames, filenames in os.walk(path):
+            dirnames.sort()
+            headers += [
+                os.path.join(directory, filename)
+                for filename in sorted(filenames)
+                if fnmatch.fnmatch(filename, pattern)
+            ]
+    return list(dict.fromkeys(map(os.path.normpath, headers)))
+
+
+def format_signature(function: model.Function) -> str:
+    parameters = [
+        f"{parameter.type} {parameter.name}" if parameter.name else parameter.type
+        for parameter in function.parameters
+    ]
+    if function.isVariadic:
+        parameters.append("...")
+    return f"{function.returnType} {function.name}({', '.join(parameters) or 'void'})"
+
+
+def _function_from_row(row: tuple) -> model.Function:
+    name, line, returnType, parameters, isVariadic, functionPointers = row
+    return model.Function(
+        name,
+        returnType,
+        [model.Parameter(*parameter) for parameter in json.loads(parameters)],
+        bool(isVariadic),
+        [model.FunctionPointer(*fp) for fp in json.loads(functionPointers)],
+        line,
+    )
+
+
+def _stamp(path: str) -> tuple:
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+class SymbolIndex:
+    """SQLite database of the functions declared and defined by headers, as
+    mined by the scanners, along with the files read while preprocessing each
+    header. A header only has to be rescanned if one of these files changed,
+    which is detected by their size and modification time first and by their
+    content's digest only if either differs."""
+
+    def __init__(self, filename: str, readOnly: bool = False) -> None:
+        self.filename = filename
+        try:
+            if readOnly:
+                uri = pathlib.Path(os.path.abspath(filename)).as_uri()
+                self.connection = sqlite3.connect(f"{uri}?mode=ro", uri=True)
+            else:
+                directory = os.path.dirname(filename)
+                if directory:
+                    os.makedirs(directory, exist_ok=True)
+                self.connection = sqlite3.connect(filename)
+            self.connection.execute("PRAGMA foreign_keys = ON")
+            version = self.connection.execute("PRAGMA user_version").fetchone()[0]
+            if version != SCHEMA_VERSION:
+                if readOnly:
+                    raise IndexException(
+                        f"{filename} has index schema version {version}, expected {SCHEMA_VERSION}. Update it via 'autofff index'."
+                    )
+                self._create_schema(version)
+        except (OSError, sqlite3.Error) as e:
+            raise IndexException(f"{filename} is not a valid index: {e}")
+
+    def __enter__(self) -> "SymbolIndex":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def _create_schema(self, version: int) -> None:
+        if version != 0:
+            LOGGER.info(
+                f"Index {self.filename} has schema version {version}, rebuilding it."
+            )
+        with self.connection:
+            for table in _TABLES:
+                self.connection.execute(f"DROP TABLE IF EXISTS {table}")
+            self.connection.executescript(_SCHEMA)
+            self.connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+    def _changed_files(self) -> set:
+        """Return the ids of the files changed since they were indexed,
+        updating the size and modification time of those merely touched."""
+        changed = set()
+        touched = []
+        for fileId, path, size, mtime, digest in self.connection.execute(
+            "SELECT id, path, size, mtime, digest FROM files"
+        ):
+            try:
+                stamp = _stamp(path)
+                if stamp == (size, mtime):
+                    continue
+                if file_digest(path) == digest:
+                    touched.append(stamp + (fileId,))
+                    continue
+            except OSError:
+                pass
+            changed.add(fileId)
+        if touched:
+            with self.connection:
+                self.connection.executemany(
+                    "UPDATE files SET size = ?, mtime = ? WHERE id = ?", touched
+                )
+        return changed
+
+    def stale(self, fingerprints: dict) -> list:
+        """Return the headers of ``fingerprints`` (by path) to be (re)scanned,
+        as they aren't indexed yet, were indexed with a different fingerprint
+        or depend on a file changed since."""
+        changed = self._changed_files()
+        indexed = {}
+        for headerId, path, fingerprint in self.connection.execute(
+            "SELECT id, path, fingerprint FROM headers"
+        ):
+            indexed[path] = (headerId, fingerprint)
+        dependents = set()
+        for fileId in changed:
+            dependents.update(
+                headerId
+                for headerId, in self.connection.execute(
+                    "SELECT header FROM dependencies WHERE file = ?", (fileId,)
+                )
+            )
+        stale = []
+        for path, fingerprint in fingerprints.items():
+            headerId, indexedFingerprint = indexed.get(path, (None, None))
+            if indexedFingerprint != fingerprint or headerId in dependents:
+                stale.append(path)
+        return stale
+
+    def _file_id(self, path: str) -> int:
+        size, mtime = _stamp(path)
+        self.connection.execute(
+            "INSERT INTO files (path, size, mtime, digest) VALUES (?, ?, ?, ?)"
+            " ON CONFLICT (path) DO UPDATE SET"
+            " size = excluded.size, mtime = excluded.mtime, digest = excluded.digest",
+            (path, size, mtime, file_digest(path)),
+        )
+        return self.connection.execute(
+            "SELECT id FROM files WHERE path = ?", (path,)
+        ).fetchone()[0]
+
+    def update(self, header: model.ScannedHeader, fingerprint: str) -> None:
+        """Replace what's indexed of ``header.inputFile`` by ``header``."""
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM headers WHERE path = ?", (header.inputFile,)
+            )
+            headerId = self.connection.execute(
+                "INSERT INTO headers (path, fingerprint, includeFiles) VALUES (?, ?, ?)",
+                (
+                    header.inputFile,
+                    fingerprint,
+                    json.dumps(header.includeFiles),
+                ),
+            ).lastrowid
+            dependencies = dict.fromkeys(
+                [header.inputFile] + list(header.dependencies or [])
+            )
+            self.connection.executemany(
+                "INSERT INTO dependencies (header, file) VALUES (?, ?)",
+                [(headerId, self._file_id(path)) for path in dependencies],
+            )
+            self.connection.executemany(
+                "INSERT INTO functions (header, kind, name, line, returnType,"
+                " parameters, isVariadic, functionPointers)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        headerId,
+                        kind,
+                        function.name,
+                        function.line,
+                        function.returnType,
+                        json.dumps(
+                            [[param.name, param.type] for param in function.parameters]
+                        ),
+                        function.isVariadic,
+                        json.dumps(
+                            [[fp.name, fp.typedef] for fp in function.functionPointers]
+                        ),
+                    )
+                    for kind, functions in (
+                        (DECLARATION, header.result.declarations),
+                        (DEFINITION, header.result.definitions),
+                    )
+                    for function in functions
+                ],
+            )
+
+    def remove(self, paths: list) -> None:
+        with self.connection:
+            self.connection.executemany(
+                "DELETE FROM headers WHERE path = ?", [(path,) for path in paths]
+            )
+
+    def prune(self) -> list:
+        """Remove the headers that no longer exist, as well as files no
+        header depends on anymore. Returns the paths of the headers removed."""
+        removed = [
+            path
+            for path, in self.connection.execute("SELECT path FROM headers")
+            if not os.path.exists(path)
+        ]
+        self.remove(removed)
+        with self.connection:
+            self.connection.execute(
+                "DELETE FROM files WHERE id NOT IN (SELECT file FROM dependencies)"
+            )
+        return removed
+
+    def lookup(self, pattern: str) -> list:
+        """Return the ``(header, kind, function)`` of each function whose name
+        matches the glob ``pattern`` (e.g. 'HAL_UART_*')."""
+        return [
+            (path, kind, _function_from_row(row))
+            for path, kind, *row in self.connection.execute(
+                "SELECT headers.path, kind, name, line, returnType, parameters,"
+                " isVariadic, functionPointers FROM functions"
+                " JOIN headers ON headers.id = functions.header"
+                " WHERE name GLOB ? ORDER BY name, headers.path, functions.id",
+                (pattern,),
+            )
+        ]
+
+    def headers(self, paths: list = None) -> list:
+        """Return each indexed header as ``ScannedHeader``, ordered by path.
+        Given ``paths``, only the headers at these paths (compared by their
+        real paths) are returned."""
+        rows = self.connection.execute(
+            "SELECT id, path, includeFiles FROM headers ORDER BY path"
+        ).fetchall()
+        condition = ""
+        if paths is not None:
+            realPaths = {os.path.realpath(path) for path in paths}
+            rows = [row for row in rows if os.path.realpath(row[1]) in realPaths]
+            condition = f" WHERE header IN ({', '.join(str(row[0]) for row in rows)})"
+
+        functions = {}
+        for headerId, kind, *row in self.connection.execute(
+            "SELECT header, kind, name, line, returnType, parameters, isVariadic,"
+            f" functionPointers FROM functions{condition} ORDER BY id"
+        ):
+            functions.setdefault((headerId, kind), []).append(_function_from_row(row))
+        dependencies = {}
+        for headerId, path in self.connection.execute(
+            "SELECT header, path FROM dependencies"
+            f" JOIN files ON files.id = dependencies.file{condition} ORDER BY files.path"
+        ):
+            dependencies.setdefault(headerId, []).append(path)
+        return [
+            model.ScannedHeader(
+                path,
+                json.loads(includeFiles),
+                dependencies.get(headerId, []),
+                model.ScannerResult(
+                    functions.get((headerId, DECLARATION), ()),
+                    functions.get((headerId, DEFINITION), ()),
+                ),
+            )
+            for headerId, path, includeFiles in rows
+        ]
+
+
+def update_index(symbolIndex: SymbolIndex, rnr: object, jobs: list) -> list:
+    """Bring the index up to date with the headers of ``jobs``, using the
+    runner ``rnr`` to rescan those that changed. Returns the failed jobs,
+    which are removed from the index."""
+    jobsByPath = {job.inputFile: job for job in jobs}
+    fingerprints = {path: rnr.fingerprint(job) for path, job in jobsByPath.items()}
+    stale = [jobsByPath[path] for path in symbolIndex.stale(fingerprints)]
+    LOGGER.info(f"{len(stale)} of {len(jobsByPath)} headers need to be (re)scanned.")
+    headers, failedJobs = rnr.scan(stale) if stale else ([], [])
+    for header in headers:
+        try:
+            symbolIndex.update(header, fingerprints[header.inputFile])
+        except OSError as e:
+            # A file read while preprocessing vanished in the meantime
+            LOGGER.error(f"Indexing of {header.inputFile} failed: {e}")
+            failedJobs.append(jobsByPath[header.inputFile])
+    symbolIndex.remove([job.inputFile for job in failedJobs])
+    for path in symbolIndex.prune():
+        LOGGER.info(f"Removed {path} from the index, as it no longer exists.")
+    return failedJobs
@@ -0,0 +1,134 @@
+import logging
+import sys
+
+LOGGER = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    LOGGER.error("Module is not intended to run as '__main__'!")
+    sys.exit(1)
+
+# Bump whenever the model changes, so that cached results are invalidated
+FORMAT_VERSION = 2
+
+
+class _Record:
+    """Base of the immutable, ``__slots__``-based model classes. Fields are
+    compared, hashed, printed and pickled in the order of ``__slots__``."""
+
+    __slots__ = ()
+
+    def __init__(self, *values) -> None:
+        for name, value in zip(self.__slots__, values, strict=True):
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name: str, value: object) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def __delattr__(self, name: str) -> None:
+        raise AttributeError(f"{type(self).__name__} is immutable")
+
+    def _values(self) -> tuple:
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __eq__(self, other: object) -> bool:
+        if type(other) is not type(self):
+            return NotImplemented
+        return self._values() == other._values()
+
+    def __hash__(self) -> int:
+        return hash(self._values())
+
+    def __repr__(self) -> str:
+        fields = ", ".join(
+            f"{name}={value!r}" for name, value in zip(self.__slots__, self._values())
+        )
+        return f"{type(self).__name__}({fields})"
+
+    def __reduce__(self) -> tuple:
+        return type(self), self._values()
+
+
+class Parameter(_Record):
+    """A function parameter. ``type`` is the rendered type name, with function
+    pointers replaced by the name of their typedef."""
+
+    __slots__ = ("name", "type")
+
+    def __init__(self, name: str, type: str) -> None:
+        super().__init__(name, type)
+
+
+class FunctionPointer(_Record):
+    """A typedef to be generated for a function pointer parameter, as FFF's
+    macros can't digest function pointer types themselves."""
+
+    __slots__ = ("name", "typedef")
+
+    def __init__(self, name: str, typedef: str) -> None:
+        super().__init__(name, typedef)
+
+
+class Function(_Record):
+    """A function declared or defined in a scanned header, reduced to what
+    fakes are generated from, plus the ``line`` of the header it's found at."""
+
+    __slots__ = (
+        "name",
+        "returnType",
+        "parameters",
+        "isVariadic",
+        "functionPointers",
+        "line",
+    )
+
+    def __init__(
+        self,
+        name: str,
+        returnType: str,
+        parameters: tuple = (),
+        isVariadic: bool = False,
+        functionPointers: tuple = (),
+        line: int = None,
+    ) -> None:
+        super().__init__(
+            name,
+            returnType,
+            tuple(parameters),
+            isVariadic,
+            tuple(functionPointers),
+            line,
+        )
+
+
+class ScannerResult(_Record):
+    """The functions declared and defined in a scanned header, as tuples of
+    ``Function``."""
+
+    __slots__ = ("declarations", "definitions")
+
+    def __init__(self, declarations: tuple, definitions: tuple) -> None:
+        super().__init__(tuple(declarations), tuple(definitions))
+
+
+class ScannedHeader(_Record):
+    """The ``ScannerResult`` of a header along with what's needed to generate
+    its fakes later on, as stored by 'autofff scan'. For object files,
+    ``headers`` lists the headers declaring their functions."""
+
+    __slots__ = ("inputFile", "includeFiles", "dependencies", "result", "headers")
+
+    def __init__(
+        self,
+        inputFile: str,
+        includeFiles: list,
+        dependencies: list,
+        result: ScannerResult,
+        headers: list = None,
+    ) -> None:
+        super().__init__(
+            inputFile,
+            None if includeFiles is None else tuple(includeFiles),
+            None if dependencies is None else tuple(dependencies),
+            result,
+            None if headers is None else tuple(headers),
+        )
@@ -0,0 +1,118 @@
+import logging
+import os
+import os.path
+import stat
+import sys
+import uuid
+
+LOGGER = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    LOGGER.error("Module is not intended to run as '__main__'!")
+    sys.exit(1)
+
+DEFAULT_OUTPUT_PATTERN = "{name}_th.h"
+MANIFEST_SUFFIX = ".autofff.json"
+
+
+def write_if_changed(filename: str, content) -> bool:
+    """Write ``content`` to ``filename`` unless the file already holds exactly
+    this content, which keeps its modification time and thereby spares
+    dependent targets from being rebuilt. ``content`` may be ``str`` or
+    ``bytes``. Safe to be called by concurrent processes, see
+    ``write_atomically``."""
+    binary = "b" if isinstance(content, bytes) else ""
+    try:
+        with open(filename, "r" + binary) as fp:
+            if fp.read() == content:
+                LOGGER.debug(f"{filename} is unchanged, not rewriting it.")
+                return False
+    except OSError:
+        pass
+
+    dirname = os.path.dirname(filename)
+    if dirname and not os.path.isdir(dirname):
+        # Parallel builds may well create the same directory at the same time
+        os.makedirs(dirname, exist_ok=True)
+        LOGGER.debug(f"New directory for output file created {dirname}.")
+
+    write_atomically(filename, content)
+    return True
+
+
+def write_atomically(filename: str, content) -> None:
+    """Write ``content`` to a temporary file next to ``filename``, which then
+    replaces it. Concurrent readers (e.g. compilers of a parallel build) thus
+    see either the previous or the new content, but never a partially
+    written file."""
+    binary = "b" if isinstance(content, bytes) else ""
+    try:
+        mode = stat.S_IMODE(os.stat(filename).st_mode)
+    except OSError:
+        mode = None
+    directory = os.path.dirname(filename) or os.curdir
+    while True:
+        tmpPath = os.path.join(
+            directory, f".{os.path.basename(filename)}.{uuid.uuid4().hex[:8]}.tmp"
+        )
+        try:
+            # Created like any new file, i.e. with the permissions granted by
+            # the umask (unlike mkstemp(), which only grants them to the owner)
+            fd = os.open(
+                tmpPath,
+                os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0),
+                0o666,
+            )
+            break
+        except FileExistsError:
+            continue
+    try:
+        with os.fdopen(fd, "w" + binary) as fp:
+            fp.write(content)
+        if mode is not None:
+            # Keep the permissions of the file replaced
+            os.chmod(tmpPath, mode)
+        os.replace(tmpPath, filename)
+    except BaseException:
+        try:
+            os.unlink(tmpPath)
+        except OSError:
+            pass
+        raise
+
+
+def format_output_path(
+    inputFile: str,
+    outputDir: str = None,
+    outputPattern: str = None,
+    variant: str = None,
+) -> str:
+    """Unless the pattern places the ``variant`` (of a define matrix) itself,
+    it's appended to the stem of the output file."""
+    if outputPattern is None:
+        outputPattern = DEFAULT_OUTPUT_PATTERN
+    stem, _ = os.path.splitext(inputFile)
+    outputFile = outputPattern.format(
+        name=os.path.basename(stem),
+        stem=stem,
+        dir=os.path.dirname(inputFile),
+        variant=variant or "",
+    )
+    if variant is not None and "{variant}" not in outputPattern:
+        outputFile = format_variant_path(outputFile, variant)
+    if outputDir is not None:
+        outputFile = os.path.join(outputDir, outputFile)
+    return os.path.normpath(outputFile)
+
+
+def format_variant_path(filename: str, variant: str) -> str:
+    stem, ext = os.path.splitext(filename.strip())
+    return f"{stem}_{variant}{ext}"
+
+
+def format_depfile_path(outputFile: str) -> str:
+    return os.path.splitext(outputFile.strip())[0] + ".d"
+
+
+def format_source_path(outputFile: str, suffix: str) -> str:
+    return os.path.splitext(outputFile.strip())[0] + suffix
@@ -0,0 +1,961 @@
+import autofff
+import autofff.depfile as depfile
+import autofff.generator as generator
+import autofff.model as model
+import autofff.timings as timings
+import autofff.config as c
+from autofff.cache import (
+    ChainedResultCache,
+    DiskResultCache,
+    PreprocessorCache,
+    ResultCache,
+    file_digest,
+)
+from autofff.output import (  # noqa: F401 (re-exported)
+    DEFAULT_OUTPUT_PATTERN,
+    MANIFEST_SUFFIX,
+    format_depfile_path,
+    format_output_path,
+    format_variant_path,
+    write_if_changed,
+)
+
+import hashlib
+import json
+import logging
+import os.path
+import pickle
+import re
+import sys
+import threading
+from typing import TYPE_CHECKING
+
+from overrides import overrides
+
+# The scanner (and with it pycparser) as well as the process pool are only
+# imported once needed, which keeps runs finding all outputs up to date fast
+if TYPE_CHECKING:
+    from concurrent.futures import ProcessPoolExecutor
+
+    import pycparser
+
+    import autofff.scanner as scanner
+
+LOGGER = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    LOGGER.error("Module is not intended to run as '__main__'!")
+    sys.exit(1)
+
+SCANNER_TYPES = {
+    c.GCC_HEADER_SCANNER_TYPE: lambda *args, **kwargs: autofff.scanner.GCCHeaderScanner(
+        *args, **kwargs
+    ),
+    c.GCC_OBJECT_SCANNER_TYPE: lambda *args, **kwargs: autofff.scanner.GCCObjectScanner(
+        *args, **kwargs
+    ),
+}
+
+GENERATOR_TYPES = generator.GENERATOR_TYPES
+
+
+class RunnerException(Exception):
+    pass
+
+
+class Job:
+    def __init__(
+        self,
+        inputFile: str,
+        outputFile: str,
+        fakes: list,
+        includes: list = None,
+        includeFiles: list = None,
+        defines: list = None,
+        depFile: str = None,
+        headers: list = None,
+        usedBy: list = None,
+        sourceFile: str = None,
+        variant: str = None,
+        variantGroup: object = None,
+    ) -> None:
+        """Jobs sharing a ``variantGroup`` are the ``variant``s of a define
+        matrix, differing only in their defines and output files."""
+        self.inputFile = inputFile
+        self.outputFile = outputFile
+        self.fakes = fakes
+        self.includes = includes
+        self.includeFiles = includeFiles
+        self.defines = defines
+        self.depFile = depFile
+        self.headers = headers
+        self.usedBy = usedBy
+        self.sourceFile = sourceFile
+        self.variant = variant
+        self.variantGroup = variantGroup
+
+
+class Runner:
+    def __init__(
+        self, parser: "pycparser.CParser" = None, resultCache: ResultCache = None
+    ) -> None:
+        self._parser = parser
+        self.resultCache = resultCache
+        self.preprocessorCache = None
+        self.diskResultCache = None
+        self.incremental = False
+        self.phonyDependencies = False
+        self.umbrella = False
+        self.trackDependencies = False
+        self.profileDir = None
+        self.jobCount = 0
+        self.failedJobCount = 0
+        self._configStamp = None
+        self._usedFunctions = {}
+        self._variants = {}
+        # Files read for each job's output, collected while watching only
+        self.jobDependencies = None
+
+    def get_parser(self) -> "pycparser.CParser":
+        # Building the parser's tables takes a while, so scanners are handed
+        # this method and only call it once an input actually needs parsing
+        if self._parser is None:
+            import autofff.cparser as cparser
+
+            self._parser = cparser.get_parser()
+        return self._parser
+
+    def load_config(self, filename: str) -> None:
+        filename = filename.strip()
+        try:
+            mtime = os.stat(filename).st_mtime_ns if filename else None
+        except OSError:
+            mtime = None
+        stamp = (os.path.abspath(filename) if filename else "", mtime)
+        if stamp == self._configStamp:
+            LOGGER.debug(f"Configuration '{filename}' is unchanged, skipping reload.")
+            return
+        c.load(filename)
+        self._configStamp = stamp
+
+    def set_cache_dir(self, cacheDir: str = None) -> None:
+        if cacheDir is None:
+            cacheDir = c.CONFIG[c.AUTOFFF_SECTION][c.CACHE_SECTION][c.CACHE_DIR]
+        if not cacheDir:
+            self.preprocessorCache = None
+            self.diskResultCache = None
+            return
+        maxSize = c.CONFIG[c.AUTOFFF_SECTION][c.CACHE_SECTION][c.CACHE_MAX_SIZE] << 20
+        directory = os.path.join(os.path.abspath(cacheDir), "cpp")
+        if (
+            self.preprocessorCache is None
+            or self.preprocessorCache.directory != directory
+            or self.preprocessorCache.maxSize != maxSize
+        ):
+            self.preprocessorCache = PreprocessorCache(directory, maxSize)
+        directory = os.path.join(os.path.abspath(cacheDir), "results")
+        if (
+            self.diskResultCache is None
+            or self.diskResultCache.directory != directory
+            or self.diskResultCache.maxSize != maxSize
+        ):
+            self.diskResultCache = DiskResultCache(directory, maxSize)
+
+    def _scanner_result_cache(self) -> ResultCache:
+        caches = [
+            cache
+            for cache in (self.resultCache, self.diskResultCache)
+            if cache is not None
+        ]
+        if len(caches) > 1:
+            return ChainedResultCache(*caches)
+        return caches[0] if caches else None
+
+    def create_scanner(self, job: Job) -> "scanner.Scanner":
+        scannerType = c.CONFIG[c.AUTOFFF_SECTION][c.SCANNER_TYPE]
+        kwargs = {}
+        if scannerType == c.GCC_OBJECT_SCANNER_TYPE:
+            kwargs["headers"] = job.headers
+        return SCANNER_TYPES[scannerType](
+            inputFile=job.inputFile,
+            fakes=job.fakes,
+            includes=job.includes,
+            includeFiles=job.includeFiles,
+            defines=job.defines,
+            parser=self.get_parser,
+            resultCache=self._scanner_result_cache(),
+            preprocessorCache=self.preprocessorCache,
+            trackDependencies=self.trackDependencies
+            or self.incremental
+            or job.depFile is not None,
+            **kwargs,
+        )
+
+    def create_source_scanner(
+        self, job: Job, source: str
+    ) -> "scanner.GCCSourceScanner":
+        return autofff.scanner.GCCSourceScanner(
+            inputFile=source,
+            fakes=job.fakes,
+            includes=job.includes,
+            includeFiles=job.includeFiles,
+            defines=job.defines,
+            parser=self.get_parser,
+            preprocessorCache=self.preprocessorCache,
+            trackDependencies=True,
+        )
+
+    def used_functions(self, job: Job) -> tuple:
+        """Return the names of the functions referenced by the job's
+        code-under-test sources, along with the files read while
+        preprocessing them. Sources sharing the same flags are only scanned
+        once per call of ``run`` or ``scan``."""
+        key = json.dumps(
+            [job.usedBy, job.fakes, job.includes, job.includeFiles, job.defines]
+        )
+        usage = self._usedFunctions.get(key)
+        if usage is None:
+            names = set()
+            dependencies = []
+            try:
+                for source in job.usedBy:
+                    scnr = self.create_source_scanner(job, source)
+                    names |= scnr.scan_usage()
+                    dependencies += [source] + (scnr.dependencies or [])
+                usage = (frozenset(names), list(dict.fromkeys(dependencies)))
+            except Exception as e:
+                # Remember failures as well, so that each source is parsed once
+                usage = e
+            self._usedFunctions[key] = usage
+        if isinstance(usage, Exception):
+            raise RunnerException(
+                f"Scanning the code-under-test of {job.inputFile} failed: {usage}"
+            )
+        return usage
+
+    def create_umbrella_scanner(self, jobs: list) -> "scanner.GCCUmbrellaScanner":
+        return autofff.scanner.GCCUmbrellaScanner(
+            inputFiles=[job.inputFile for job in jobs],
+            fakes=jobs[0].fakes,
+            includes=jobs[0].includes,
+            includeFiles=jobs[0].includeFiles,
+            defines=jobs[0].defines,
+            parser=self.get_parser,
+            resultCache=self._scanner_result_cache(),
+            trackDependencies=self.trackDependencies
+            or self.incremental
+            or any(job.depFile is not None for job in jobs),
+        )
+
+    def scan_umbrellas(self, jobs: list) -> dict:
+        """Scan jobs sharing the same flags as a single translation unit.
+
+        Returns the ``(result, dependencies)`` per index of each job scanned
+        this way. Jobs missing from the result are left to be scanned on
+        their own."""
+        if c.CONFIG[c.AUTOFFF_SECTION][c.SCANNER_TYPE] != c.GCC_HEADER_SCANNER_TYPE:
+            return {}
+
+        groups = {}
+        for index, job in enumerate(jobs):
+            if self.incremental and self.is_up_to_date(job, self.fingerprint(job)):
+                continue
+            flags = json.dumps([job.fakes, job.includes, job.includeFiles, job.defines])
+            groups.setdefault(flags, []).append(index)
+
+        scanned = {}
+        for indices in groups.values():
+            if len(indices) < 2:
+                continue
+            scnr = self.create_umbrella_scanner([jobs[index] for index in indices])
+            try:
+                results = scnr.scan_all()
+            except Exception as e:
+                LOGGER.warning(
+                    f"Scanning {len(indices)} headers as a single translation unit failed, scanning them one by one instead: {e}"
+                )
+                LOGGER.debug("Details:", exc_info=True)
+                continue
+            for index in indices:
+                scanned[index] = (results[jobs[index].inputFile], scnr.dependencies)
+        return scanned
+
+    def create_generator(self, job: Job) -> generator.FakeGenerator:
+        # Test-headers of object files wrap the headers declaring their functions
+        return generator.create_generator(
+            job.outputFile,
+            job.headers or job.inputFile,
+            job.includeFiles,
+            split=self.source_file(job) is not None,
+        )
+
+    def source_file(self, job: Job) -> str:
+        """Path of the source file defining the job's fakes, if any."""
+        return generator.format_source_output(job.outputFile, job.sourceFile)
+
+    def output_files(self, job: Job) -> list:
+        outputFiles = [job.outputFile.strip()]
+        sourceFile = self.source_file(job)
+        if sourceFile is not None:
+            outputFiles.append(sourceFile)
+        return outputFiles
+
+    def fingerprint(self, job: Job) -> str:
+        """Digest of everything besides the scanned files affecting a job's output."""
+        return hashlib.sha256(
+            json.dumps(
+                [
+                    str(autofff.__version__),
+                    os.getcwd(),
+                    job.inputFile,
+                    job.outputFile,
+                    job.fakes,
+                    job.includes,
+                    job.includeFiles,
+                    job.defines,
+                    job.headers,
+                    job.usedBy,
+                    job.sourceFile,
+                    c.CONFIG.dict(),
+                ],
+                sort_keys=True,
+                default=str,
+            ).encode()
+        ).hexdigest()
+
+    def _read_manifest(self, job: Job) -> dict:
+        try:
+            with open(job.outputFile.strip() + MANIFEST_SUFFIX) as fp:
+                manifest = json.load(fp)
+        except (OSError, ValueError):
+            return None
+        return manifest if isinstance(manifest, dict) else None
+
+    def is_up_to_date(self, job: Job, fingerprint: str) -> bool:
+        manifest = self._read_manifest(job)
+        # Variants skipped as duplicates have no outputs of their own
+        isDuplicate = manifest is not None and manifest.get("duplicate") is True
+        if not isDuplicate and not all(
+            os.path.exists(path) for path in self.output_files(job)
+        ):
+            return False
+        try:
+            return manifest["fingerprint"] == fingerprint and all(
+                file_digest(path) == digest
+                for path, digest in manifest["dependencies"].items()
+            )
+        except (OSError, KeyError, TypeError, AttributeError):
+            return False
+
+    def write_depfile(self, job: Job, dependencies: list) -> None:
+        write_if_changed(
+            job.depFile,
+            depfile.format_depfile(
+                self.output_files(job),
+                list(dict.fromkeys([job.inputFile] + list(dependencies))),
+                self.phonyDependencies,
+            ),
+        )
+
+    def _begin_job(self, job: Job) -> tuple:
+        """Return whether the job's output is up to date and its fingerprint."""
+        _, fileext = os.path.splitext(job.inputFile)
+        scannerType = c.CONFIG[c.AUTOFFF_SECTION][c.SCANNER_TYPE]
+        if scannerType == c.GCC_HEADER_SCANNER_TYPE and fileext != ".h":
+            LOGGER.warning(
+                f"Detected non-standard header file extension '{fileext}' (expected '.h'-file)."
+            )
+
+        fingerprint = None
+        if self.incremental:
+            fingerprint = self.fingerprint(job)
+            if self.is_up_to_date(job, fingerprint):
+                LOGGER.info(f"Output file {job.outputFile.strip()} is up to date.")
+                if job.depFile is not None or self.jobDependencies is not None:
+                    dependencies = list(self._read_manifest(job)["dependencies"])
+                    self.record_dependencies(job, dependencies)
+                    if job.depFile is not None:
+                        self.write_depfile(job, dependencies)
+                return True, fingerprint
+        return False, fingerprint
+
+    def record_dependencies(self, job: Job, dependencies: list) -> None:
+        if self.jobDependencies is not None and dependencies is not None:
+            self.jobDependencies[job] = list(
+                dict.fromkeys([job.inputFile] + list(dependencies))
+            )
+
+    def render(self, job: Job, result: model.ScannerResult) -> dict:
+        """Return the text of each of the job's output files by its path."""
+        with timings.phase("render", job.inputFile):
+            return generator.render_outputs(
+                self.create_generator(job),
+                result,
+                job.outputFile.strip(),
+                self.source_file(job),
+            )
+
+    def is_duplicate_variant(self, job: Job, variantKey: str) -> bool:
+        """Whether an earlier variant of the job's define matrix mined the
+        very same functions, in which case its outputs aren't written."""
+        if job.variant is None:
+            return False
+        variants = self._variants.setdefault(job.variantGroup, {})
+        original = variants.get(variantKey)
+        if original is not None:
+            LOGGER.info(
+                f"Variant '{job.variant}' of {job.inputFile} has the same functions as variant '{original}', skipping {job.outputFile.strip()}."
+            )
+            return True
+        variants[variantKey] = job.variant
+        return False
+
+    def is_up_to_date_variant(self, job: Job) -> bool:
+        """Register the functions recorded for an up-to-date variant, as if it
+        was scanned. A variant skipped as a duplicate is only up to date as
+        long as an earlier variant still has the same functions."""
+        if job.variant is None:
+            return True
+        manifest = self._read_manifest(job) or {}
+        variantKey = manifest.get("variant")
+        if not isinstance(variantKey, str):
+            return False
+        if manifest.get("duplicate") is not True:
+            self._variants.setdefault(job.variantGroup, {}).setdefault(
+                variantKey, job.variant
+            )
+            return True
+        if self.is_duplicate_variant(job, variantKey):
+            return True
+        # Registered by the check above, but it's scanned again
+        del self._variants[job.variantGroup][variantKey]
+        LOGGER.info(
+            f"Variant '{job.variant}' of {job.inputFile} no longer has the same functions as an earlier variant, regenerating {job.outputFile.strip()}."
+        )
+        return False
+
+    def write_manifest(
+        self,
+        job: Job,
+        dependencies: list,
+        fingerprint: str,
+        variantKey: str = None,
+        duplicate: bool = False,
+    ) -> None:
+        if fingerprint is None or dependencies is None:
+            return
+        manifest = {
+            "fingerprint": fingerprint,
+            "dependencies": {path: file_digest(path) for path in dependencies},
+        }
+        if variantKey is not None:
+            manifest["variant"] = variantKey
+        if duplicate:
+            manifest["duplicate"] = True
+        write_if_changed(
+            job.outputFile.strip() + MANIFEST_SUFFIX,
+            json.dumps(manifest, indent=4) + "\n",
+        )
+
+    def _finish_job(
+        self,
+        job: Job,
+        outputs: dict,
+        dependencies: list,
+        fingerprint: str,
+        variantKey: str = None,
+    ) -> None:
+        outputFile = job.outputFile.strip()
+        LOGGER.info(f"Generatring output file {outputFile}...")
+        with timings.phase("write", job.inputFile):
+            for filename, outputText in outputs.items():
+                write_if_changed(filename, outputText)
+
+        if job.depFile is not None:
+            if dependencies is None:
+                LOGGER.warning(
+                    f"No dependency information available for {job.inputFile}, {job.depFile} will only list the input itself."
+                )
+            self.write_depfile(job, dependencies or [])
+        self.write_manifest(job, dependencies, fingerprint, variantKey)
+
+    def scan_job(self, job: Job, scanned: tuple = None) -> tuple:
+        """Return the ``ScannerResult`` of a job and the files read while
+        preprocessing, unless already ``scanned``. With code-under-test
+        sources given, the result is limited to the functions they use."""
+        if scanned is None:
+            scnr = self.create_scanner(job)
+            scanned = scnr.scan(), getattr(scnr, "dependencies", None)
+        if not job.usedBy:
+            return scanned
+        return self.filter_used(job, *scanned)
+
+    def filter_used(
+        self, job: Job, result: model.ScannerResult, dependencies: list
+    ) -> tuple:
+        names, sourceDependencies = self.used_functions(job)
+        filtered = autofff.scanner.filter_result(result, names)
+        LOGGER.debug(
+            f"{len(filtered.declarations) + len(filtered.definitions)} of {len(result.declarations) + len(result.definitions)} functions of {job.inputFile} are used by its code-under-test."
+        )
+        if dependencies is not None:
+            dependencies = list(dict.fromkeys(dependencies + sourceDependencies))
+        return filtered, dependencies
+
+    def scan(self, jobs: list) -> tuple:
+        """Scan jobs without generating their output.
+
+        Returns a list of ``ScannedHeader`` for the jobs succeeding and the
+        list of failed jobs."""
+        self._usedFunctions.clear()
+        scanned = self.scan_umbrellas(jobs) if self.umbrella else {}
+        headers = []
+        failedJobs = []
+        for index, job in enumerate(jobs):
+            self.jobCount += 1
+            try:
+                result, dependencies = timings.profiled(
+                    self.profileDir,
+                    job.inputFile,
+                    self.scan_job,
+                    job,
+                    scanned.get(index),
+                )
+            except Exception as e:
+                LOGGER.error(f"Scanning of {job.inputFile} failed: {e}")
+                LOGGER.debug("Details:", exc_info=True)
+                failedJobs.append(job)
+                self.failedJobCount += 1
+                continue
+            headers.append(
+                model.ScannedHeader(
+                    job.inputFile, job.includeFiles, dependencies, result, job.headers
+                )
+            )
+        LOGGER.info(
+            f"Scanning complete! {len(jobs) - len(failedJobs)} of {len(jobs)} succeeded."
+        )
+        return headers, failedJobs
+
+    def run_job(self, job: Job, scanned: tuple = None) -> model.ScannerResult:
+        upToDate, fingerprint = self._begin_job(job)
+        if upToDate and self.is_up_to_date_variant(job):
+            return None
+
+        result, dependencies = self.scan_job(job, scanned)
+        self.record_dependencies(job, dependencies)
+        variantKey = None
+        if job.variant is not None:
+            variantKey = variant_key(result)
+            if self.is_duplicate_variant(job, variantKey):
+                self.write_manifest(
+                    job, dependencies, fingerprint, variantKey, duplicate=True
+                )
+                return result
+        outputs = self.render(job, result)
+        self._finish_job(job, outputs, dependencies, fingerprint, variantKey)
+        return result
+
+    def run(self, jobs: list) -> list:
+        self._usedFunctions.clear()
+        self._variants.clear()
+        scanned = self.scan_umbrellas(jobs) if self.umbrella else {}
+        failedJobs = []
+        for index, job in enumerate(jobs):
+            self.jobCount += 1
+            try:
+                timings.profiled(
+                    self.profileDir,
+                    job.inputFile,
+                    self.run_job,
+                    job,
+                    scanned.get(index),
+                )
+            except Exception as e:
+                LOGGER.error(f"Generation of {job.outputFile} failed: {e}")
+                LOGGER.debug("Details:", exc_info=True)
+                failedJobs.append(job)
+                self.failedJobCount += 1
+        LOGGER.info(
+            f"Generation complete! {len(jobs) - len(failedJobs)} of {len(jobs)} succeeded."
+        )
+        return failedJobs
+
+
+class ParallelRunner(Runner):
+    """Runner spreading jobs across a pool of worker processes.
+
+    Preprocessing happens on threads of the main process, so that further
+    preprocessor subprocesses are already running while the workers parse.
+    Outputs are written and log messages are emitted in job order."""
+
+    def __init__(
+        self,
+        processes: int = None,
+        parser: "pycparser.CParser" = None,
+        resultCache: ResultCache = None,
+    ) -> None:
+        super().__init__(parser, resultCache)
+        self.processes = processes or os.cpu_count() or 1
+        self.configFilename = ""
+
+    @overrides
+    def load_config(self, filename: str) -> None:
+        super().load_config(filename)
+        self.configFilename = filename.strip()
+
+    def _prepare_job(self, job: Job, pool: "ProcessPoolExecutor") -> tuple:
+        upToDate, fingerprint = self._begin_job(job)
+        if upToDate:
+            return None
+        return self._generate_job(job, pool, fingerprint)
+
+    def _generate_job(
+        self, job: Job, pool: "ProcessPoolExecutor", fingerprint: str
+    ) -> tuple:
+        usedNames = None
+        dependencies = None
+        if job.usedBy:
+            usedNames, dependencies = self.used_functions(job)
+        scnr = self.create_scanner(job)
+        text = scnr.preprocess()
+        if scnr.dependencies is not None and dependencies is not None:
+            dependencies = list(dict.fromkeys(scnr.dependencies + dependencies))
+        else:
+            dependencies = scnr.dependencies
+        key = None
+        result = None
+        if scnr.resultCache is not None:
+            key = autofff.scanner.result_cache_key(text, job.inputFile)
+            result = scnr.resultCache.get(key)
+        variantKey = None
+        if result is None:
+            resultData, outputs, variantKey, records, recorded, error = pool.submit(
+                _scan_and_render, job, text, key is not None, usedNames
+            ).result()
+            for record in records:
+                logging.getLogger(record.name).handle(record)
+            if recorded is not None and timings.RECORDER is not None:
+                timings.RECORDER.extend(recorded)
+            if error is not None:
+                raise RunnerException(error)
+            if key is not None:
+                scnr.resultCache.put(key, pickle.loads(resultData))
+        else:
+            if usedNames is not None:
+                result = autofff.scanner.filter_result(result, usedNames)
+            if job.variant is not None:
+                variantKey = variant_key(result)
+            outputs = self.render(job, result)
+        return outputs, dependencies, fingerprint, variantKey
+
+    @overrides
+    def run(self, jobs: list) -> list:
+        scannerType = c.CONFIG[c.AUTOFFF_SECTION][c.SCANNER_TYPE]
+        if (
+            self.processes < 2
+            or len(jobs) < 2
+            or scannerType != c.GCC_HEADER_SCANNER_TYPE
+            or self.umbrella
+        ):
+            return super().run(jobs)
+
+        from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+        import multiprocessing
+
+        if "forkserver" in multiprocessing.get_all_start_methods():
+            # Forking the threaded main process directly is prone to deadlocks
+            context = multiprocessing.get_context("forkserver")
+        else:
+            context = None
+
+        self._usedFunctions.clear()
+        self._variants.clear()
+        for job in jobs:
+            if job.usedBy:
+                # Scan sources up front, as the parser can't be shared by threads
+                try:
+                    self.used_functions(job)
+                except RunnerException:
+                    pass
+
+        failedJobs = []
+        capture = _JobLogCapture()
+        with capture, ProcessPoolExecutor(
+            self.processes,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(
+                self.configFilename,
+                logging.getLogger().getEffectiveLevel(),
+                timings.is_enabled(),
+                self.profileDir,
+            ),
+        ) as pool, ThreadPoolExecutor(2 * self.processes) as threads:
+            futures = [
+                threads.submit(capture.run, index, self._prepare_job, job, pool)
+                for index, job in enumerate(jobs)
+            ]
+            for index, (job, future) in enumerate(zip(jobs, futures)):
+                self.jobCount += 1
+                try:
+                    prepared = future.result()
+                    capture.replay(index)
+                    # Variants are compared in job order, not in the order
+                    # they happen to finish in
+                    if prepared is None and not self.is_up_to_date_variant(job):
+                        prepared = self._generate_job(job, pool, self.fingerprint(job))
+                    if prepared is not None:
+                        outputs, dependencies, fingerprint, variantKey = prepared
+                        self.record_dependencies(job, dependencies)
+                        if self.is_duplicate_variant(job, variantKey):
+                            self.write_manifest(
+                                job,
+                                dependencies,
+                                fingerprint,
+                                variantKey,
+                                duplicate=True,
+                            )
+                        else:
+                            self._finish_job(
+                                job, outputs, dependencies, fingerprint, variantKey
+                            )
+                except Exception as e:
+                    capture.replay(index)
+                    LOGGER.error(f"Generation of {job.outputFile} failed: {e}")
+                    LOGGER.debug("Details:", exc_info=True)
+                    failedJobs.append(job)
+                    self.failedJobCount += 1
+        LOGGER.info(
+            f"Generation complete! {len(jobs) - len(failedJobs)} of {len(jobs)} succeeded."
+        )
+        return failedJobs
+
+
+class _JobLogCapture(logging.Handler):
+    """Buffer log records of threads working on a job until the job's turn
+    comes, so that the log reads the same as with a sequential run."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.handlers = []
+        self.bindings = {}
+        self.buffers = {}
+
+    def __enter__(self) -> "_JobLogCapture":
+        rootLogger = logging.getLogger()
+        self.handlers = rootLogger.handlers[:]
+        rootLogger.handlers = [self]
+        return self
+
+    def __exit__(self, *exc) -> None:
+        logging.getLogger().handlers = self.handlers
+        for index in sorted(self.buffers):
+            self.replay(index)
+
+    def run(self, index: int, function, *args) -> object:
+        self.bindings[threading.get_ident()] = index
+        try:
+            return function(*args)
+        finally:
+            del self.bindings[threading.get_ident()]
+
+    def emit(self, record: logging.LogRecord) -> None:
+        index = self.bindings.get(threading.get_ident())
+        if index is None:
+            self._forward(record)
+        else:
+            self.buffers.setdefault(index, []).append(record)
+
+    def replay(self, index: int) -> None:
+        with self.lock:
+            records = self.buffers.pop(index, [])
+        for record in records:
+            self._forward(record)
+
+    def _forward(self, record: logging.LogRecord) -> None:
+        handlers = self.handlers or [logging.lastResort]
+        for handler in handlers:
+            if handler is not None and record.levelno >= handler.level:
+                handler.handle(record)
+
+
+_WORKER_RUNNER = None
+_WORKER_RECORDS = []
+_WORKER_PROFILE_DIR = None
+
+
+class _RecordCollector(logging.Handler):
+    def emit(self, record: logging.LogRecord) -> None:
+        # Resolve everything that can't be pickled back to the main process
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        _WORKER_RECORDS.append(record)
+
+
+def _init_worker(
+    configFilename: str,
+    logLevel: int,
+    recordTimings: bool = False,
+    profileDir: str = None,
+) -> None:
+    global _WORKER_RUNNER, _WORKER_PROFILE_DIR
+    rootLogger = logging.getLogger()
+    rootLogger.handlers = [_RecordCollector()]
+    rootLogger.setLevel(logLevel)
+    c.load(configFilename)
+    if recordTimings:
+        timings.enable()
+    _WORKER_PROFILE_DIR = profileDir
+    _WORKER_RUNNER = Runner()
+
+
+def _scan_and_render(
+    job: Job, text: str, returnResult: bool, usedNames: frozenset = None
+) -> tuple:
+    del _WORKER_RECORDS[:]
+    resultData = None
+    outputs = None
+    variantKey = None
+    error = None
+    try:
+        resultData, outputs, variantKey = timings.profiled(
+            _WORKER_PROFILE_DIR,
+            job.inputFile,
+            _scan_text_and_render,
+            job,
+            text,
+            returnResult,
+            usedNames,
+        )
+    except Exception as e:
+        error = str(e) or type(e).__name__
+        LOGGER.debug("Details:", exc_info=True)
+    recorded = timings.RECORDER.take() if timings.RECORDER is not None else None
+    return resultData, outputs, variantKey, list(_WORKER_RECORDS), recorded, error
+
+
+def _scan_text_and_render(
+    job: Job, text: str, returnResult: bool, usedNames: frozenset
+) -> tuple:
+    scnr = _WORKER_RUNNER.create_scanner(job)
+    result = scnr.scan_text(text)
+    resultData = None
+    if returnResult:
+        # Shipped back to the parent process for its result cache, unfiltered
+        resultData = pickle.dumps(result, protocol=pickle.HIGHEST_PROTOCOL)
+    if usedNames is not None:
+        result = autofff.scanner.filter_result(result, usedNames)
+    variantKey = variant_key(result) if job.variant is not None else None
+    return resultData, _WORKER_RUNNER.render(job, result), variantKey
+
+
+def variant_key(result: model.ScannerResult) -> str:
+    """Digest of the functions mined, comparable across processes. The lines
+    they're found at are left out, as these don't make it into the fakes."""
+    functions = tuple(
+        tuple(
+            (
+                function.name,
+                function.returnType,
+                function.parameters,
+                function.isVariadic,
+                function.functionPointers,
+            )
+            for function in functions
+        )
+        for functions in (result.declarations, result.definitions)
+    )
+    return hashlib.sha256(repr(functions).encode()).hexdigest()
+
+
+_VARIANT_NAME_PATTERN = re.compile(r"^([\w.-]+):")
+
+
+def parse_variant(text: str) -> tuple:
+    """Parse a variant of a define matrix given as ``[name:]DEFINE,...`` into
+    its name and list of defines. Unless given, the name is derived from the
+    defines, e.g. 'chip_a_use_dma' for 'CHIP_A,USE_DMA'."""
+    match = _VARIANT_NAME_PATTERN.match(text)
+    if match is not None:
+        name = match.group(1)
+        text = text[match.end() :]
+    else:
+        name = None
+    defines = [define.strip() for define in text.split(",") if define.strip()]
+    if name is None:
+        name = re.sub(r"[^0-9A-Za-z]+", "_", "_".join(defines)).strip("_").lower()
+    return name or "default", defines
+
+
+def _extend(base: list, extension: list) -> list:
+    if not extension:
+        return base
+    return (base or []) + list(extension)
+
+
+def load_manifest(
+    filename: str,
+    fakes: list,
+    includes: list = None,
+    includeFiles: list = None,
+    defines: list = None,
+    outputDir: str = None,
+    outputPattern: str = None,
+    headers: list = None,
+    usedBy: list = None,
+    variant: str = None,
+    variantDefines: list = None,
+) -> list:
+    """Return the jobs listed by a manifest. Given a ``variant`` of a define
+    matrix, its ``variantDefines`` are added and its name is put into the
+    output paths."""
+    with open(filename) as fp:
+        try:
+            entries = json.load(fp)
+        except json.JSONDecodeError as e:
+            raise RunnerException(f"Manifest {filename} is not valid JSON: {e}")
+    if not isinstance(entries, list):
+        raise RunnerException(f"Manifest {filename} must contain a list of entries.")
+
+    jobs = []
+    for index, entry in enumerate(entries):
+        if not isinstance(entry, dict) or "input" not in entry:
+            raise RunnerException(
+                f"Manifest entry [{index}] in {filename} requires an 'input' field."
+            )
+        inputFile = entry["input"]
+        outputFile = entry.get("output")
+        sourceFile = entry.get("sourceOutput")
+        depFile = entry.get("depFile")
+        if not outputFile:
+            outputFile = format_output_path(
+                inputFile, outputDir, outputPattern, variant
+            )
+        elif variant is not None:
+            outputFile = format_variant_path(outputFile, variant)
+        if variant is not None:
+            if sourceFile is not None:
+                sourceFile = format_variant_path(sourceFile, variant)
+            if depFile is not None:
+                depFile = format_variant_path(depFile, variant)
+        jobs.append(
+            Job(
+                inputFile,
+                outputFile,
+                _extend(fakes, entry.get("fakes")),
+                _extend(includes, entry.get("includes")),
+                _extend(includeFiles, entry.get("includeFiles")),
+                _extend(_extend(defines, entry.get("defines")), variantDefines),
+                depFile,
+                _extend(headers, entry.get("headers")),
+                _extend(usedBy, entry.get("usedBy")),
+                sourceFile,
+                variant,
+                (filename, index) if variant is not None else None,
+            )
+        )
+    return jobs
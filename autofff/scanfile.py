@@ -0,0 +1,192 @@
+import autofff
+import autofff.model as model
+
+import json
+import logging
+import marshal
+import sys
+
+LOGGER = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    LOGGER.error("Module is not intended to run as '__main__'!")
+    sys.exit(1)
+
+FORMAT_NAME = "autofff-scan"
+# Bump whenever the layout changes, older scan files are rejected then
+FORMAT_VERSION = 3
+BINARY_MAGIC = b"AUTOFFF-SCAN\n"
+# Oldest marshal format of all supported Python versions, so that scan files
+# can be shared between them
+MARSHAL_VERSION = 4
+
+JSON_FORMAT = "json"
+BINARY_FORMAT = "binary"
+FORMATS = (JSON_FORMAT, BINARY_FORMAT)
+
+
+class ScanFileException(Exception):
+    pass
+
+
+def _function_to_tuple(function: model.Function) -> tuple:
+    return (
+        function.name,
+        function.returnType,
+        tuple((param.name, param.type) for param in function.parameters),
+        function.isVariadic,
+        tuple((fp.name, fp.typedef) for fp in function.functionPointers),
+        function.line,
+    )
+
+
+def _function_from_tuple(values: tuple) -> model.Function:
+    name, returnType, parameters, isVariadic, functionPointers, line = values
+    return model.Function(
+        name,
+        returnType,
+        [model.Parameter(*param) for param in parameters],
+        isVariadic,
+        [model.FunctionPointer(*fp) for fp in functionPointers],
+        line,
+    )
+
+
+def _function_to_dict(function: model.Function) -> dict:
+    return {
+        "name": function.name,
+        "returnType": function.returnType,
+        "parameters": [
+            {"name": param.name, "type": param.type} for param in function.parameters
+        ],
+        "isVariadic": function.isVariadic,
+        "functionPointers": [
+            {"name": fp.name, "typedef": fp.typedef} for fp in function.functionPointers
+        ],
+        "line": function.line,
+    }
+
+
+def _function_from_dict(values: dict) -> model.Function:
+    return model.Function(
+        values["name"],
+        values["returnType"],
+        [
+            model.Parameter(param["name"], param["type"])
+            for param in values["parameters"]
+        ],
+        values["isVariadic"],
+        [
+            model.FunctionPointer(fp["name"], fp["typedef"])
+            for fp in values["functionPointers"]
+        ],
+        values["line"],
+    )
+
+
+def dumps(headers: list, format: str = JSON_FORMAT) -> bytes:
+    """Serialize a list of ``ScannedHeader`` as scan file."""
+    if format == BINARY_FORMAT:
+        return BINARY_MAGIC + marshal.dumps(
+            (
+                FORMAT_VERSION,
+                str(autofff.__version__),
+                tuple(
+                    (
+                        header.inputFile,
+                        header.includeFiles,
+                        header.dependencies,
+                        tuple(map(_function_to_tuple, header.result.declarations)),
+                        tuple(map(_function_to_tuple, header.result.definitions)),
+                        header.headers,
+                    )
+                    for header in headers
+                ),
+            ),
+            MARSHAL_VERSION,
+        )
+    elif format == JSON_FORMAT:
+        return (
+            json.dumps(
+                {
+                    "format": FORMAT_NAME,
+                    "version": FORMAT_VERSION,
+                    "autofff": str(autofff.__version__),
+                    "headers": [
+                        {
+                            "input": header.inputFile,
+                            "includeFiles": header.includeFiles,
+                            "dependencies": header.dependencies,
+                            "declarations": list(
+                                map(_function_to_dict, header.result.declarations)
+                            ),
+                            "definitions": list(
+                                map(_function_to_dict, header.result.definitions)
+                            ),
+                            "headers": header.headers,
+                        }
+                        for header in headers
+                    ],
+                },
+                separators=(",", ":"),
+            )
+            + "\n"
+        ).encode()
+    else:
+        raise ValueError(f"Unknown scan file format '{format}'.")
+
+
+def loads(data: bytes, filename: str = "<scan file>") -> list:
+    """Deserialize a scan file of either format into a list of
+    ``ScannedHeader``."""
+    try:
+        if data.startswith(BINARY_MAGIC):
+            version, _, entries = marshal.loads(data[len(BINARY_MAGIC) :])
+            _check_version(version, filename)
+            return [
+                model.ScannedHeader(
+                    inputFile,
+                    includeFiles,
+                    dependencies,
+                    model.ScannerResult(
+                        map(_function_from_tuple, declarations),
+                        map(_function_from_tuple, definitions),
+                    ),
+                    headers,
+                )
+                for inputFile, includeFiles, dependencies, declarations, definitions, headers in entries
+            ]
+
+        values = json.loads(data)
+        if not isinstance(values, dict) or values.get("format") != FORMAT_NAME:
+            raise ScanFileException(f"{filename} is not an autofff scan file.")
+        _check_version(values.get("version"), filename)
+        return [
+            model.ScannedHeader(
+                header["input"],
+                header["includeFiles"],
+                header["dependencies"],
+                model.ScannerResult(
+                    map(_function_from_dict, header["declarations"]),
+                    map(_function_from_dict, header["definitions"]),
+                ),
+                header["headers"],
+            )
+            for header in values["headers"]
+        ]
+    except ScanFileException:
+        raise
+    except (ValueError, EOFError, TypeError, KeyError) as e:
+        raise ScanFileException(f"{filename} is not a valid scan file: {e}")
+
+
+def _check_version(version: int, filename: str) -> None:
+    if version != FORMAT_VERSION:
+        raise ScanFileException(
+            f"{filename} has scan file format version {version}, expected {FORMAT_VERSION}."
+        )
+
+
+def load(filename: str) -> list:
+    with open(filename, "rb") as fp:
+        return loads(fp.read(), filename)
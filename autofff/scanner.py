@@ -1,17 +1,32 @@
-import autofff.utils as utils
+import autofff
+import autofff.depfile as depfile
+import autofff.elf as elf
+import autofff.model as model
+import autofff.timings as timings
 import autofff.config as c
-from autofff.config import CONFIG
+from autofff.cache import PreprocessorCache, ResultCache
+from autofff.model import ScannerResult
 
 from abc import ABCMeta, abstractmethod
+import gc
+import hashlib
+import importlib.util
 import logging
 import os.path
 import subprocess
 import sys
 import re
+import tempfile
+import threading
+import time
+from typing import TYPE_CHECKING
 
 from overrides import overrides
 
-import pycparser
+# pycparser (and the utils working on its AST) are only imported once a
+# header actually needs to be parsed, sparing cached results the import
+if TYPE_CHECKING:
+    import pycparser
 
 LOGGER = logging.getLogger(__name__)
 
@@ -20,24 +35,15 @@ if __name__ == "__main__":
     sys.exit(1)
 
 
+CPP_READ_SIZE = 1 << 16
+
+
 class ScannerException(Exception):
     def __init__(self, message: str, details: str) -> None:
         self.details = details
         super().__init__(message)
 
 
-class ScannerResult:
-    def __init__(self, declarations: tuple, definitions: tuple) -> None:
-        self.declarations = declarations
-        self.definitions = definitions
-
-
-class SymbolTable:
-    def __init__(self, objectFile, sourceFile: str):
-        self.objectFile = objectFile
-        self.sourceFile = sourceFile
-
-
 class Scanner(metaclass=ABCMeta):
     def __init__(
         self,
@@ -62,71 +68,90 @@ class Scanner(metaclass=ABCMeta):
 
     def scan(self) -> ScannerResult:
         ast = self._call_parse(self.inputFile)
-        return ScannerResult(
-            tuple(self._mine_function_declarations(ast)),
-            tuple(self._mine_function_definitions(ast)),
-        )
+        return self._mine(ast)
+
+    def _mine(
+        self, ast: "pycparser.c_ast.FileAST", inputFile: str = None
+    ) -> ScannerResult:
+        import autofff.utils as utils
+
+        if inputFile is None:
+            inputFile = self.inputFile
+        with timings.phase("mine", inputFile):
+            return ScannerResult(
+                tuple(
+                    map(
+                        utils.create_function,
+                        self._mine_function_declarations(ast, inputFile),
+                    )
+                ),
+                tuple(
+                    utils.create_function(definition.decl)
+                    for definition in self._mine_function_definitions(ast, inputFile)
+                ),
+            )
+
+    def _is_same_file(self, header: str, inputFile: str) -> bool:
+        return os.path.normpath(header) == os.path.normpath(inputFile)
+
+    def _mine_function_declarations(
+        self, ast: "pycparser.c_ast.FileAST", inputFile: str
+    ) -> list:
+        import pycparser
 
-    def _mine_function_declarations(self, ast: pycparser.c_ast.FileAST) -> list:
         foundFunctions = []
 
         for elem in ast.ext:
             if isinstance(elem, pycparser.c_ast.Decl) and isinstance(
                 elem.type, pycparser.c_ast.FuncDecl
             ):
-                funcName = elem.name
                 header = elem.coord.file
-                if os.path.normpath(header) == os.path.normpath(self.inputFile):
-                    funcDecl = elem.type
+                if self._is_same_file(header, inputFile):
                     foundFunctions.append(elem)
-                    LOGGER.debug(
-                        f"[{len(foundFunctions)}] Function Declaration: {funcName}"
-                    )
-                    LOGGER.debug(f"\tReturn type: {utils.get_type_name(elem)}")
-                    if funcDecl.args is None:
-                        LOGGER.debug("\tEmpty parameter list")
-                    else:
-                        paramList = funcDecl.args.params
-                        for param in paramList:
-                            if isinstance(param, pycparser.c_ast.EllipsisParam):
-                                paramName = "..."
-                            else:
-                                paramName = param.name
-                                paramType = utils.get_type_name(param)
-                            LOGGER.debug(
-                                f"\tParameter: {paramName} of Type: {paramType}"
-                            )
+                    if LOGGER.isEnabledFor(logging.DEBUG):
+                        self._log_function("Declaration", len(foundFunctions), elem)
         return foundFunctions
 
-    def _mine_function_definitions(self, ast: pycparser.c_ast.FileAST) -> list:
+    def _mine_function_definitions(
+        self, ast: "pycparser.c_ast.FileAST", inputFile: str
+    ) -> list:
+        import pycparser
+
         foundFunctions = []
 
         for elem in ast.ext:
             if isinstance(elem, pycparser.c_ast.FuncDef):
                 decl = elem.decl
-                funcName = decl.name
                 header = decl.coord.file
-                if os.path.normpath(header) == os.path.normpath(self.inputFile):
-                    funcDecl = decl.type
+                if self._is_same_file(header, inputFile):
                     foundFunctions.append(elem)
-                    LOGGER.debug(
-                        f"[{len(foundFunctions)}] Function Definition: {funcName}"
-                    )
-                    LOGGER.debug(f"\tReturn type: {utils.get_type_name(decl)}")
-                    if funcDecl.args is None:
-                        LOGGER.debug("\tEmpty parameter list")
-                    else:
-                        paramList = funcDecl.args.params
-                        for param in paramList:
-                            paramName = param.name
-                            paramType = utils.get_type_name(param)
-                            LOGGER.debug(
-                                f"\tParameter: {paramName} of Type: {paramType}"
-                            )
+                    if LOGGER.isEnabledFor(logging.DEBUG):
+                        self._log_function("Definition", len(foundFunctions), decl)
         return foundFunctions
 
+    def _log_function(
+        self, kind: str, index: int, decl: "pycparser.c_ast.Decl"
+    ) -> None:
+        # Rendering type names is costly, so only do it when actually logged
+        import pycparser
+
+        import autofff.utils as utils
+
+        funcDecl = decl.type
+        LOGGER.debug(f"[{index}] Function {kind}: {decl.name}")
+        LOGGER.debug(f"\tReturn type: {utils.get_type_name(decl)}")
+        if funcDecl.args is None:
+            LOGGER.debug("\tEmpty parameter list")
+        else:
+            for param in funcDecl.args.params:
+                if isinstance(param, pycparser.c_ast.EllipsisParam):
+                    LOGGER.debug("\tParameter: ... of Type: ...")
+                else:
+                    paramType = utils.get_type_name(param)
+                    LOGGER.debug(f"\tParameter: {param.name} of Type: {paramType}")
+
     @abstractmethod
-    def _call_parse(self, pathToHeader: str) -> pycparser.c_ast.FileAST:
+    def _call_parse(self, pathToHeader: str) -> "pycparser.c_ast.FileAST":
         pass
 
 
@@ -139,65 +164,235 @@ class GCCScanner(Scanner):
         includeFiles: list = None,
         defines: list = None,
         ignorePattern: str = None,
+        parser: "pycparser.CParser" = None,
+        resultCache: ResultCache = None,
+        preprocessorCache: PreprocessorCache = None,
+        trackDependencies: bool = False,
     ) -> None:
         super().__init__(
             inputFile, fakes, includes, includeFiles, defines, ignorePattern
         )
+        # Either the parser or a callable creating it, so that it's only built
+        # once a header actually needs to be parsed
+        self._parser = parser
+        self.resultCache = resultCache
+        self.preprocessorCache = preprocessorCache
+        self.trackDependencies = trackDependencies
+        self.dependencies = None
+
+    @property
+    def parser(self) -> "pycparser.CParser":
+        if callable(self._parser):
+            self._parser = self._parser()
+        return self._parser
 
     @overrides
-    def _call_parse(self, pathToHeader: str) -> pycparser.c_ast.FileAST:
+    def scan(self) -> ScannerResult:
+        return self.scan_text(self.preprocess())
+
+    def preprocess(self) -> str:
+        return self._call_preprocess(self.inputFile)
+
+    def scan_text(self, text: str) -> ScannerResult:
+        key = None
+        if self.resultCache is not None:
+            key = result_cache_key(text, self.inputFile)
+            result = self.resultCache.get(key)
+            if result is not None:
+                LOGGER.debug(f"Reusing cached scanner result for {self.inputFile}.")
+                return result
+        ast = self._parse_text(text, self.inputFile, self.parser)
+        result = self._mine(ast)
+        if key is not None:
+            self.resultCache.put(key, result)
+        return result
+
+    def _target_files(self) -> list:
+        return [self.inputFile]
+
+    def _output_filter(self) -> "PreprocessorOutputFilter":
+        section = c.CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION]
+        targetFiles = self._target_files()
+
+        def is_target_file(header: str) -> bool:
+            return any(
+                self._is_same_file(header, targetFile) for targetFile in targetFiles
+            )
+
+        return PreprocessorOutputFilter(
+            (
+                is_target_file
+                if section[c.GCC_SCANNER_PRUNE_FOREIGN_DECLARATIONS]
+                else None
+            ),
+            section[c.GCC_SCANNER_NON_STANDARD_FILTER] == c.BUILTIN_NON_STANDARD_FILTER,
+        )
+
+    def _cpp_path(self) -> str:
+        return c.CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][
+            c.GCC_SCANNER_CPP_PATH
+        ]
+
+    def _cpp_args(self) -> list:
         cppArgs = (
-            CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][c.GCC_SCANNER_CPP_ARGS]
+            c.CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][c.GCC_SCANNER_CPP_ARGS]
             + format_as_includes(self.fakes)
             + format_as_includes(self.includes)
             + format_as_include_files(self.includeFiles)
             + format_as_defines(self.defines)
             + [
                 format_as_define(
-                    CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][
+                    c.CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][
                         c.GCC_SCANNER_IGNORE_ANNOTATION
                     ]
                 ),
             ]
         )
         LOGGER.debug(f"GCC args for parsing: {', '.join(cppArgs)}")
+        return cppArgs
+
+    def _call_preprocess(self, pathToHeader: str) -> str:
+        return self._preprocess_file(pathToHeader, self._cpp_path(), self._cpp_args())
+
+    @overrides
+    def _call_parse(self, pathToHeader: str) -> "pycparser.c_ast.FileAST":
         return self._parse_file(
             pathToHeader,
             use_cpp=True,
-            cpp_path=CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][
-                c.GCC_SCANNER_CPP_PATH
-            ],
-            cpp_args=cppArgs,
+            cpp_path=self._cpp_path(),
+            cpp_args=self._cpp_args(),
+            parser=self.parser,
         )
 
     def _preprocess_file(
         self, filename: str, cpp_path: str = "cpp", cpp_args: str = ""
     ) -> str:
-        path_list = [cpp_path]
         if isinstance(cpp_args, list):
-            path_list += cpp_args
+            cpp_args = list(cpp_args)
         elif cpp_args != "":
-            path_list += [cpp_args]
+            cpp_args = [cpp_args]
+        else:
+            cpp_args = []
+
+        outputFilter = self._output_filter()
+        cached = None
+        if self.preprocessorCache is not None:
+            cached = self.preprocessorCache.lookup(cpp_path, cpp_args, filename)
+        if cached is not None:
+            text, self.dependencies = cached
+            with timings.phase("filter", self.inputFile):
+                filteredText = outputFilter.feed(text) + outputFilter.close()
+        else:
+            startTime = time.time_ns()
+            filteredText, text, self.dependencies = self._run_cpp(
+                filename,
+                cpp_path,
+                cpp_args,
+                outputFilter,
+                keepOutput=self.preprocessorCache is not None,
+            )
+            if self.preprocessorCache is not None and self.dependencies is not None:
+                self.preprocessorCache.store(
+                    cpp_path, cpp_args, filename, text, self.dependencies, startTime
+                )
+
+        if (
+            c.CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][
+                c.GCC_SCANNER_NON_STANDARD_FILTER
+            ]
+            == c.REGEX_NON_STANDARD_FILTER
+        ):
+            with timings.phase("filter", self.inputFile):
+                filteredText = self.ignorePattern.sub("", filteredText)
+        return filteredText
+
+    def _run_cpp(
+        self,
+        filename: str,
+        cpp_path: str,
+        cpp_args: list,
+        outputFilter: "PreprocessorOutputFilter",
+        keepOutput: bool = False,
+    ) -> tuple:
+        """Run the preprocessor and filter its output while it's being read.
+
+        Returns the filtered output, the unfiltered output (if ``keepOutput``
+        is set) and the list of files read, if dependencies were tracked."""
+        path_list = [cpp_path] + cpp_args
+        depFile = None
+        if self.trackDependencies or self.preprocessorCache is not None:
+            fd, depFile = tempfile.mkstemp(prefix="autofff-", suffix=".d")
+            os.close(fd)
+            path_list += ["-MD", "-MF", depFile]
         path_list += [filename]
 
+        pipe = None
+        chunks = []
+        rawChunks = []
+        errors = []
+        outputSize = 0
         try:
             # Note the use of universal_newlines to treat all newlines
             # as \n for Python's purpose
             #
-            pipe = subprocess.Popen(
-                path_list, stdout=subprocess.PIPE, universal_newlines=True
+            with timings.phase("cpp-spawn", self.inputFile):
+                pipe = subprocess.Popen(
+                    path_list,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    universal_newlines=True,
+                )
+            errorReader = threading.Thread(
+                target=lambda: errors.append(pipe.stderr.read()), daemon=True
             )
-            text = pipe.communicate()[0]
+            errorReader.start()
+            # The built-in output filter runs while the output is being read
+            with timings.phase("cpp", self.inputFile):
+                while True:
+                    lines = pipe.stdout.readlines(CPP_READ_SIZE)
+                    if not lines:
+                        break
+                    chunk = "".join(lines)
+                    outputSize += len(chunk)
+                    if keepOutput:
+                        rawChunks.append(chunk)
+                    chunks.append(outputFilter.feed(chunk))
+                chunks.append(outputFilter.close())
+                pipe.wait()
+                errorReader.join()
+            timings.count("cppOutputSize", self.inputFile, outputSize)
         except OSError as e:
             raise RuntimeError(
                 "Unable to invoke 'cpp'.  "
                 + "Make sure its path was passed correctly\n"
                 + ("Original error: %s" % e)
             )
+        finally:
+            if pipe is not None:
+                pipe.stdout.close()
+                pipe.stderr.close()
+                if pipe.returncode is None:
+                    pipe.kill()
+                    pipe.wait()
+            dependencies = None
+            if depFile is not None:
+                # A failed run might have left an incomplete dependency list behind
+                if pipe is not None and pipe.returncode == 0:
+                    with open(depFile) as fp:
+                        dependencies = depfile.parse_depfile(fp.read())
+                os.unlink(depFile)
+
+        errorText = "".join(errors).strip()
+        if pipe.returncode != 0:
+            raise ScannerException(
+                f"Preprocessing of {filename} failed with exit code {pipe.returncode}"
+                + (f":\n{errorText}" if errorText else "."),
+                errorText,
+            )
+        elif errorText:
+            LOGGER.warning(f"Preprocessor output for {filename}:\n{errorText}")
 
-        filteredText = self.ignorePattern.sub("", text)
-
-        return filteredText
+        return "".join(chunks), "".join(rawChunks) if keepOutput else None, dependencies
 
     def _parse_file(
         self,
@@ -205,18 +400,28 @@ class GCCScanner(Scanner):
         use_cpp: bool = False,
         cpp_path: str = "cpp",
         cpp_args: str = "",
-        parser: pycparser.CParser = None,
-    ) -> pycparser.c_ast.FileAST:
+        parser: "pycparser.CParser" = None,
+    ) -> "pycparser.c_ast.FileAST":
         if use_cpp:
             text = self._preprocess_file(filename, cpp_path, cpp_args)
         else:
             with open(filename, "rU") as f:
                 text = f.read()
 
+        return self._parse_text(text, filename, parser)
+
+    def _parse_text(
+        self, text: str, filename: str, parser: "pycparser.CParser" = None
+    ) -> "pycparser.c_ast.FileAST":
+        import pycparser
+
+        import autofff.cparser as cparser
+
         if parser is None:
-            parser = pycparser.CParser()
+            parser = cparser.get_parser()
         try:
-            return parser.parse(text, filename)
+            with timings.phase("parse", filename):
+                return parser.parse(text, filename)
         except pycparser.c_parser.ParseError as error:
             if isinstance(error, pycparser.c_parser.ParseError):
                 context = self._parse_error_context(text, error)
@@ -226,9 +431,11 @@ class GCCScanner(Scanner):
                 f"Parsing of {filename} failed. Details:\t{str(error)}\n{context}"
             )
             raise error
+        finally:
+            release_parser_state(parser)
 
     def _parse_error_context(
-        self, text: str, error: pycparser.c_parser.ParseError
+        self, text: str, error: "pycparser.c_parser.ParseError"
     ) -> str:
         match = re.match(
             r"\s*(.*?)\s*:\s*([0-9]*?)\s*:\s*([0-9]*?)\s*:\s*(.*)", str(error)
@@ -240,14 +447,14 @@ class GCCScanner(Scanner):
         context = f">Caused in file: {filename}\n"
         prevRowStart = max(
             row
-            - CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][
+            - c.CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][
                 c.GCC_SCANNER_ERROR_CONTEXT_PREV_LINES
             ],
             0,
         )
         postRowStart = (
             row
-            + CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][
+            + c.CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][
                 c.GCC_SCANNER_ERROR_CONTEXT_POST_LINES
             ]
         )
@@ -271,6 +478,10 @@ class GCCHeaderScanner(GCCScanner):
         includes: list = None,
         includeFiles: list = None,
         defines: list = None,
+        parser: "pycparser.CParser" = None,
+        resultCache: ResultCache = None,
+        preprocessorCache: PreprocessorCache = None,
+        trackDependencies: bool = False,
     ) -> None:
         super().__init__(
             inputFile,
@@ -278,13 +489,183 @@ class GCCHeaderScanner(GCCScanner):
             includes,
             includeFiles,
             defines,
-            CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][
+            c.CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][
                 c.GCC_SCANNER_NON_STANDARD_IGNORE_PATTERN
             ],
+            parser,
+            resultCache,
+            preprocessorCache,
+            trackDependencies,
+        )
+
+
+class GCCSourceScanner(GCCHeaderScanner):
+    """Scanner for code-under-test source files, looking for the functions
+    they use rather than the ones they declare."""
+
+    def scan_usage(self) -> set:
+        """Return the names of the functions the source file references, but
+        doesn't define itself."""
+        import autofff.utils as utils
+
+        ast = self._parse_text(self.preprocess(), self.inputFile, self.parser)
+        visitor = utils.FunctionUsageVisitor()
+        visitor.visit(ast)
+        LOGGER.debug(
+            f"{self.inputFile} references {len(visitor.referenced)} identifiers and defines {len(visitor.defined)} functions."
         )
+        return visitor.referenced - visitor.defined
+
+
+class GCCUmbrellaScanner(GCCHeaderScanner):
+    """Scan several headers sharing the same flags at once. Instead of running
+    the preprocessor and parser per header, a single umbrella translation unit
+    including all of them is processed and its declarations are split up by
+    the file they were declared in."""
+
+    UMBRELLA_NAME = "<autofff-umbrella>"
+
+    def __init__(
+        self,
+        inputFiles: list,
+        fakes: str,
+        includes: list = None,
+        includeFiles: list = None,
+        defines: list = None,
+        parser: "pycparser.CParser" = None,
+        resultCache: ResultCache = None,
+        trackDependencies: bool = False,
+    ) -> None:
+        # The umbrella only exists as a temporary file, which rules out the
+        # preprocessor cache. Scanner results are still cached by their text.
+        super().__init__(
+            self.UMBRELLA_NAME,
+            fakes,
+            includes,
+            includeFiles,
+            defines,
+            parser,
+            resultCache,
+            None,
+            trackDependencies,
+        )
+        self.inputFiles = list(dict.fromkeys(inputFiles))
+        self._realPaths = {}
+
+    def _real_path(self, filename: str) -> str:
+        realPath = self._realPaths.get(filename)
+        if realPath is None:
+            realPath = os.path.realpath(filename)
+            self._realPaths[filename] = realPath
+        return realPath
+
+    @overrides
+    def _is_same_file(self, header: str, inputFile: str) -> bool:
+        # Headers may be reached via different paths, e.g. when including
+        # each other
+        return self._real_path(header) == self._real_path(inputFile)
+
+    @overrides
+    def _target_files(self) -> list:
+        return self.inputFiles
+
+    def umbrella_text(self) -> str:
+        return "".join(
+            f'#include "{os.path.abspath(inputFile)}"\n'
+            for inputFile in self.inputFiles
+        )
+
+    @overrides
+    def preprocess(self) -> str:
+        with tempfile.TemporaryDirectory(prefix="autofff-") as directory:
+            umbrellaFile = os.path.join(directory, "umbrella.h")
+            with open(umbrellaFile, "w") as fp:
+                fp.write(self.umbrella_text())
+            text = self._call_preprocess(umbrellaFile)
+        if self.dependencies is not None:
+            # Report the inputs by the paths they were given as
+            inputFiles = {os.path.abspath(path): path for path in self.inputFiles}
+            self.dependencies = [
+                inputFiles.get(path, path)
+                for path in self.dependencies
+                if path != umbrellaFile
+            ]
+        # Keep the text independent of the temporary directory's name
+        return text.replace(f'"{umbrellaFile}"', f'"{self.UMBRELLA_NAME}"')
+
+    @overrides
+    def scan(self) -> ScannerResult:
+        results = self.scan_all().values()
+        return ScannerResult(
+            sum((result.declarations for result in results), tuple()),
+            sum((result.definitions for result in results), tuple()),
+        )
+
+    def scan_all(self) -> dict:
+        """Return the ``ScannerResult`` of each input file."""
+        text = self.preprocess()
+
+        results = {}
+        keys = None
+        if self.resultCache is not None:
+            keys = {
+                inputFile: result_cache_key(text, inputFile)
+                for inputFile in self.inputFiles
+            }
+            for inputFile, key in keys.items():
+                result = self.resultCache.get(key)
+                if result is None:
+                    break
+                results[inputFile] = result
+            else:
+                LOGGER.debug(
+                    f"Reusing cached scanner results for {', '.join(self.inputFiles)}."
+                )
+                return results
+
+        import pycparser
+
+        ast = self._parse_text(text, self.UMBRELLA_NAME, self.parser)
+        fileExts = {self._real_path(inputFile): [] for inputFile in self.inputFiles}
+        for elem in ast.ext:
+            if elem.coord is None:
+                continue
+            fileExt = fileExts.get(self._real_path(elem.coord.file))
+            if fileExt is not None:
+                fileExt.append(elem)
+
+        for inputFile in self.inputFiles:
+            fileAst = pycparser.c_ast.FileAST(fileExts[self._real_path(inputFile)])
+            results[inputFile] = self._mine(fileAst, inputFile)
+            if keys is not None:
+                self.resultCache.put(keys[inputFile], results[inputFile])
+        return results
+
+    @overrides
+    def _parse_text(
+        self, text: str, filename: str, parser: "pycparser.CParser" = None
+    ) -> "pycparser.c_ast.FileAST":
+        # Leave reporting of parse errors to the scan of the offending header
+        import autofff.cparser as cparser
+
+        if parser is None:
+            parser = cparser.get_parser()
+        # The garbage collector repeatedly traversing the umbrella's large (and
+        # acyclic) AST while it grows would otherwise outweigh the savings
+        gcEnabled = gc.isenabled()
+        gc.disable()
+        try:
+            return parser.parse(text, filename)
+        finally:
+            release_parser_state(parser)
+            if gcEnabled:
+                gc.enable()
 
 
 class GCCObjectScanner(GCCScanner):
+    """Scanner picking the functions to fake by the symbols of ELF object files
+    or archives, whose declarations are looked up in the given headers."""
+
     def __init__(
         self,
         inputFile: str,
@@ -292,6 +673,11 @@ class GCCObjectScanner(GCCScanner):
         includes: list = None,
         includeFiles: list = None,
         defines: list = None,
+        parser: "pycparser.CParser" = None,
+        resultCache: ResultCache = None,
+        preprocessorCache: PreprocessorCache = None,
+        trackDependencies: bool = False,
+        headers: list = None,
     ) -> None:
         super().__init__(
             inputFile,
@@ -299,50 +685,299 @@ class GCCObjectScanner(GCCScanner):
             includes,
             includeFiles,
             defines,
-            CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][
+            c.CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][
                 c.GCC_SCANNER_NON_STANDARD_IGNORE_PATTERN
             ],
+            parser,
+            resultCache,
+            preprocessorCache,
+            trackDependencies,
+        )
+        self.headers = headers or []
+
+    def read_symbols(self) -> set:
+        """Return the names of the symbols to be faked, as configured."""
+        tables = elf.read_symbol_tables(self.inputFile)
+        definedFunctions = set().union(*(table.definedFunctions for table in tables))
+        # Leave out references between the members of an archive
+        undefined = set().union(*(table.undefined for table in tables))
+        undefined -= definedFunctions
+        LOGGER.debug(
+            f"{self.inputFile} defines {len(definedFunctions)} and references {len(undefined)} undefined symbols."
         )
 
-    def _read_symbols(self, pathToObj: str) -> SymbolTable:
-        path_list = ["objdump", "-t"]
-        path_list += [pathToObj]
+        symbols = c.CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][
+            c.GCC_OBJECT_SCANNER_SYMBOLS
+        ]
+        if symbols == c.UNDEFINED_OBJECT_SYMBOLS:
+            return undefined
+        elif symbols == c.DEFINED_OBJECT_SYMBOLS:
+            return definedFunctions
+        return undefined | definedFunctions
+
+    def create_header_scanner(self, header: str) -> GCCHeaderScanner:
+        return GCCHeaderScanner(
+            header,
+            self.fakes,
+            self.includes,
+            self.includeFiles,
+            self.defines,
+            self._parser,
+            self.resultCache,
+            self.preprocessorCache,
+            self.trackDependencies,
+        )
 
-        try:
-            pipe = subprocess.Popen(
-                path_list, stdout=subprocess.PIPE, universal_newlines=True
+    @overrides
+    def scan(self) -> ScannerResult:
+        if not self.headers:
+            raise ScannerException(
+                f"Scanning object file {self.inputFile} requires the headers declaring its functions.",
+                "",
             )
-            text = pipe.communicate()[0]
-            matches = re.finditer(
-                r"(?P<object>.*):\s+file format.*\s+SYMBOL TABLE:\n(?P<symbols>(?:.+(\n|$))*)",
-                text,
-                re.MULTILINE,
+        try:
+            symbols = self.read_symbols()
+        except elf.ElfException as e:
+            raise ScannerException(str(e), "")
+
+        declarations = {}
+        definitions = {}
+        self.dependencies = [self.inputFile] if self.trackDependencies else None
+        for header in self.headers:
+            scnr = self.create_header_scanner(header)
+            result = scnr.scan()
+            for function in result.declarations:
+                if function.name in symbols:
+                    declarations.setdefault(function.name, function)
+            for function in result.definitions:
+                if function.name in symbols:
+                    definitions.setdefault(function.name, function)
+            if self.dependencies is not None and scnr.dependencies is not None:
+                self.dependencies += scnr.dependencies
+
+        if self.dependencies is not None:
+            self.dependencies = list(dict.fromkeys(self.dependencies))
+        missing = symbols.difference(declarations, definitions)
+        if missing:
+            LOGGER.debug(
+                f"No declaration found for symbols of {self.inputFile}: {', '.join(sorted(missing))}."
             )
-            tables = list()
-            for match in matches:
-                print(match)
-                objectFile = match.group("object") or pathToObj
-                symbols = match.group("symbols")
-                symMatch = re.search(
-                    r"\*ABS\*\s+[0-9a-fA-F]*\s+(?P<source>.*)", symbols, re.MULTILINE
-                )
-                sourceFile = symMatch.group("source")
+        return ScannerResult(tuple(declarations.values()), tuple(definitions.values()))
 
-                tables.append(SymbolTable(objectFile, None))
-                print(objectFile)
-                print(sourceFile)
-                print(symbols)
-        except OSError as e:
-            raise RuntimeError(
-                "Unable to invoke 'readelf'.  "
-                + "Make sure its path was passed correctly\n"
-                + ("Original error: %s" % e)
-            )
 
-    @overrides
-    def scan(self) -> ScannerResult:
-        self._read_symbols(self.inputFile)
-        return ScannerResult(tuple(), tuple())
+def filter_result(result: ScannerResult, names: set) -> ScannerResult:
+    """Return the part of ``result`` concerning the functions named."""
+    return ScannerResult(
+        tuple(function for function in result.declarations if function.name in names),
+        tuple(function for function in result.definitions if function.name in names),
+    )
+
+
+def release_parser_state(parser: "pycparser.CParser") -> None:
+    """Drop the symbol stack PLY keeps around after parsing, which would
+    otherwise keep the last parsed AST alive until the next parse."""
+    symstack = getattr(getattr(parser, "cparser", None), "symstack", None)
+    if isinstance(symstack, list):
+        del symstack[:]
+
+
+_PYCPARSER_VERSION = None
+
+
+def pycparser_version() -> str:
+    """Version of the installed pycparser. Read from its sources rather than
+    imported, so that looking up cached results doesn't import pycparser."""
+    global _PYCPARSER_VERSION
+    if _PYCPARSER_VERSION is None:
+        match = None
+        spec = importlib.util.find_spec("pycparser")
+        if spec is not None and spec.origin is not None:
+            try:
+                with open(spec.origin) as fp:
+                    match = re.search(
+                        r"^__version__\s*=\s*['\"]([^'\"]+)['\"]", fp.read(), re.M
+                    )
+            except OSError:
+                pass
+        if match is not None:
+            _PYCPARSER_VERSION = match.group(1)
+        else:
+            import pycparser
+
+            _PYCPARSER_VERSION = pycparser.__version__
+    return _PYCPARSER_VERSION
+
+
+def result_cache_key(text: str, inputFile: str) -> str:
+    digest = hashlib.sha256(
+        f"{autofff.__version__}\0{model.FORMAT_VERSION}\0{pycparser_version()}\0".encode()
+    )
+    digest.update(os.path.normpath(inputFile).encode())
+    digest.update(b"\0")
+    digest.update(text.encode())
+    return digest.hexdigest()
+
+
+_ASM_KEYWORD_PATTERN = re.compile(
+    r"\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'|\b(?:__asm__|__asm|asm)\b"
+)
+_ASM_QUALIFIER_PATTERN = re.compile(
+    r"(?:\s+|\b(?:volatile|__volatile__|__volatile|inline|__inline__|__inline|goto)\b)*"
+)
+_ASM_OPERAND_TOKEN_PATTERN = re.compile(
+    r"\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'|[(){}]"
+)
+
+
+def _skip_asm_operands(text: str, start: int) -> int:
+    """Return the end of the parenthesized (or, MSVC style, braced) operands
+    starting at ``start`` or ``None`` if there are none."""
+    if start >= len(text) or text[start] not in "({":
+        return None
+    depth = 0
+    for match in _ASM_OPERAND_TOKEN_PATTERN.finditer(text, start):
+        token = match.group()
+        if token in "({":
+            depth += 1
+        elif token in ")}":
+            depth -= 1
+            if depth == 0:
+                return match.end()
+    return None
+
+
+def strip_asm(text: str) -> str:
+    """Remove inline assembly, i.e. 'asm', '__asm' and '__asm__' followed by
+    any qualifiers ('volatile', 'inline', 'goto') and their operands, in a
+    single pass. Newlines are kept to preserve line numbers. The terminating
+    semicolon is left in place, so that asm labels of declarations like
+    ``int foo(void) asm("bar");`` keep their declaration intact."""
+    output = []
+    position = 0
+    searchStart = 0
+    while True:
+        match = _ASM_KEYWORD_PATTERN.search(text, searchStart)
+        if match is None:
+            break
+        searchStart = match.end()
+        if match.group()[0] in "\"'":
+            continue
+        operandStart = _ASM_QUALIFIER_PATTERN.match(text, match.end()).end()
+        end = _skip_asm_operands(text, operandStart)
+        if end is None:
+            continue
+        output.append(text[position : match.start()])
+        output.append("\n" * text.count("\n", match.start(), end))
+        position = searchStart = end
+    output.append(text[position:])
+    return "".join(output)
+
+
+_PRUNE_TOKEN_PATTERN = re.compile(
+    r"^[ \t]*#[^\n]*|\"(?:\\.|[^\"\\\n])*\"|'(?:\\.|[^'\\\n])*'|[{};]", re.MULTILINE
+)
+_LINE_MARKER_PATTERN = re.compile(
+    r'[ \t]*#[ \t]*(?:line[ \t]+)?[0-9]+[ \t]+"((?:\\.|[^"\\])*)"'
+)
+_PRUNE_KEEP_PATTERN = re.compile(r"\btypedef\b|^\s*(?:\w+\s+)*?(?:struct|union|enum)\b")
+
+
+def _is_directive(line: str) -> bool:
+    return line.lstrip().startswith("#")
+
+
+class PreprocessorOutputFilter:
+    """Filter preprocessor output fed in chunks of whole lines as it arrives.
+
+    Top-level declarations are split off as soon as they are complete. Those
+    entirely from files other than the target(s) are blanked out, except for
+    the typedefs as well as struct, union and enum definitions the parser
+    might need (only if ``isTargetFile`` is given, which is called with the
+    file name of each line marker). Inline assembly is stripped from the rest
+    if ``stripAsm`` is set. Line markers and line numbers are left intact."""
+
+    def __init__(self, isTargetFile=None, stripAsm: bool = True) -> None:
+        self.isTargetFile = isTargetFile
+        self.stripAsm = stripAsm
+        self._pending = ""
+        self._targetFiles = {}
+        self._isTarget = True  # Text ahead of the first line marker
+        self._touchesTarget = False
+        self._depth = 0
+        self._isFunctionBody = False
+
+    def feed(self, text: str) -> str:
+        """Return the filtered declarations completed by ``text``."""
+        if self.isTargetFile is None and not self.stripAsm:
+            return text
+
+        position = len(self._pending)
+        text = self._pending + text
+        output = []
+        statementStart = 0
+        for match in _PRUNE_TOKEN_PATTERN.finditer(text, position):
+            start = match.start()
+            if (
+                self._isTarget
+                and not self._touchesTarget
+                and start > position
+                and not text[position:start].isspace()
+            ):
+                self._touchesTarget = True
+            position = match.end()
+            token = match.group()
+
+            if token[0] in " \t#":
+                marker = _LINE_MARKER_PATTERN.match(token)
+                if marker is not None and self.isTargetFile is not None:
+                    self._enter(marker.group(1))
+                continue
+
+            self._touchesTarget = self._touchesTarget or self._isTarget
+            if token == "{":
+                if self._depth == 0:
+                    before = start - 1
+                    while before >= 0 and text[before].isspace():
+                        before -= 1
+                    self._isFunctionBody = before >= 0 and text[before] == ")"
+                self._depth += 1
+                continue
+            elif token == "}":
+                self._depth = max(self._depth - 1, 0)
+                if self._depth != 0 or not self._isFunctionBody:
+                    continue
+            elif token != ";" or self._depth != 0:
+                continue
+
+            output.append(self._filter_declaration(text[statementStart:position]))
+            statementStart = position
+            self._touchesTarget = False
+            self._isFunctionBody = False
+
+        if self._isTarget and not self._touchesTarget and not text[position:].isspace():
+            self._touchesTarget = len(text) > position
+        self._pending = text[statementStart:]
+        return "".join(output)
+
+    def close(self) -> str:
+        """Return whatever is left of an incomplete declaration."""
+        text = self._pending
+        self._pending = ""
+        return strip_asm(text) if self.stripAsm else text
+
+    def _enter(self, header: str) -> None:
+        isTarget = self._targetFiles.get(header)
+        if isTarget is None:
+            isTarget = self._targetFiles[header] = bool(self.isTargetFile(header))
+        self._isTarget = isTarget
+
+    def _filter_declaration(self, declaration: str) -> str:
+        if not self._touchesTarget:
+            lines = declaration.split("\n")
+            code = "\n".join(line for line in lines if not _is_directive(line))
+            if not _PRUNE_KEEP_PATTERN.search(code):
+                return "\n".join(line if _is_directive(line) else "" for line in lines)
+        return strip_asm(declaration) if self.stripAsm else declaration
 
 
 def format_as_includes(includes: list) -> list:
@@ -360,11 +995,11 @@ def format_as_include_files(fileInclude: list) -> list:
 
 
 def format_as_include(include: str) -> str:
-    return f"{CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][c.GCC_SCANNER_CPP_INCLUDE_DIR_PREFIX]}{include.strip()}"
+    return f"{c.CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][c.GCC_SCANNER_CPP_INCLUDE_DIR_PREFIX]}{include.strip()}"
 
 
 def format_as_include_file(fileInclude: str) -> str:
-    return f"{CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][c.GCC_SCANNER_CPP_INCLUDE_FILE_PREFIX]}{fileInclude.strip()}"
+    return f"{c.CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][c.GCC_SCANNER_CPP_INCLUDE_FILE_PREFIX]}{fileInclude.strip()}"
 
 
 def format_as_defines(defines: list) -> list:
@@ -375,4 +1010,4 @@ def format_as_defines(defines: list) -> list:
 
 
 def format_as_define(define: str) -> str:
-    return f"{CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][c.GCC_SCANNER_CPP_DEFINE_PREFIX]}{define.strip()}"
+    return f"{c.CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][c.GCC_SCANNER_CPP_DEFINE_PREFIX]}{define.strip()}"
@@ -0,0 +1,278 @@
+from argparse import ArgumentParser
+from contextlib import redirect_stderr, redirect_stdout
+import io
+import json
+import logging
+import os
+import resource
+import socketserver
+import sys
+import time
+import traceback
+
+import autofff.__main__ as cli
+import autofff.client as client
+import autofff.cparser as cparser
+import autofff.runner as runner
+from autofff.cache import MemoryResultCache
+
+LOGGER = logging.getLogger(__name__)
+
+DEFAULT_IDLE_TIMEOUT = 600.0
+DEFAULT_CACHE_SIZE = 256
+
+RUN_COMMAND = "run"
+STATS_COMMAND = "stats"
+SHUTDOWN_COMMAND = "shutdown"
+
+
+class ServerException(Exception):
+    pass
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        try:
+            request = json.loads(self.rfile.readline())
+        except ValueError as e:
+            LOGGER.warning(f"Discarding malformed request: {e}")
+            return
+        response = self.server.process(request)
+        self.wfile.write(json.dumps(response).encode())
+
+
+class Server(socketserver.UnixStreamServer):
+    request_queue_size = 128
+
+    def __init__(
+        self,
+        socketPath: str,
+        idleTimeout: float = DEFAULT_IDLE_TIMEOUT,
+        cacheSize: int = DEFAULT_CACHE_SIZE,
+    ) -> None:
+        self.socketPath = socketPath
+        self.idleTimeout = idleTimeout
+        self.resultCache = MemoryResultCache(cacheSize)
+        # Unlike one-off runs, the server builds the parser up front
+        self.runner = runner.Runner(cparser.get_parser(), self.resultCache)
+        self.requestCount = 0
+        self.startTime = time.monotonic()
+        self.lastActivity = self.startTime
+        self.shutdownRequested = False
+
+        if os.path.exists(socketPath):
+            try:
+                client.send_request({"command": STATS_COMMAND}, socketPath)
+            except (OSError, ValueError):
+                LOGGER.debug(f"Removing stale socket {socketPath}.")
+                os.unlink(socketPath)
+            else:
+                raise ServerException(
+                    f"Another autofff server is already listening on {socketPath}."
+                )
+
+        oldMask = os.umask(0o077)
+        try:
+            super().__init__(socketPath, RequestHandler)
+        finally:
+            os.umask(oldMask)
+
+    def serve_until_idle(self) -> None:
+        LOGGER.info(f"Listening on {self.socketPath}.")
+        while not self.shutdownRequested:
+            if self.idleTimeout > 0:
+                remaining = self.idleTimeout - (time.monotonic() - self.lastActivity)
+                if remaining <= 0:
+                    LOGGER.info(
+                        f"No requests for {self.idleTimeout:g}s, shutting down."
+                    )
+                    break
+                self.timeout = remaining
+            self.handle_request()
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            os.unlink(self.socketPath)
+        except FileNotFoundError:
+            pass
+
+    def process(self, request: dict) -> dict:
+        self.lastActivity = time.monotonic()
+        command = request.get("command", RUN_COMMAND)
+        if command == STATS_COMMAND:
+            return self.stats()
+        elif command == SHUTDOWN_COMMAND:
+            self.shutdownRequested = True
+            return {"returncode": 0, "stdout": "", "stderr": ""}
+        elif command == RUN_COMMAND:
+            return self._process_run(request)
+        else:
+            return {
+                "returncode": 1,
+                "stdout": "",
+                "stderr": f"Unknown command '{command}'.\n",
+            }
+
+    def stats(self) -> dict:
+        return {
+            "requests": self.requestCount,
+            "uptime": time.monotonic() - self.startTime,
+            "jobs": self.runner.jobCount,
+            "failedJobs": self.runner.failedJobCount,
+            "cachedResults": len(self.resultCache),
+            "cacheHits": self.resultCache.hits,
+            "cacheMisses": self.resultCache.misses,
+            "cacheEvictions": self.resultCache.evictions,
+            "maxRss": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        }
+
+    def _process_run(self, request: dict) -> dict:
+        self.requestCount += 1
+        before = self.stats()
+        wallStart = time.perf_counter()
+        cpuStart = time.process_time()
+
+        stdout = io.StringIO()
+        stderr = io.StringIO()
+        handler = logging.StreamHandler(stderr)
+        handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+        rootLogger = logging.getLogger()
+        previousLevel = rootLogger.level
+        previousCwd = os.getcwd()
+        previousEnv = dict(os.environ)
+        try:
+            os.chdir(request.get("cwd", previousCwd))
+            if "env" in request:
+                os.environ.clear()
+                os.environ.update(request["env"])
+            rootLogger.addHandler(handler)
+            with redirect_stdout(stdout), redirect_stderr(stderr):
+                returncode = self._run(request.get("argv", []))
+        finally:
+            rootLogger.removeHandler(handler)
+            rootLogger.setLevel(previousLevel)
+            os.environ.clear()
+            os.environ.update(previousEnv)
+            os.chdir(previousCwd)
+
+        after = self.stats()
+        requestStats = {
+            "wallTime": round(time.perf_counter() - wallStart, 6),
+            "cpuTime": round(time.process_time() - cpuStart, 6),
+            "jobs": after["jobs"] - before["jobs"],
+            "failedJobs": after["failedJobs"] - before["failedJobs"],
+            "cacheHits": after["cacheHits"] - before["cacheHits"],
+            "cacheMisses": after["cacheMisses"] - before["cacheMisses"],
+            "cachedResults": after["cachedResults"],
+            "maxRss": after["maxRss"],
+        }
+        LOGGER.info(
+            f"Request #{self.requestCount} finished with exit code {returncode}: "
+            + ", ".join(f"{key}={value}" for key, value in requestStats.items())
+        )
+        return {
+            "returncode": returncode,
+            "stdout": stdout.getvalue(),
+            "stderr": stderr.getvalue(),
+            "stats": requestStats,
+        }
+
+    def _run(self, argv: list) -> int:
+        try:
+            args, parser = cli.parse_arguments(argv)
+            if getattr(args, "watch", False):
+                parser.error("argument --watch is not supported by the server")
+            logging.getLogger().setLevel(args.logLevel)
+            return cli.run(args, parser, self.runner)
+        except SystemExit as e:
+            if e.code is None:
+                return 0
+            elif isinstance(e.code, int):
+                return e.code
+            print(e.code, file=sys.stderr)
+            return 1
+        except Exception:
+            traceback.print_exc()
+            return 1
+
+
+def main() -> None:
+    parser = ArgumentParser(
+        prog="autofff-server",
+        description="Keep autofff's parser, configuration and scan results warm for autofff-client invocations",
+    )
+    parser.add_argument(
+        "-s",
+        "--socket",
+        type=str,
+        help=f"Path of the Unix domain socket to listen on (default: ${client.SOCKET_ENV} or a per-user socket in the runtime directory).",
+        default=None,
+        dest="socketPath",
+    )
+    parser.add_argument(
+        "--idle-timeout",
+        type=float,
+        help=f"Shut down after this many seconds without requests. 0 disables the timeout (default: {DEFAULT_IDLE_TIMEOUT:g}).",
+        default=DEFAULT_IDLE_TIMEOUT,
+        dest="idleTimeout",
+    )
+    parser.add_argument(
+        "--cache-size",
+        type=int,
+        help=f"Maximum number of scanner results kept in memory (default: {DEFAULT_CACHE_SIZE}).",
+        default=DEFAULT_CACHE_SIZE,
+        dest="cacheSize",
+    )
+    parser.add_argument(
+        "--status",
+        help="Print the statistics of a running server and exit.",
+        action="store_const",
+        dest="command",
+        const=STATS_COMMAND,
+    )
+    parser.add_argument(
+        "--stop",
+        help="Stop a running server and exit.",
+        action="store_const",
+        dest="command",
+        const=SHUTDOWN_COMMAND,
+    )
+    parser.add_argument(
+        "--verbose",
+        help="Log every request and its statistics.",
+        action="store_const",
+        dest="logLevel",
+        const=logging.INFO,
+        default=logging.WARNING,
+    )
+    args = parser.parse_args()
+
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+    LOGGER.addHandler(handler)
+    LOGGER.setLevel(args.logLevel)
+    LOGGER.propagate = False
+
+    socketPath = args.socketPath or client.default_socket_path()
+    if args.command is not None:
+        try:
+            response = client.send_request({"command": args.command}, socketPath)
+        except (OSError, ValueError) as e:
+            LOGGER.error(f"No autofff server reachable on {socketPath}: {e}")
+            sys.exit(1)
+        if args.command == STATS_COMMAND:
+            print(json.dumps(response, indent=4))
+        return
+
+    try:
+        server = Server(socketPath, args.idleTimeout, args.cacheSize)
+    except ServerException as e:
+        LOGGER.error(str(e))
+        sys.exit(1)
+    with server:
+        server.serve_until_idle()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+import contextlib
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    LOGGER.error("Module is not intended to run as '__main__'!")
+    sys.exit(1)
+
+JSON_FORMAT = "json"
+CHROME_FORMAT = "chrome"
+FORMATS = (JSON_FORMAT, CHROME_FORMAT)
+
+PROFILE_SUFFIX = ".prof"
+
+_NULL_PHASE = contextlib.nullcontext()
+
+
+class Recorder:
+    """Collects the wall and CPU time of phases along with counters (e.g.
+    the size of the preprocessor output), both per input file. Phases are
+    kept as ``(phase, input, start, wall, cpu, pid, tid)`` in nanoseconds
+    of ``time.perf_counter_ns`` and ``time.thread_time_ns``, so that those
+    of worker processes can be merged in."""
+
+    def __init__(self) -> None:
+        self.origin = time.perf_counter_ns()
+        self.phases = []
+        self.counters = []
+
+    def extend(self, recorded: tuple) -> None:
+        """Merge the ``(phases, counters)`` of another recorder."""
+        phases, counters = recorded
+        self.phases += phases
+        self.counters += counters
+
+    def take(self) -> tuple:
+        """Return and forget the ``(phases, counters)`` recorded so far."""
+        recorded = (self.phases, self.counters)
+        self.phases = []
+        self.counters = []
+        return recorded
+
+
+class _Phase:
+    __slots__ = ("recorder", "name", "inputFile", "start", "cpuStart")
+
+    def __init__(self, recorder: Recorder, name: str, inputFile: str) -> None:
+        self.recorder = recorder
+        self.name = name
+        self.inputFile = inputFile
+
+    def __enter__(self) -> "_Phase":
+        self.cpuStart = time.thread_time_ns()
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        wall = time.perf_counter_ns() - self.start
+        cpu = time.thread_time_ns() - self.cpuStart
+        self.recorder.phases.append(
+            (
+                self.name,
+                self.inputFile,
+                self.start,
+                wall,
+                cpu,
+                os.getpid(),
+                threading.get_ident(),
+            )
+        )
+
+
+RECORDER = None
+
+
+def enable() -> Recorder:
+    global RECORDER
+    RECORDER = Recorder()
+    return RECORDER
+
+
+def disable() -> None:
+    global RECORDER
+    RECORDER = None
+
+
+def is_enabled() -> bool:
+    return RECORDER is not None
+
+
+def phase(name: str, inputFile: str):
+    """Context manager timing a phase of processing ``inputFile``. Costs next
+    to nothing while timings aren't enabled."""
+    if RECORDER is None:
+        return _NULL_PHASE
+    return _Phase(RECORDER, name, inputFile)
+
+
+def count(name: str, inputFile: str, value: int) -> None:
+    if RECORDER is not None:
+        RECORDER.counters.append((name, inputFile, value))
+
+
+def summarize(recorder: Recorder) -> dict:
+    """Aggregate the phases and counters per input and in total."""
+    inputs = {}
+    total = {}
+    for name, inputFile, _, wall, cpu, _, _ in recorder.phases:
+        for phases in (inputs.setdefault(inputFile, {}), total):
+            entry = phases.setdefault(name, {"wall": 0.0, "cpu": 0.0, "count": 0})
+            entry["wall"] += wall / 1e9
+            entry["cpu"] += cpu / 1e9
+            entry["count"] += 1
+    for name, inputFile, value in recorder.counters:
+        for phases in (inputs.setdefault(inputFile, {}), total):
+            phases[name] = phases.get(name, 0) + value
+    return {
+        "wall": (time.perf_counter_ns() - recorder.origin) / 1e9,
+        "total": total,
+        "inputs": inputs,
+    }
+
+
+def chrome_trace(recorder: Recorder) -> dict:
+    """Return the phases as Chrome's trace event format, as understood by
+    chrome://tracing and Perfetto."""
+    events = []
+    for name, inputFile, start, wall, cpu, pid, tid in recorder.phases:
+        events.append(
+            {
+                "name": name,
+                "cat": "autofff",
+                "ph": "X",
+                "ts": (start - recorder.origin) / 1e3,
+                "dur": wall / 1e3,
+                "pid": pid,
+                "tid": tid,
+                "args": {"input": inputFile, "cpu_ms": cpu / 1e6},
+            }
+        )
+    counters = {}
+    for name, inputFile, value in recorder.counters:
+        counters[(name, inputFile)] = counters.get((name, inputFile), 0) + value
+    return {
+        "traceEvents": events,
+        "displayTimeUnit": "ms",
+        "otherData": {
+            "counters": [
+                {"name": name, "input": inputFile, "value": value}
+                for (name, inputFile), value in counters.items()
+            ]
+        },
+    }
+
+
+def format_report(recorder: Recorder, format: str = JSON_FORMAT) -> str:
+    if format == CHROME_FORMAT:
+        report = chrome_trace(recorder)
+    else:
+        report = summarize(recorder)
+    return json.dumps(report, indent=4) + "\n"
+
+
+def format_profile_path(directory: str, inputFile: str) -> str:
+    """Path of the cProfile stats of an input, named after its path so that
+    inputs sharing a file name don't collide."""
+    name = os.path.normpath(inputFile).strip(os.sep).replace(os.sep, "__")
+    return os.path.join(directory, name.replace("..", "_") + PROFILE_SUFFIX)
+
+
+def profiled(directory: str, inputFile: str, function, *args) -> object:
+    """Call ``function`` under cProfile and dump the stats for ``inputFile``
+    into ``directory``, or just call it if ``directory`` is ``None``."""
+    if directory is None:
+        return function(*args)
+    import cProfile
+
+    profile = cProfile.Profile()
+    try:
+        return profile.runcall(function, *args)
+    finally:
+        os.makedirs(directory, exist_ok=True)
+        path = format_profile_path(directory, inputFile)
+        profile.dump_stats(path)
+        LOGGER.debug(f"Wrote profile of {inputFile} to {path}.")
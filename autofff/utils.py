@@ -1,40 +1,104 @@
+import copy
 import logging
 import sys
+import weakref
 from pycparser.c_ast import (
     ArrayDecl,
     Decl,
+    EllipsisParam,
     Enum,
     FuncDecl,
+    FuncDef,
+    ID,
     IdentifierType,
+    NamedInitializer,
+    Node,
+    NodeVisitor,
     PtrDecl,
     Struct,
+    StructRef,
     TypeDecl,
+    Typedef,
     Union,
 )
 
 from pycparser.c_generator import CGenerator
 
+import autofff.model as model
+
 LOGGER = logging.getLogger(__name__)
 
 if __name__ == "__main__":
     LOGGER.error("Module is not intended to run as '__main__'!")
     sys.exit(1)
 
+_GENERATOR = CGenerator()
+
+_TYPE_NAMES = {}
+_TYPE_NAMES_MAX_ENTRIES = 4096
+_BODY_NAMES = weakref.WeakKeyDictionary()
+
+
+def _type_key(node: Node) -> tuple:
+    """Return a hashable key of everything in ``node`` that affects its
+    rendered type name. Declarator and parameter names are left out, so that
+    e.g. all 'int' parameters share one key."""
+    if isinstance(node, IdentifierType):
+        return tuple(node.names)
+    elif isinstance(node, (TypeDecl, PtrDecl)):
+        return (node.__class__, tuple(node.quals), _type_key(node.type))
+    elif isinstance(node, FuncDecl):
+        if node.args is None:
+            params = None
+        else:
+            params = tuple(
+                _type_key(param.type) if hasattr(param, "type") else param.__class__
+                for param in node.args.params
+            )
+        return (FuncDecl, params, _type_key(node.type))
+    elif isinstance(node, ArrayDecl):
+        return (ArrayDecl, _type_key(node.type))
+    elif isinstance(node, (Struct, Union, Enum)):
+        return (node.__class__, _get_type_name_body(node))
+    else:
+        raise ValueError(f"Unknown type {type(node)}")
+
+
+def clear_type_name_cache() -> None:
+    _TYPE_NAMES.clear()
+    _BODY_NAMES.clear()
+
+
+def _get_type_name_body(node: Node) -> str:
+    # Walking a struct, union or enum body to build a structural key costs
+    # about as much as rendering it, so its rendering serves as the key. It's
+    # memoized per node, as the same parameter gets rendered repeatedly.
+    name = _BODY_NAMES.get(node)
+    if name is None:
+        if isinstance(node, Struct):
+            name = _GENERATOR.visit_Struct(node).replace("\n", "")
+        elif isinstance(node, Union):
+            name = _GENERATOR.visit_Union(node).replace("\n", "")
+        else:
+            name = _GENERATOR.visit_Enum(node)
+        _BODY_NAMES[node] = name
+    return name
+
 
 def _get_type_name_struct(struct: Struct) -> str:
-    return CGenerator().visit_Struct(struct).replace("\n", "")
+    return _get_type_name_body(struct)
 
 
 def _get_type_name_union(union: Union) -> str:
-    return CGenerator().visit_Union(union).replace("\n", "")
+    return _get_type_name_body(union)
 
 
 def _get_type_name_enum(enum: Enum) -> str:
-    return CGenerator().visit_Enum(enum)
+    return _get_type_name_body(enum)
 
 
 def _get_type_name_identifiertype(identifiertype: IdentifierType) -> str:
-    return CGenerator().visit_IdentifierType(identifiertype)
+    return _GENERATOR.visit_IdentifierType(identifiertype)
 
 
 def _get_type_name_typedecl(typedecl: TypeDecl, omitConst: bool = False) -> str:
@@ -102,6 +166,22 @@ def _get_type_name_arraydecl(arraydecl: ArrayDecl) -> str:
 
 
 def get_type_name(decl: Decl, omitConst: bool = True) -> str:
+    """Return the name of the type of ``decl``, rendering each structurally
+    distinct type only once."""
+    try:
+        key = (omitConst, _type_key(decl.type))
+    except ValueError:
+        return _render_type_name(decl, omitConst)
+    name = _TYPE_NAMES.get(key)
+    if name is None:
+        name = sys.intern(_render_type_name(decl, omitConst))
+        if len(_TYPE_NAMES) >= _TYPE_NAMES_MAX_ENTRIES:
+            _TYPE_NAMES.clear()
+        _TYPE_NAMES[key] = name
+    return name
+
+
+def _render_type_name(decl: Decl, omitConst: bool) -> str:
     if isinstance(decl.type, TypeDecl):
         return _get_type_name_typedecl(decl.type, omitConst=omitConst)
     elif isinstance(decl.type, PtrDecl):
@@ -121,3 +201,80 @@ def is_function_pointer_type(ptrdecl: PtrDecl) -> bool:
 def create_typedef_name_for_fnc_ptr(decl: Decl, param: Decl) -> str:
     index = decl.type.args.params.index(param)
     return f"fff_{decl.name}_param{index}"
+
+
+def _create_function_pointer(decl: Decl, param: Decl) -> model.FunctionPointer:
+    name = create_typedef_name_for_fnc_ptr(decl, param)
+    # Work on a copy, as the AST might still be shared (e.g. with a cache)
+    ptrType = copy.deepcopy(param.type)
+    type = ptrType.type.type
+    while not hasattr(type, "declname"):
+        type = type.type
+    type.declname = name
+    typedef = Typedef(name, param.quals, ["typedef"], ptrType)
+    return model.FunctionPointer(name, _GENERATOR.visit_Typedef(typedef))
+
+
+def create_function(decl: Decl) -> model.Function:
+    """Reduce the declaration of a function to the model fakes are generated
+    from, so that the AST needn't be kept around."""
+    funcDecl = decl.type
+    params = [] if funcDecl.args is None else funcDecl.args.params
+    isVariadic = any(isinstance(param, EllipsisParam) for param in params)
+    if len(params) == 1 and (isVariadic or get_type_name(params[0]) == "void"):
+        params = []
+
+    parameters = []
+    functionPointers = []
+    for param in params:
+        if isinstance(param, EllipsisParam):
+            continue
+        if is_function_pointer_type(param.type):
+            functionPointer = _create_function_pointer(decl, param)
+            functionPointers.append(functionPointer)
+            typeName = _get_type_name_typedecl(
+                TypeDecl(
+                    param.name,
+                    param.type.quals,
+                    None,
+                    IdentifierType([functionPointer.name]),
+                ),
+                omitConst=True,
+            )
+        else:
+            typeName = get_type_name(param)
+        parameters.append(model.Parameter(param.name, typeName))
+
+    return model.Function(
+        decl.name,
+        get_type_name(funcDecl),
+        parameters,
+        isVariadic,
+        functionPointers,
+        decl.coord.line if decl.coord is not None else None,
+    )
+
+
+class FunctionUsageVisitor(NodeVisitor):
+    """Collect the identifiers referenced within a translation unit, i.e. the
+    functions called (``FuncCall``) but also those whose address is taken,
+    along with the names of the functions it defines."""
+
+    def __init__(self) -> None:
+        self.referenced = set()
+        self.defined = set()
+
+    def visit_FuncDef(self, node: FuncDef) -> None:
+        self.defined.add(node.decl.name)
+        self.visit(node.body)
+
+    def visit_ID(self, node: ID) -> None:
+        self.referenced.add(node.name)
+
+    def visit_StructRef(self, node: StructRef) -> None:
+        # Skip the member name
+        self.visit(node.name)
+
+    def visit_NamedInitializer(self, node: NamedInitializer) -> None:
+        # Skip the designators
+        self.visit(node.expr)
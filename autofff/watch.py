@@ -0,0 +1,278 @@
+from autofff.cache import MemoryResultCache
+
+from abc import ABC, abstractmethod
+import ctypes
+import ctypes.util
+import logging
+import os
+import os.path
+import select
+import struct
+import sys
+import time
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    import autofff.runner as runner
+
+LOGGER = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    LOGGER.error("Module is not intended to run as '__main__'!")
+    sys.exit(1)
+
+DEFAULT_DEBOUNCE = 0.2
+DEFAULT_POLL_INTERVAL = 0.5
+
+# From <sys/inotify.h>
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ONLYDIR = 0x01000000
+
+# Directories are watched rather than the files themselves, as editors
+# commonly save by replacing a file, which would end a watch on the file
+_INOTIFY_MASK = (
+    IN_CLOSE_WRITE | IN_ATTRIB | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+)
+_INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class Watcher(ABC):
+    """Reports changes to a set of files, given by their real paths."""
+
+    def __init__(self) -> None:
+        self.paths = set()
+
+    def watch(self, paths: set) -> None:
+        self.paths = set(paths)
+
+    @abstractmethod
+    def poll(self, timeout: float = None) -> set:
+        """Wait up to ``timeout`` seconds (forever if ``None``) for changes
+        and return the files changed, which may be empty on timeout."""
+        pass
+
+    def changes(self, debounce: float = DEFAULT_DEBOUNCE) -> set:
+        """Block until any of the watched files changes. Further changes
+        following within ``debounce`` seconds of each other are collected as
+        well, so that saving several files at once is reported only once."""
+        changed = set()
+        deadline = None
+        while True:
+            timeout = None
+            if deadline is not None:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    return changed
+            found = self.poll(timeout) & self.paths
+            if found:
+                changed |= found
+                deadline = time.monotonic() + debounce
+
+    def close(self) -> None:
+        pass
+
+
+class PollingWatcher(Watcher):
+    """Detects changes by comparing the size and modification time of each
+    file every ``interval`` seconds."""
+
+    def __init__(self, interval: float = DEFAULT_POLL_INTERVAL) -> None:
+        super().__init__()
+        self.interval = interval
+        self._stamps = {}
+
+    @staticmethod
+    def _stamp(path: str) -> tuple:
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        return stat.st_size, stat.st_mtime_ns
+
+    def watch(self, paths: set) -> None:
+        super().watch(paths)
+        # Keep the stamps of files watched already, so that changes made while
+        # regenerating aren't missed
+        self._stamps = {
+            path: self._stamps[path] if path in self._stamps else self._stamp(path)
+            for path in self.paths
+        }
+
+    def _scan(self) -> set:
+        changed = set()
+        for path, stamp in self._stamps.items():
+            current = self._stamp(path)
+            if current != stamp:
+                self._stamps[path] = current
+                changed.add(path)
+        return changed
+
+    def poll(self, timeout: float = None) -> set:
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            changed = self._scan()
+            if changed:
+                return changed
+            delay = self.interval
+            if end is not None:
+                delay = min(delay, end - time.monotonic())
+                if delay <= 0:
+                    return changed
+            time.sleep(delay)
+
+
+class InotifyWatcher(Watcher):
+    """Watches the directories of the files via Linux' inotify, called
+    through ctypes."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self._fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self._fd < 0:
+            error = ctypes.get_errno()
+            raise OSError(error, f"inotify_init1 failed: {os.strerror(error)}")
+        self._directories = {}
+        self._descriptors = {}
+
+    def watch(self, paths: set) -> None:
+        super().watch(paths)
+        directories = {os.path.dirname(path) for path in self.paths}
+        for directory in set(self._descriptors) - directories:
+            descriptor = self._descriptors.pop(directory)
+            self._directories.pop(descriptor, None)
+            self._libc.inotify_rm_watch(self._fd, descriptor)
+        for directory in directories - set(self._descriptors):
+            descriptor = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(directory), _INOTIFY_MASK | IN_ONLYDIR
+            )
+            if descriptor < 0:
+                LOGGER.warning(
+                    f"Unable to watch {directory}: {os.strerror(ctypes.get_errno())}"
+                )
+                continue
+            self._descriptors[directory] = descriptor
+            self._directories[descriptor] = directory
+
+    def _read(self) -> set:
+        changed = set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return changed
+        offset = 0
+        while offset + _INOTIFY_EVENT.size <= len(data):
+            descriptor, mask, _, length = _INOTIFY_EVENT.unpack_from(data, offset)
+            offset += _INOTIFY_EVENT.size
+            name = data[offset : offset + length].rstrip(b"\0")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                LOGGER.debug("Lost inotify events, assuming all files changed.")
+                changed |= self.paths
+            elif mask & IN_IGNORED:
+                # The directory itself was removed
+                directory = self._directories.pop(descriptor, None)
+                if self._descriptors.get(directory) == descriptor:
+                    del self._descriptors[directory]
+            elif descriptor in self._directories and name:
+                changed.add(
+                    os.path.join(self._directories[descriptor], os.fsdecode(name))
+                )
+        return changed
+
+    def poll(self, timeout: float = None) -> set:
+        try:
+            readable, _, _ = select.select([self._fd], [], [], timeout)
+        except InterruptedError:
+            return set()
+        return self._read() if readable else set()
+
+    def close(self) -> None:
+        if self._fd >= 0:
+            os.close(self._fd)
+            self._fd = -1
+
+
+def create_watcher(pollInterval: float = None) -> Watcher:
+    """Create an inotify based watcher where available, unless a
+    ``pollInterval`` is given. Falls back to polling otherwise."""
+    if pollInterval is None and sys.platform.startswith("linux"):
+        try:
+            return InotifyWatcher()
+        except (OSError, AttributeError) as e:
+            # E.g. the limit of inotify instances being reached
+            LOGGER.info(f"inotify is unavailable ({e}), polling for changes instead.")
+    return PollingWatcher(pollInterval or DEFAULT_POLL_INTERVAL)
+
+
+def _real_paths(paths: list) -> set:
+    return {os.path.realpath(path) for path in paths}
+
+
+def _job_paths(rnr: "runner.Runner", job: "runner.Job") -> set:
+    return _real_paths(rnr.jobDependencies.get(job, [job.inputFile]))
+
+
+def affected_jobs(
+    rnr: "runner.Runner", jobs: list, changed: set, failedJobs: set
+) -> list:
+    """Return the jobs whose dependencies contain a changed file, along with
+    all other variants of their define matrix, since variants are compared
+    to each other. Jobs that failed before are retried on any change."""
+    affected = [
+        job for job in jobs if job in failedJobs or _job_paths(rnr, job) & changed
+    ]
+    groups = {job.variantGroup for job in affected if job.variant is not None}
+    return [
+        job
+        for job in jobs
+        if job in affected or (job.variant is not None and job.variantGroup in groups)
+    ]
+
+
+def watch(
+    rnr: "runner.Runner",
+    jobs: list,
+    debounce: float = DEFAULT_DEBOUNCE,
+    pollInterval: float = None,
+) -> int:
+    """Run the jobs, then regenerate the outputs affected by each change of
+    an input or any file it includes, until interrupted. The runner's parser
+    and results are kept across runs, so that only the changed headers are
+    preprocessed and parsed again."""
+    rnr.trackDependencies = True
+    rnr.jobDependencies = {}
+    if rnr.resultCache is None:
+        rnr.resultCache = MemoryResultCache()
+
+    watcher = create_watcher(pollInterval)
+    failedJobs = set()
+    try:
+        watcher.watch(_real_paths(job.inputFile for job in jobs))
+        failedJobs = set(rnr.run(jobs))
+        while True:
+            paths = set()
+            for job in jobs:
+                paths |= _job_paths(rnr, job)
+            watcher.watch(paths)
+            LOGGER.info(
+                f"Watching {len(paths)} files for changes of {len(jobs)} outputs..."
+            )
+            changed = watcher.changes(debounce)
+            affected = affected_jobs(rnr, jobs, changed, failedJobs)
+            LOGGER.info(
+                f"{', '.join(sorted(changed))} changed, regenerating {len(affected)} of {len(jobs)} outputs."
+            )
+            failedJobs = failedJobs.difference(affected) | set(rnr.run(affected))
+    except KeyboardInterrupt:
+        LOGGER.info("Stopped watching.")
+    finally:
+        watcher.close()
+    return 1 if failedJobs else 0
@@ -0,0 +1,283 @@
+from argparse import ArgumentParser
+import gc
+import json
+import logging
+import os.path
+import platform
+import resource
+import statistics
+import sys
+import tempfile
+import time
+
+import pycparser
+
+import autofff
+import autofff.config as c
+import autofff.cparser as cparser
+import autofff.generator as generator
+import autofff.scanner as scanner
+import autofff.utils as utils
+
+from benchmarks.corpus import generate_corpus
+
+LOGGER = logging.getLogger(__name__)
+
+RESULT_FORMAT = "autofff-benchmark"
+RESULT_VERSION = 1
+
+STAGES = ("preprocess", "filter", "parse", "mine", "generate")
+
+
+def _peak_rss() -> int:
+    """Peak resident set size of the process so far, in KiB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Reported in bytes on macOS, in KiB elsewhere
+    return peak // 1024 if sys.platform == "darwin" else peak
+
+
+def run_once(corpus, parser: pycparser.CParser, outputDir: str) -> dict:
+    """Run every stage on each header of the corpus once. Returns the time
+    spent per stage (summed across headers) and the peak RSS after each."""
+    utils.clear_type_name_cache()
+    seconds = dict.fromkeys(STAGES, 0.0)
+    peakRss = {}
+    regexFilter = (
+        c.CONFIG[c.AUTOFFF_SECTION][c.GCC_SCANNER_SECTION][
+            c.GCC_SCANNER_NON_STANDARD_FILTER
+        ]
+        == c.REGEX_NON_STANDARD_FILTER
+    )
+    for header in corpus.headers:
+        scnr = scanner.GCCHeaderScanner(header, [], [corpus.includeDir], parser=parser)
+
+        # Preprocessing alone, as done by GCCScanner._preprocess_file but
+        # without filtering the output while it's being read
+        start = time.perf_counter()
+        text, _, _ = scnr._run_cpp(
+            header,
+            scnr._cpp_path(),
+            scnr._cpp_args(),
+            scanner.PreprocessorOutputFilter(None, False),
+        )
+        seconds["preprocess"] += time.perf_counter() - start
+        peakRss["preprocess"] = _peak_rss()
+
+        start = time.perf_counter()
+        outputFilter = scnr._output_filter()
+        text = outputFilter.feed(text) + outputFilter.close()
+        if regexFilter:
+            text = scnr.ignorePattern.sub("", text)
+        seconds["filter"] += time.perf_counter() - start
+        peakRss["filter"] = _peak_rss()
+
+        start = time.perf_counter()
+        ast = scnr._parse_text(text, header, parser)
+        seconds["parse"] += time.perf_counter() - start
+        peakRss["parse"] = _peak_rss()
+
+        start = time.perf_counter()
+        result = scnr._mine(ast)
+        seconds["mine"] += time.perf_counter() - start
+        peakRss["mine"] = _peak_rss()
+        del ast
+
+        start = time.perf_counter()
+        outputFile = os.path.join(
+            outputDir, os.path.splitext(os.path.basename(header))[0] + "_th.h"
+        )
+        generator.render(generator.create_generator(outputFile, header), result)
+        seconds["generate"] += time.perf_counter() - start
+        peakRss["generate"] = _peak_rss()
+    return {"seconds": seconds, "peakRssKiB": peakRss}
+
+
+def run_benchmark(corpus, repeat: int) -> dict:
+    parser = cparser.get_parser()
+    runs = []
+    with tempfile.TemporaryDirectory(prefix="autofff-benchmark-") as outputDir:
+        for index in range(repeat):
+            gc.collect()
+            runs.append(run_once(corpus, parser, outputDir))
+            LOGGER.info(
+                f"Run {index + 1}/{repeat}: "
+                + ", ".join(
+                    f"{stage} {runs[-1]['seconds'][stage]:.3f}s" for stage in STAGES
+                )
+            )
+
+    stages = {}
+    for stage in STAGES:
+        samples = [run["seconds"][stage] for run in runs]
+        stages[stage] = {
+            "median": statistics.median(samples),
+            "min": min(samples),
+            "max": max(samples),
+            "samples": samples,
+            "peakRssKiB": max(run["peakRssKiB"][stage] for run in runs),
+        }
+    return {
+        "format": RESULT_FORMAT,
+        "version": RESULT_VERSION,
+        "autofff": str(autofff.__version__),
+        "pycparser": pycparser.__version__,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": corpus.parameters,
+        "repeat": repeat,
+        "stages": stages,
+        "total": sum(stages[stage]["median"] for stage in STAGES),
+        "peakRssKiB": _peak_rss(),
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float, minDelta: float) -> list:
+    """Return a description of each stage that became slower than the
+    baseline by more than ``tolerance`` (relative) and ``minDelta`` seconds,
+    the latter keeping noise of very short stages from failing the run."""
+    if baseline.get("corpus") != result["corpus"]:
+        LOGGER.warning(
+            f"Baseline was measured on a different corpus ({baseline.get('corpus')}), comparison is meaningless."
+        )
+    regressions = []
+    for stage in STAGES:
+        try:
+            before = baseline["stages"][stage]["median"]
+        except (KeyError, TypeError):
+            LOGGER.warning(f"Baseline lacks stage '{stage}', skipping it.")
+            continue
+        after = result["stages"][stage]["median"]
+        change = (after - before) / before if before > 0 else 0.0
+        line = f"{stage:<12}{before:>10.3f}s{after:>10.3f}s{change:>+9.1%}"
+        if after - before > minDelta and change > tolerance:
+            regressions.append(line)
+            line += "  REGRESSION"
+        LOGGER.info(line)
+    return regressions
+
+
+def create_argument_parser() -> ArgumentParser:
+    parser = ArgumentParser(
+        prog="python -m benchmarks",
+        description="Time the stages of fake generation on a synthetic header corpus.",
+    )
+    parser.add_argument(
+        "--functions",
+        type=int,
+        default=1000,
+        help="Number of functions across all headers (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--headers",
+        type=int,
+        default=10,
+        help="Number of headers (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--include-depth",
+        type=int,
+        default=8,
+        help="Depth of the include chain below each header (default: %(default)s).",
+        dest="includeDepth",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="Seed of the corpus generator (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=5,
+        help="Number of runs, the median of which is reported (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--corpus-dir",
+        type=str,
+        default=None,
+        help="Directory to write the corpus to, instead of a temporary one.",
+        dest="corpusDir",
+    )
+    parser.add_argument(
+        "-c",
+        "--config",
+        type=str,
+        default="",
+        help="autofff configuration to use.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default=None,
+        help="File to write the results to as JSON.",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=None,
+        help="Results of a previous run to compare against. Exits with 1 if any stage regressed.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Relative slowdown of a stage tolerated when comparing (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--min-delta",
+        type=float,
+        default=0.005,
+        help="Absolute slowdown of a stage in seconds tolerated when comparing (default: %(default)s).",
+        dest="minDelta",
+    )
+    return parser
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # Keep autofff's own per-header messages out of the measurements
+    logging.getLogger("autofff").setLevel(logging.WARNING)
+    parser = create_argument_parser()
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("argument --repeat must be at least 1")
+
+    baseline = None
+    if args.baseline is not None:
+        try:
+            with open(args.baseline) as fp:
+                baseline = json.load(fp)
+        except (OSError, ValueError) as e:
+            parser.error(f"unable to read baseline: {e}")
+        if baseline.get("format") != RESULT_FORMAT:
+            parser.error(f"{args.baseline} is no {RESULT_FORMAT} result")
+
+    c.load(args.config)
+    with tempfile.TemporaryDirectory(prefix="autofff-corpus-") as directory:
+        corpus = generate_corpus(
+            args.corpusDir or directory,
+            args.functions,
+            args.headers,
+            args.includeDepth,
+            args.seed,
+        )
+        result = run_benchmark(corpus, args.repeat)
+
+    text = json.dumps(result, indent=4) + "\n"
+    if args.output is None:
+        sys.stdout.write(text)
+    else:
+        with open(args.output, "w") as fp:
+            fp.write(text)
+
+    if baseline is not None:
+        LOGGER.info(f"{'stage':<12}{'baseline':>11}{'current':>11}{'change':>9}")
+        if compare(result, baseline, args.tolerance, args.minDelta):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
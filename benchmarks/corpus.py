@@ -0,0 +1,175 @@
+import logging
+import os.path
+import random
+import sys
+
+LOGGER = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    LOGGER.error("Module is not intended to run as '__main__'!")
+    sys.exit(1)
+
+_SCALAR_TYPES = (
+    "int",
+    "unsigned int",
+    "char",
+    "const char*",
+    "long long",
+    "double",
+    "void*",
+    "unsigned char*",
+)
+
+FUNCTION_KINDS = (
+    "plain",
+    "function_pointer",
+    "inline_struct",
+    "variadic",
+    "asm_label",
+    "inline_asm",
+)
+
+
+class Corpus:
+    """A generated set of headers. ``headers`` lists the top-level headers to
+    be faked, ``includeDir`` is to be passed as include directory."""
+
+    def __init__(self, directory: str, headers: list, parameters: dict) -> None:
+        self.directory = directory
+        self.includeDir = os.path.join(directory, "include")
+        self.headers = headers
+        self.parameters = parameters
+
+
+def _guard(name: str) -> str:
+    return name.upper().replace(".", "_").replace("/", "_") + "_"
+
+
+def _write(filename: str, lines: list) -> None:
+    os.makedirs(os.path.dirname(filename), exist_ok=True)
+    with open(filename, "w") as fp:
+        fp.write("\n".join(lines) + "\n")
+
+
+def _chain_header(headerIndex: int, depth: int, includeDepth: int) -> list:
+    """A link of a header's include chain, declaring a few types used by the
+    functions of the header and including the next link."""
+    name = f"chain_{headerIndex}_{depth}.h"
+    lines = [f"#ifndef {_guard(name)}", f"#define {_guard(name)}", ""]
+    if depth + 1 < includeDepth:
+        lines += [f'#include "chain_{headerIndex}_{depth + 1}.h"', ""]
+    else:
+        lines += ['#include "corpus_types.h"', ""]
+    lines += [
+        f"typedef unsigned int h{headerIndex}_d{depth}_t;",
+        f"typedef struct h{headerIndex}_d{depth}_s {{",
+        "    corpus_u32_t id;",
+        f"    h{headerIndex}_d{depth}_t value;",
+        "    const char *name;",
+        f"}} h{headerIndex}_d{depth}_s_t;",
+        f"enum h{headerIndex}_d{depth}_e {{ H{headerIndex}_D{depth}_A, H{headerIndex}_D{depth}_B = 4 }};",
+        f"int h{headerIndex}_d{depth}_helper(h{headerIndex}_d{depth}_s_t *s);",
+        "",
+        f"#endif /* {_guard(name)} */",
+    ]
+    return lines
+
+
+def _function(rng: random.Random, kind: str, name: str, types: list) -> list:
+    returnType = rng.choice(types + ["void"])
+    params = [
+        f"{rng.choice(types)} p{index}" for index in range(rng.randint(0, 4))
+    ] or ["void"]
+    if kind == "function_pointer":
+        params[rng.randrange(len(params))] = (
+            f"{rng.choice(types)} (*cb)({rng.choice(types)}, void *context)"
+        )
+    elif kind == "inline_struct":
+        params[rng.randrange(len(params))] = (
+            f"struct {name}_args {{ int a; {rng.choice(types)} b; }} *args"
+        )
+    elif kind == "variadic":
+        if params == ["void"]:
+            params = ["const char *fmt"]
+        params.append("...")
+    declaration = f"{returnType} {name}({', '.join(params)})"
+    if kind == "asm_label":
+        return [f'{declaration} __asm__("{name}_impl");']
+    elif kind == "inline_asm":
+        # An in-header definition, whose body holds inline assembly
+        result = "" if returnType == "void" else "    return 0;"
+        return (
+            [
+                f"static inline {declaration}",
+                "{",
+                '    __asm__ volatile("nop" : : "r"(0) : "memory");',
+            ]
+            + ([result] if result else [])
+            + ["}"]
+        )
+    return [f"{declaration};"]
+
+
+def generate_corpus(
+    directory: str,
+    functions: int = 1000,
+    headers: int = 10,
+    includeDepth: int = 8,
+    seed: int = 0,
+) -> Corpus:
+    """Write a synthetic header corpus of ``functions`` functions spread
+    across ``headers`` headers to ``directory``. Each header sits on top of
+    an include chain ``includeDepth`` headers deep and its functions cycle
+    through all of ``FUNCTION_KINDS``. The same arguments always produce the
+    same corpus."""
+    rng = random.Random(seed)
+    includeDir = os.path.join(directory, "include")
+    _write(
+        os.path.join(includeDir, "corpus_types.h"),
+        [
+            "#ifndef CORPUS_TYPES_H_",
+            "#define CORPUS_TYPES_H_",
+            "typedef unsigned int corpus_u32_t;",
+            "typedef unsigned long corpus_size_t;",
+            "#endif /* CORPUS_TYPES_H_ */",
+        ],
+    )
+
+    headerFiles = []
+    for headerIndex in range(headers):
+        for depth in range(includeDepth):
+            _write(
+                os.path.join(includeDir, f"chain_{headerIndex}_{depth}.h"),
+                _chain_header(headerIndex, depth, includeDepth),
+            )
+        types = list(_SCALAR_TYPES) + ["corpus_u32_t", "corpus_size_t"]
+        types += [f"h{headerIndex}_d{depth}_t" for depth in range(includeDepth)]
+        types += [f"h{headerIndex}_d{depth}_s_t*" for depth in range(includeDepth)]
+
+        name = f"module_{headerIndex}.h"
+        lines = [f"#ifndef {_guard(name)}", f"#define {_guard(name)}", ""]
+        lines += [
+            f'#include "chain_{headerIndex}_0.h"' if includeDepth else "",
+            '#include "corpus_types.h"',
+            "",
+        ]
+        count = functions // headers + (headerIndex < functions % headers)
+        for index in range(count):
+            kind = FUNCTION_KINDS[index % len(FUNCTION_KINDS)]
+            lines += _function(rng, kind, f"m{headerIndex}_f{index}", types)
+        lines += ["", f"#endif /* {_guard(name)} */"]
+        headerFile = os.path.join(directory, name)
+        _write(headerFile, lines)
+        headerFiles.append(headerFile)
+
+    LOGGER.debug(f"Generated a corpus of {len(headerFiles)} headers in {directory}.")
+    return Corpus(
+        directory,
+        headerFiles,
+        {
+            "functions": functions,
+            "headers": headers,
+            "includeDepth": includeDepth,
+            "seed": seed,
+        },
+    )
@@ -0,0 +1,221 @@
+from argparse import ArgumentParser
+import json
+import logging
+import os.path
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import autofff
+
+from benchmarks.corpus import generate_corpus
+
+LOGGER = logging.getLogger(__name__)
+
+RESULT_FORMAT = "autofff-startup-benchmark"
+RESULT_VERSION = 1
+
+SCENARIOS = ("version", "help", "up_to_date", "cache_hit")
+
+# Modules none of the scenarios should need to import
+AVOIDED_MODULES = ("pycparser",)
+
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def scenario_commands(corpus, outputDir: str, cacheDir: str) -> dict:
+    """Return the autofff arguments of each scenario. The corpus doesn't use
+    the standard library, so its include directory doubles as fake libc."""
+    common = corpus.headers + ["-F", corpus.includeDir]
+    return {
+        "version": ["--version"],
+        "help": ["--help"],
+        "up_to_date": common
+        + ["--output-dir", os.path.join(outputDir, "up_to_date"), "--incremental"],
+        "cache_hit": common
+        + [
+            "--output-dir",
+            os.path.join(outputDir, "cache_hit"),
+            "--cache-dir",
+            cacheDir,
+        ],
+    }
+
+
+def _run(arguments: list, importTime: bool = False) -> subprocess.CompletedProcess:
+    command = [sys.executable]
+    if importTime:
+        command += ["-X", "importtime"]
+    return subprocess.run(
+        command + ["-m", "autofff"] + arguments,
+        cwd=_ROOT_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        check=True,
+    )
+
+
+def imported_modules(arguments: list) -> set:
+    """Names of the top-level modules imported by an autofff invocation."""
+    modules = set()
+    for line in _run(arguments, importTime=True).stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            modules.add(line.rsplit("|", 1)[1].strip().split(".")[0])
+    return modules
+
+
+def run_benchmark(corpus, repeat: int) -> dict:
+    scenarios = {}
+    with tempfile.TemporaryDirectory(prefix="autofff-startup-") as directory:
+        commands = scenario_commands(
+            corpus, os.path.join(directory, "output"), os.path.join(directory, "cache")
+        )
+        for scenario in SCENARIOS:
+            # Warm up, which also brings outputs and caches up to date
+            _run(commands[scenario])
+            samples = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                _run(commands[scenario])
+                samples.append(time.perf_counter() - start)
+            avoided = sorted(
+                imported_modules(commands[scenario]) & set(AVOIDED_MODULES)
+            )
+            scenarios[scenario] = {
+                "median": statistics.median(samples),
+                "min": min(samples),
+                "max": max(samples),
+                "samples": samples,
+                "avoidedImports": avoided,
+            }
+            LOGGER.info(f"{scenario:<12}{scenarios[scenario]['median'] * 1e3:>9.1f}ms")
+    return {
+        "format": RESULT_FORMAT,
+        "version": RESULT_VERSION,
+        "autofff": str(autofff.__version__),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "corpus": corpus.parameters,
+        "repeat": repeat,
+        "scenarios": scenarios,
+    }
+
+
+def compare(result: dict, baseline: dict, tolerance: float, minDelta: float) -> list:
+    """Return a description of each scenario that became slower than the
+    baseline by more than ``tolerance`` (relative) and ``minDelta`` seconds."""
+    regressions = []
+    for scenario in SCENARIOS:
+        try:
+            before = baseline["scenarios"][scenario]["median"]
+        except (KeyError, TypeError):
+            LOGGER.warning(f"Baseline lacks scenario '{scenario}', skipping it.")
+            continue
+        after = result["scenarios"][scenario]["median"]
+        change = (after - before) / before if before > 0 else 0.0
+        line = (
+            f"{scenario:<12}{before * 1e3:>9.1f}ms{after * 1e3:>9.1f}ms{change:>+9.1%}"
+        )
+        if after - before > minDelta and change > tolerance:
+            regressions.append(line)
+            line += "  REGRESSION"
+        LOGGER.info(line)
+    return regressions
+
+
+def create_argument_parser() -> ArgumentParser:
+    parser = ArgumentParser(
+        prog="python -m benchmarks.startup",
+        description="Time the startup of autofff invocations that shouldn't need to parse anything.",
+    )
+    parser.add_argument(
+        "--headers",
+        type=int,
+        default=10,
+        help="Number of headers of the corpus (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=10,
+        help="Number of runs, the median of which is reported (default: %(default)s).",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        default=None,
+        help="File to write the results to as JSON.",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=None,
+        help="Results of a previous run to compare against. Exits with 1 if any scenario regressed.",
+    )
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.1,
+        help="Relative slowdown of a scenario tolerated when comparing (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--min-delta",
+        type=float,
+        default=0.01,
+        help="Absolute slowdown of a scenario in seconds tolerated when comparing (default: %(default)s).",
+        dest="minDelta",
+    )
+    return parser
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = create_argument_parser()
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("argument --repeat must be at least 1")
+
+    baseline = None
+    if args.baseline is not None:
+        try:
+            with open(args.baseline) as fp:
+                baseline = json.load(fp)
+        except (OSError, ValueError) as e:
+            parser.error(f"unable to read baseline: {e}")
+        if baseline.get("format") != RESULT_FORMAT:
+            parser.error(f"{args.baseline} is no {RESULT_FORMAT} result")
+
+    with tempfile.TemporaryDirectory(prefix="autofff-corpus-") as directory:
+        corpus = generate_corpus(
+            directory, functions=args.headers * 20, headers=args.headers, includeDepth=2
+        )
+        result = run_benchmark(corpus, args.repeat)
+
+    text = json.dumps(result, indent=4) + "\n"
+    if args.output is None:
+        sys.stdout.write(text)
+    else:
+        with open(args.output, "w") as fp:
+            fp.write(text)
+
+    status = 0
+    for scenario, entry in result["scenarios"].items():
+        if entry["avoidedImports"]:
+            LOGGER.error(
+                f"Scenario '{scenario}' imports {', '.join(entry['avoidedImports'])}."
+            )
+            status = 1
+    if baseline is not None:
+        LOGGER.info(f"{'scenario':<12}{'baseline':>11}{'current':>11}{'change':>9}")
+        if compare(result, baseline, args.tolerance, args.minDelta):
+            status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
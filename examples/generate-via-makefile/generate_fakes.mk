@@ -4,6 +4,7 @@
 # --------------------------------------------------------------------------- #
 # Usage:
 #	make -f generate_fakes.mk CRAWL_PATHS="path/to/include1 path/to/include2"
+#	make -f generate_fakes.mk CRAWL_PATHS="path/to/include1" index
 ifndef CRAWL_PATHS
 $(error 'CRAWL_PATHS' is undefined! Please pass it as a cmd-line arg or \
 	define it in another makefile)
@@ -12,6 +13,7 @@ endif
 # Optional parameters:
 ROOT_PATH=$(CURDIR)/../..
 OUTPUT_PATH?=$(ROOT_PATH)/output
+INDEX_PATH?=$(OUTPUT_PATH)/autofff-index.db
 INCLUDE_PATHS?=
 INCLUDE_FILE_PATHS?=
 FAKE_INCLUDE_PATHS?=$(ROOT_PATH)/dependencies/pycparser/utils/fake_libc_include
@@ -39,7 +41,24 @@ $(OUTPUT_PATH)/%_th.h: %.h
 	$(V)echo Generating fakes for: $<
 	$(V)$(PYTHON) -m autofff \
 		-O$@ \
+		-MD -MP \
 		$(addprefix -I,$(INCLUDE_PATHS)) \
 		$(addprefix -F,$(FAKE_INCLUDE_PATHS)) \
 		$(addprefix -i,$(INCLUDE_FILE_PATHS)) \
 		$<
+
+# Alternatively keep the functions of all headers in an index, only rescanning
+# headers that changed (or include a header that did) since the last run
+.PHONY: index
+index:
+	$(V)echo Indexing headers in: $(CRAWL_PATHS)
+	$(V)$(PYTHON) -m autofff index $(INDEX_PATH) $(CRAWL_PATHS) \
+		$(addprefix -I,$(INCLUDE_PATHS)) \
+		$(addprefix -F,$(FAKE_INCLUDE_PATHS)) \
+		$(addprefix -i,$(INCLUDE_FILE_PATHS))
+	$(V)$(PYTHON) -m autofff generate $(INDEX_PATH) \
+		--output-dir $(OUTPUT_PATH) \
+		--output-pattern "{stem}_th.h"
+
+# Regenerate fakes whenever any (transitively) included header changes
+-include $(OUTPUT_FILE_PATHS:%.h=%.d)
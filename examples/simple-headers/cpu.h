@@ -0,0 +1,23 @@
+#ifndef CPU_H_
+#define CPU_H_
+
+#include "platform/cpu_intrinsics.h"
+
+#include <stdint.h>
+
+/* Showcasing the stripping of asm labels */
+uint32_t Cpu_GetId(void) asm("cpu_get_id");
+void Cpu_Save(Cpu_Context *context) __asm("cpu_" "save");
+
+void Cpu_Restore(const Cpu_Context *context);
+
+/* Showcasing the stripping of inline assembly with nested parentheses */
+static inline uint32_t Cpu_DisableInterrupts(Cpu_Context *context)
+{
+    uint32_t mask = context->interrupts.mask;
+    __asm__ volatile("" : "+r"(mask) : "r"((uint32_t)(sizeof(*context))) : "memory");
+    context->interrupts.mask = 0u;
+    return mask;
+}
+
+#endif
@@ -0,0 +1,33 @@
+#ifndef CPU_INTRINSICS_H_
+#define CPU_INTRINSICS_H_
+
+#include <stdint.h>
+
+/* Showcasing struct definitions of included headers, which are kept */
+typedef struct
+{
+    uint32_t flags;
+    struct
+    {
+        uint32_t mask;
+        uint32_t pending;
+    } interrupts;
+} Cpu_Context;
+
+/* Showcasing function bodies of included headers, which are dropped */
+static inline void Cpu_CompilerBarrier(void)
+{
+    __asm__ __volatile__("" : : : "memory");
+}
+
+static inline uint32_t Cpu_Mask(uint32_t value, uint32_t mask)
+{
+    if (mask == 0u)
+    {
+        return value;
+    }
+    __asm__ volatile("" : "+r"(value) : "r"((uint32_t)(mask & (value | 1u))));
+    return value & mask;
+}
+
+#endif
@@ -0,0 +1,58 @@
+#include "gtest.h"
+#include "fff.h"
+
+/* Smoke test of fakes generated from a header with inline assembly, asm
+ * labels and function bodies of included headers. */
+extern "C"
+{
+#include "cpu_th.h"
+}
+
+DEFINE_FFF_GLOBALS
+
+class TS_Cpu_Fakes : public testing::Test
+{
+public:
+    void SetUp()
+    {
+        FFF_RESET_HISTORY();
+
+        RESET_FAKE(Cpu_GetId);
+        RESET_FAKE(Cpu_Save);
+        RESET_FAKE(Cpu_Restore);
+        RESET_FAKE(Cpu_DisableInterrupts);
+    }
+};
+
+TEST_F(TS_Cpu_Fakes, AsmLabeledDeclarations)
+{
+    Cpu_Context context = {};
+    Cpu_GetId_fake.return_val = 42U;
+
+    ASSERT_EQ(42U, Cpu_GetId());
+    Cpu_Save(&context);
+
+    ASSERT_EQ(1U, Cpu_GetId_fake.call_count);
+    ASSERT_EQ(&context, Cpu_Save_fake.arg0_val);
+}
+
+TEST_F(TS_Cpu_Fakes, DeclarationsUsingIncludedStructs)
+{
+    const Cpu_Context context = {};
+
+    Cpu_Restore(&context);
+
+    ASSERT_EQ(1U, Cpu_Restore_fake.call_count);
+    ASSERT_EQ(&context, Cpu_Restore_fake.arg0_val);
+}
+
+TEST_F(TS_Cpu_Fakes, InlineDefinitionsWithAssembly)
+{
+    Cpu_Context context = {};
+    Cpu_DisableInterrupts_fake.return_val = 7U;
+
+    ASSERT_EQ(7U, Cpu_DisableInterrupts(&context));
+
+    ASSERT_EQ(1U, Cpu_DisableInterrupts_fake.call_count);
+    ASSERT_EQ(&context, Cpu_DisableInterrupts_fake.arg0_val);
+}
@@ -0,0 +1,228 @@
+"""Stress test of many autofff processes generating into one output directory
+at once, as happens in 'make -j' builds. Each round starts out without the
+output directory, so that all processes race to create it, and has several
+processes (re)write each output with alternating content, while the outputs
+are read continuously. Fails if any process fails, a partially written
+output is read or temporary files are left behind."""
+
+from argparse import ArgumentParser
+import logging
+import os
+import os.path
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEADER_TEMPLATE = """#ifndef {guard}
+#define {guard}
+
+int {name}_init(int flags);
+#if VARIANT
+void {name}_deinit(void);
+#endif
+int {name}_read(char *buffer, unsigned length);
+
+#endif
+"""
+
+VARIANTS = (0, 1)
+
+
+def write_headers(directory: str, count: int) -> list:
+    headers = []
+    for index in range(count):
+        name = f"module{index}"
+        header = os.path.join(directory, f"{name}.h")
+        with open(header, "w") as fp:
+            fp.write(HEADER_TEMPLATE.format(guard=f"{name.upper()}_H_", name=name))
+        headers.append(header)
+    return headers
+
+
+def output_name(header: str) -> str:
+    return os.path.splitext(os.path.basename(header))[0] + "_th.h"
+
+
+def generate(header: str, outputFile: str, variant: int) -> subprocess.Popen:
+    return subprocess.Popen(
+        [
+            sys.executable,
+            "-m",
+            "autofff",
+            header,
+            "-O",
+            outputFile,
+            "-F",
+            os.path.dirname(header),
+            "-D",
+            f"VARIANT={variant}",
+        ],
+        cwd=_ROOT_DIR,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+
+
+def expected_outputs(headers: list, directory: str) -> dict:
+    """Return the valid contents of each output by its name, generated one by
+    one for each variant."""
+    expected = {}
+    for variant in VARIANTS:
+        outputDir = os.path.join(directory, f"variant{variant}")
+        processes = [
+            (
+                header,
+                generate(header, os.path.join(outputDir, output_name(header)), variant),
+            )
+            for header in headers
+        ]
+        for header, process in processes:
+            _, stderr = process.communicate()
+            if process.returncode != 0:
+                raise RuntimeError(f"Generating {header} failed:\n{stderr}")
+            with open(os.path.join(outputDir, output_name(header))) as fp:
+                expected.setdefault(output_name(header), set()).add(fp.read())
+    return expected
+
+
+class Reader(threading.Thread):
+    """Reads the outputs over and over, recording any content read that's
+    neither missing nor one of the valid contents."""
+
+    def __init__(self, outputDir: str, expected: dict) -> None:
+        super().__init__(daemon=True)
+        self.outputDir = outputDir
+        self.expected = expected
+        self.reads = 0
+        self.tornReads = []
+        self.stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self.stopped.is_set():
+            for name, contents in self.expected.items():
+                try:
+                    with open(os.path.join(self.outputDir, name)) as fp:
+                        content = fp.read()
+                except OSError:
+                    continue
+                self.reads += 1
+                if content not in contents:
+                    self.tornReads.append((name, len(content)))
+
+
+def run_round(headers: list, outputDir: str, expected: dict, writers: int) -> list:
+    """Run ``writers`` processes per output at once, returning the problems
+    found."""
+    reader = Reader(outputDir, expected)
+    reader.start()
+    # Writers of an output alternate between its variants, so that each of
+    # them actually rewrites it
+    processes = [
+        (
+            header,
+            generate(
+                header,
+                os.path.join(outputDir, output_name(header)),
+                VARIANTS[index % len(VARIANTS)],
+            ),
+        )
+        for index in range(writers)
+        for header in headers
+    ]
+    problems = []
+    for header, process in processes:
+        _, stderr = process.communicate()
+        if process.returncode != 0:
+            problems.append(
+                f"Generating {header} failed with exit code {process.returncode}:\n{stderr.strip()}"
+            )
+    reader.stopped.set()
+    reader.join()
+
+    for name, length in reader.tornReads:
+        problems.append(
+            f"Read {length} characters of {name}, matching no valid content."
+        )
+    for name, contents in expected.items():
+        try:
+            with open(os.path.join(outputDir, name)) as fp:
+                if fp.read() not in contents:
+                    problems.append(f"{name} holds no valid content.")
+        except OSError as e:
+            problems.append(f"{name} wasn't written: {e}")
+    leftovers = (
+        set(os.listdir(outputDir)) - set(expected)
+        if os.path.isdir(outputDir)
+        else set()
+    )
+    for name in sorted(leftovers):
+        problems.append(f"{name} was left behind in the output directory.")
+    LOGGER.info(
+        f"{len(processes)} processes done, {reader.reads} outputs read in between."
+    )
+    return problems
+
+
+def create_argument_parser() -> ArgumentParser:
+    parser = ArgumentParser(
+        prog="python test/concurrent_outputs_stresstest.py",
+        description="Run many autofff processes generating into one output directory at once.",
+    )
+    parser.add_argument(
+        "--headers",
+        type=int,
+        default=8,
+        help="Number of headers, each generated into its own output (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--writers",
+        type=int,
+        default=6,
+        help="Number of processes generating each output at once (default: %(default)s).",
+    )
+    parser.add_argument(
+        "--rounds",
+        type=int,
+        default=3,
+        help="Number of rounds, each starting without the output directory (default: %(default)s).",
+    )
+    return parser
+
+
+def main() -> int:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    parser = create_argument_parser()
+    args = parser.parse_args()
+    if min(args.headers, args.writers, args.rounds) < 1:
+        parser.error("arguments --headers, --writers and --rounds must be at least 1")
+
+    status = 0
+    with tempfile.TemporaryDirectory(prefix="autofff-stresstest-") as directory:
+        headers = write_headers(directory, args.headers)
+        expected = expected_outputs(headers, os.path.join(directory, "expected"))
+        for index in range(args.rounds):
+            # Nested, so that the processes race to create several directories
+            outputDir = os.path.join(directory, "output", "nested", "fakes")
+            shutil.rmtree(os.path.join(directory, "output"), ignore_errors=True)
+            start = time.perf_counter()
+            problems = run_round(headers, outputDir, expected, args.writers)
+            LOGGER.info(
+                f"Round {index + 1}/{args.rounds}: {len(problems)} problems in {time.perf_counter() - start:.1f}s."
+            )
+            for problem in problems:
+                LOGGER.error(problem)
+            if problems:
+                status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,39 @@
+from concurrent.futures import ThreadPoolExecutor
+import os
+import tempfile
+import unittest
+
+from autofff.cache import DiskCache
+
+
+class TS_DiskCache(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory(prefix="autofff-unittest-")
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write_concurrently(self, cache: DiskCache, count: int) -> None:
+        with ThreadPoolExecutor(8) as threads:
+            for future in [
+                threads.submit(cache.write, f"{index:064x}", os.urandom(64))
+                for index in range(count)
+            ]:
+                future.result()
+
+    def test_size_of_concurrent_writes(self) -> None:
+        cache = DiskCache(self.directory, 1024 * 1024)
+        self.write_concurrently(cache, 256)
+        self.assertEqual(256 * 64, cache._size)
+        self.assertEqual(cache._compute_size(), cache._size)
+        self.assertEqual(0, cache.evictions)
+
+    def test_eviction_of_concurrent_writes(self) -> None:
+        cache = DiskCache(self.directory, 64 * 64)
+        self.write_concurrently(cache, 256)
+        self.assertEqual(cache._compute_size(), cache._size)
+        self.assertLessEqual(cache._size, cache.maxSize)
+        self.assertGreater(cache.evictions, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,61 @@
+import os.path
+import tempfile
+import unittest
+
+from autofff import elf
+
+
+def ar_member(name: bytes, data: bytes, size: int = None) -> bytes:
+    size = len(data) if size is None else size
+    header = b"%-16s%-12s%-6s%-6s%-8s%-10d`\n" % (name, b"0", b"0", b"0", b"644", size)
+    return header + data + (b"\n" if len(data) & 1 else b"")
+
+
+class TS_ElfArchive(unittest.TestCase):
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory(prefix="autofff-unittest-")
+        self.addCleanup(directory.cleanup)
+        self.filename = os.path.join(directory.name, "lib.a")
+
+    def read(self, *members: bytes) -> list:
+        with open(self.filename, "wb") as fp:
+            fp.write(elf.AR_MAGIC + b"".join(members))
+        return elf.read_symbol_tables(self.filename)
+
+    def assertCorrupt(self, *members: bytes) -> None:
+        with self.assertRaises(elf.ElfException):
+            self.read(*members)
+
+    def test_members_other_than_elf_files_are_skipped(self) -> None:
+        longNames = ar_member(b"//", b"a_very_long_member_name.txt/\n")
+        self.assertEqual(
+            [],
+            self.read(
+                longNames,
+                ar_member(b"/0", b"text"),
+                ar_member(b"short.txt/", b"text"),
+                ar_member(b"#1/8", b"bsd.txt\0text"),
+            ),
+        )
+
+    def test_truncated_archive(self) -> None:
+        member = ar_member(b"short.o/", elf.ELF_MAGIC + bytes(60))
+        self.assertCorrupt(member[:-20])
+        self.assertCorrupt(member, member[:30])
+
+    def test_truncated_long_names(self) -> None:
+        self.assertCorrupt(ar_member(b"//", b"name.o/\n", size=100)[:-1])
+
+    def test_corrupt_gnu_long_name(self) -> None:
+        longNames = ar_member(b"//", b"a_very_long_member_name.o/\n")
+        self.assertCorrupt(longNames, ar_member(b"/x", b"data"))
+        self.assertCorrupt(longNames, ar_member(b"/99", b"data"))
+        self.assertCorrupt(ar_member(b"/0", b"data"))
+
+    def test_corrupt_bsd_name(self) -> None:
+        self.assertCorrupt(ar_member(b"#1/x", b"name.o\0\0data"))
+        self.assertCorrupt(ar_member(b"#1/99", b"name.o\0\0data"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,106 @@
+import os
+import os.path
+import subprocess
+import sys
+import tempfile
+import unittest
+
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEADER = """#ifndef MATRIX_H_
+#define MATRIX_H_
+
+int Matrix_Init(void);
+#if USE_DMA
+void Matrix_StartDma(void);
+#endif
+#if BASE
+#include "base_extra.h"
+#endif
+#ifdef WITH_RESET
+void Matrix_Reset(void);
+#endif
+
+#endif
+"""
+
+VARIANTS = ("base:BASE=1", "dma:USE_DMA=1", "other:OTHER=1")
+
+
+class TS_IncrementalMatrix(unittest.TestCase):
+    """Generate a define matrix with --incremental, with 'other' mining the
+    same functions as 'base' until 'base_extra.h' adds one to 'base'."""
+
+    jobs = 1
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory(prefix="autofff-unittest-")
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.outputDir = os.path.join(self.directory, "output")
+        self.header = os.path.join(self.directory, "matrix.h")
+        with open(self.header, "w") as fp:
+            fp.write(HEADER)
+        self.write_base_extra("")
+
+    def write_base_extra(self, content: str) -> None:
+        with open(os.path.join(self.directory, "base_extra.h"), "w") as fp:
+            fp.write(content)
+
+    def output(self, variant: str) -> str:
+        return os.path.join(self.outputDir, f"matrix_th_{variant}.h")
+
+    def generate(self) -> str:
+        args = [sys.executable, "-m", "autofff", self.header]
+        args += ["--output-dir", self.outputDir, "-F", self.directory]
+        args += ["--incremental", "--verbose", "-j", str(self.jobs)]
+        for variant in VARIANTS:
+            args += ["--matrix", variant]
+        process = subprocess.run(
+            args, cwd=_ROOT_DIR, capture_output=True, text=True, check=False
+        )
+        self.assertEqual(0, process.returncode, process.stderr)
+        return process.stdout + process.stderr
+
+    def assertGenerated(self, log: str, variants: list) -> None:
+        self.assertEqual(
+            sorted(variants),
+            sorted(
+                variant
+                for variant in ("base", "dma", "other")
+                if f"Generatring output file {self.output(variant)}" in log
+            ),
+        )
+
+    def test_unchanged_matrix_is_up_to_date(self) -> None:
+        self.assertGenerated(self.generate(), ["base", "dma"])
+        self.assertFalse(os.path.exists(self.output("other")))
+        self.assertTrue(os.path.exists(self.output("other") + ".autofff.json"))
+
+        log = self.generate()
+        self.assertGenerated(log, [])
+        self.assertEqual(3, log.count("is up to date"))
+        self.assertFalse(os.path.exists(self.output("other")))
+
+    def test_rescanned_duplicate_is_skipped(self) -> None:
+        self.generate()
+        os.unlink(self.output("other") + ".autofff.json")
+
+        self.assertGenerated(self.generate(), [])
+        self.assertFalse(os.path.exists(self.output("other")))
+
+    def test_duplicate_is_regenerated_once_original_changes(self) -> None:
+        self.generate()
+        self.write_base_extra("#define WITH_RESET\n")
+
+        self.assertGenerated(self.generate(), ["base", "other"])
+        self.assertTrue(os.path.exists(self.output("other")))
+        self.assertGenerated(self.generate(), [])
+
+
+class TS_IncrementalMatrixParallel(TS_IncrementalMatrix):
+    jobs = 2
+
+
+if __name__ == "__main__":
+    unittest.main()
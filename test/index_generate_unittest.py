@@ -0,0 +1,101 @@
+import os
+import os.path
+import subprocess
+import sys
+import tempfile
+import unittest
+
+_ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+HEADERS = {
+    "uart.h": "int Uart_Init(int baudrate);\nvoid Uart_Deinit(void);\n",
+    "dma.h": "void Dma_Start(void *buffer, int length);\n",
+    "gpio.h": "int Gpio_Read(int pin);\n",
+}
+
+
+class TS_IndexGenerate(unittest.TestCase):
+    """Generate the fakes of chosen headers of an index of several headers."""
+
+    def setUp(self) -> None:
+        directory = tempfile.TemporaryDirectory(prefix="autofff-unittest-")
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+        self.includeDir = os.path.join(self.directory, "include")
+        os.mkdir(self.includeDir)
+        for name, content in HEADERS.items():
+            with open(os.path.join(self.includeDir, name), "w") as fp:
+                fp.write(content)
+        self.database = os.path.join(self.directory, "headers.db")
+        self.autofff(
+            "index", self.database, self.includeDir, "-F", self.includeDir
+        ).check_returncode()
+
+    def autofff(self, *args: str) -> subprocess.CompletedProcess:
+        return subprocess.run(
+            [sys.executable, "-m", "autofff", *args],
+            cwd=_ROOT_DIR,
+            capture_output=True,
+            text=True,
+            check=False,
+        )
+
+    def header(self, name: str) -> str:
+        return os.path.join(self.includeDir, name)
+
+    def test_output_of_one_header(self) -> None:
+        outputFile = os.path.join(self.directory, "uart_th.h")
+        process = self.autofff(
+            "generate",
+            self.database,
+            "--header",
+            self.header("uart.h"),
+            "-O",
+            outputFile,
+        )
+        self.assertEqual(0, process.returncode, process.stderr)
+        with open(outputFile) as fp:
+            fakes = fp.read()
+        self.assertIn("FAKE_VALUE_FUNC(int, Uart_Init, int);", fakes)
+        self.assertIn("FAKE_VOID_FUNC(Uart_Deinit);", fakes)
+        self.assertNotIn("Dma_Start", fakes)
+
+    def test_output_dir_of_several_headers(self) -> None:
+        outputDir = os.path.join(self.directory, "output")
+        process = self.autofff(
+            "generate",
+            self.database,
+            "--header",
+            self.header("dma.h"),
+            "--header",
+            os.path.relpath(self.header("gpio.h"), _ROOT_DIR),
+            "--output-dir",
+            outputDir,
+        )
+        self.assertEqual(0, process.returncode, process.stderr)
+        self.assertEqual(["dma_th.h", "gpio_th.h"], sorted(os.listdir(outputDir)))
+
+    def test_output_requires_one_header(self) -> None:
+        process = self.autofff(
+            "generate", self.database, "-O", os.path.join(self.directory, "th.h")
+        )
+        self.assertNotEqual(0, process.returncode)
+        self.assertIn("--header", process.stderr)
+
+    def test_header_missing_from_index(self) -> None:
+        process = self.autofff(
+            "generate",
+            self.database,
+            "--header",
+            self.header("missing.h"),
+            "-O",
+            os.path.join(self.directory, "th.h"),
+        )
+        self.assertNotEqual(0, process.returncode)
+        self.assertIn(
+            "missing.h is in none of the scan files or indices", process.stderr
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,49 @@
+import os.path
+import unittest
+from unittest import mock
+
+import autofff.runner as runner
+import autofff.watch as watch
+
+_EXAMPLES_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "examples",
+    "simple-headers",
+)
+
+
+class InterruptingWatcher(watch.PollingWatcher):
+    """Reports no changes, but is interrupted as soon as it waits for any."""
+
+    def changes(self, debounce: float = watch.DEFAULT_DEBOUNCE) -> set:
+        raise KeyboardInterrupt()
+
+
+class TS_Watch(unittest.TestCase):
+    def setUp(self) -> None:
+        self.rnr = runner.Runner()
+        self.jobs = [
+            runner.Job(os.path.join(_EXAMPLES_DIR, "driver.h"), "driver_th.h", fakes=[])
+        ]
+        patcher = mock.patch.object(
+            watch, "create_watcher", return_value=InterruptingWatcher()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_interrupted_initial_run(self) -> None:
+        with mock.patch.object(self.rnr, "run", side_effect=KeyboardInterrupt) as run:
+            self.assertEqual(0, watch.watch(self.rnr, self.jobs))
+        run.assert_called_once_with(self.jobs)
+
+    def test_interrupted_after_failed_run(self) -> None:
+        with mock.patch.object(self.rnr, "run", return_value=list(self.jobs)):
+            self.assertEqual(1, watch.watch(self.rnr, self.jobs))
+
+    def test_interrupted_after_successful_run(self) -> None:
+        with mock.patch.object(self.rnr, "run", return_value=[]):
+            self.assertEqual(0, watch.watch(self.rnr, self.jobs))
+
+
+if __name__ == "__main__":
+    unittest.main()